@@ -5,6 +5,7 @@ Django settings for config project.
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 
 from decouple import config  # pip install python-decouple
 
@@ -183,6 +184,12 @@ STORAGES = {
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
     },
+    # Large test case data, content-addressed (see core.utils.test_data). Point this at an
+    # object store shared by all hosts when the judge runs on more than one.
+    "judge_data": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": config("JUDGE_DATA_ROOT", default=str(BASE_DIR / "judge-data"))},
+    },
 }
 
 # ──────────────────────────────────────
@@ -292,6 +299,20 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
+CELERY_TASK_ALWAYS_EAGER = config("CELERY_TASK_ALWAYS_EAGER", default=False, cast=bool)
+# A task not acknowledged within the visibility timeout is delivered again: countdowns
+# (held-back submissions, see JUDGE_USAGE_MAX_DELAY_S) must stay well below it
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "visibility_timeout": config("CELERY_VISIBILITY_TIMEOUT_S", default=3600, cast=int),
+}
+
+# Code submissions are graded by a dedicated worker pool (see the `judge` service in docker-compose)
+CELERY_TASK_ROUTES = {
+    "core.tasks.judge_submission": {"queue": "judge"},
+    "core.tasks.run_reference_solution": {"queue": "judge"},
+    "core.tasks.rejudge_challenge": {"queue": "judge"},
+    "core.tasks.rejudge_submissions": {"queue": "judge"},
+}
 
 CACHES = {
     "default": {
@@ -300,6 +321,107 @@ CACHES = {
     }
 }
 
+# ──────────────────────────────────────
+# Code execution (judge)
+# ──────────────────────────────────────
+# Fan a submission's test cases out over a thread pool. Every judge process gets its
+# own pool, so with N judge processes on a host keep N * JUDGE_MAX_PARALLEL_TESTS
+# close to the number of cores. 0 = one worker per available core.
+JUDGE_PARALLEL_TESTS = config("JUDGE_PARALLEL_TESTS", default=True, cast=bool)
+JUDGE_MAX_PARALLEL_TESTS = config("JUDGE_MAX_PARALLEL_TESTS", default=0, cast=int)
+# Pre-started python/node interpreters kept per judge process. 0 = cold spawn per test case.
+JUDGE_WARM_POOL_SIZE = config("JUDGE_WARM_POOL_SIZE", default=4, cast=int)
+# Compiled artifacts shared by all judge processes on a host, evicted LRU above the size cap.
+# An empty directory disables the cache.
+JUDGE_COMPILE_CACHE_DIR = config(
+    "JUDGE_COMPILE_CACHE_DIR",
+    default=os.path.join(tempfile.gettempdir(), "erudite-compile-cache"),
+)
+JUDGE_COMPILE_CACHE_MAX_MB = config("JUDGE_COMPILE_CACHE_MAX_MB", default=512, cast=int)
+# A run writing more than this to stdout or stderr is killed with `output_limit`.
+JUDGE_OUTPUT_LIMIT_KB = config("JUDGE_OUTPUT_LIMIT_KB", default=8192, cast=int)
+# Output kept per test case result (start and end of it, the middle is cut).
+JUDGE_STORED_OUTPUT_KB = config("JUDGE_STORED_OUTPUT_KB", default=64, cast=int)
+# Test case inputs / expected outputs larger than this are stored as files in the
+# "judge_data" storage rather than in the database (see core.utils.test_data). 0 = never.
+JUDGE_TEST_DATA_INLINE_KB = config("JUDGE_TEST_DATA_INLINE_KB", default=64, cast=int)
+# Judge hosts' copies of those files, evicted LRU above the size cap.
+JUDGE_TEST_DATA_CACHE_DIR = config(
+    "JUDGE_TEST_DATA_CACHE_DIR",
+    default=os.path.join(tempfile.gettempdir(), "erudite-test-data"),
+)
+JUDGE_TEST_DATA_CACHE_MAX_MB = config("JUDGE_TEST_DATA_CACHE_MAX_MB", default=2048, cast=int)
+# How runs are confined: "rlimit" (per-process rlimits) or "cgroup" (a cgroup v2 per run
+# below JUDGE_CGROUP_ROOT, which must be delegated to the judge user; time limits then
+# apply to CPU time). Falls back to "rlimit" when the cgroup root cannot be used.
+JUDGE_SANDBOX = config("JUDGE_SANDBOX", default="rlimit")
+JUDGE_CGROUP_ROOT = config("JUDGE_CGROUP_ROOT", default="/sys/fs/cgroup/judge")
+JUDGE_CGROUP_PIDS_MAX = config("JUDGE_CGROUP_PIDS_MAX", default=64, cast=int)
+# Admission control for /run/ (see core.utils.admission): at most JUDGE_ADMISSION_NODE_CAP
+# runs at once per node (0 = one per available core), the rest wait in a per-user fair
+# queue of at most JUDGE_ADMISSION_QUEUE_MAX runs for JUDGE_ADMISSION_MAX_WAIT_S seconds
+# before a 429. Coordinated through Redis; without Redis every run is admitted.
+JUDGE_ADMISSION_ENABLED = config("JUDGE_ADMISSION_ENABLED", default=True, cast=bool)
+JUDGE_ADMISSION_NODE_CAP = config("JUDGE_ADMISSION_NODE_CAP", default=0, cast=int)
+JUDGE_ADMISSION_QUEUE_MAX = config("JUDGE_ADMISSION_QUEUE_MAX", default=50, cast=int)
+JUDGE_ADMISSION_MAX_WAIT_S = config("JUDGE_ADMISSION_MAX_WAIT_S", default=10, cast=float)
+JUDGE_ADMISSION_LEASE_S = config("JUDGE_ADMISSION_LEASE_S", default=120, cast=int)
+# Name of this node in the admission keys (default: the host name).
+JUDGE_NODE_NAME = config("JUDGE_NODE_NAME", default="")
+# /run/ results cached in Redis per (code, language, limits, test cases version), evicting
+# the least recently used beyond JUDGE_RUN_CACHE_MAX_ENTRIES. 0 = no caching.
+JUDGE_RUN_CACHE_TTL_S = config("JUDGE_RUN_CACHE_TTL_S", default=600, cast=int)
+JUDGE_RUN_CACHE_MAX_ENTRIES = config("JUDGE_RUN_CACHE_MAX_ENTRIES", default=10000, cast=int)
+# Identical runs in flight at the same time share one execution (see core.utils.single_flight).
+# Longest a run waits on another process's identical execution.
+JUDGE_SINGLE_FLIGHT_WAIT_S = config("JUDGE_SINGLE_FLIGHT_WAIT_S", default=120, cast=int)
+# Serve /run/ from an async view awaiting its child processes on the event loop
+# (see core.execution.async_executor). Only worth it under an ASGI server (web-async).
+JUDGE_ASYNC_RUNS = config("JUDGE_ASYNC_RUNS", default=False, cast=bool)
+# Reference solution runs (see core.utils.reference) get at least this time limit per test
+# case, and suggest a time limit of JUDGE_REFERENCE_TIME_FACTOR times their slowest case.
+JUDGE_REFERENCE_TIME_LIMIT_S = config("JUDGE_REFERENCE_TIME_LIMIT_S", default=30, cast=int)
+JUDGE_REFERENCE_TIME_FACTOR = config("JUDGE_REFERENCE_TIME_FACTOR", default=3.0, cast=float)
+# Re-judges after test cases change (see core.utils.rejudge): submissions per task, and
+# submissions run at once by one task.
+JUDGE_REJUDGE_CHUNK_SIZE = config("JUDGE_REJUDGE_CHUNK_SIZE", default=100, cast=int)
+JUDGE_REJUDGE_PARALLEL = config("JUDGE_REJUDGE_PARALLEL", default=4, cast=int)
+# Send submissions and /run/ to the judge worker fleet (`manage.py judge_worker`, see
+# core.utils.judge_fleet) instead of running them on this host. Runs fall back to this host
+# when no live worker serves the language or none took the run within JUDGE_FLEET_WAIT_S.
+JUDGE_FLEET_ENABLED = config("JUDGE_FLEET_ENABLED", default=False, cast=bool)
+JUDGE_FLEET_WAIT_S = config("JUDGE_FLEET_WAIT_S", default=120, cast=int)
+# Jobs one worker runs at once (each one fans its test cases out as JUDGE_PARALLEL_TESTS says).
+JUDGE_FLEET_SLOTS = config("JUDGE_FLEET_SLOTS", default=2, cast=int)
+# A worker silent for JUDGE_FLEET_WORKER_TTL_S is dead and its jobs are requeued, up to
+# JUDGE_FLEET_MAX_ATTEMPTS deliveries of a job.
+JUDGE_FLEET_HEARTBEAT_S = config("JUDGE_FLEET_HEARTBEAT_S", default=2, cast=float)
+JUDGE_FLEET_WORKER_TTL_S = config("JUDGE_FLEET_WORKER_TTL_S", default=10, cast=int)
+JUDGE_FLEET_MAX_ATTEMPTS = config("JUDGE_FLEET_MAX_ATTEMPTS", default=3, cast=int)
+# Performance-graded challenges (see core.utils.performance): timed runs per test case, the
+# fraction of the fastest and of the slowest runs left out of their mean, and the CPUs the
+# timed runs are pinned to (comma-separated ids, e.g. a core kept free of other judge work;
+# empty = not pinned).
+JUDGE_PERF_RUNS = config("JUDGE_PERF_RUNS", default=5, cast=int)
+JUDGE_PERF_TRIM = config("JUDGE_PERF_TRIM", default=0.2, cast=float)
+JUDGE_PERF_CPUS = config("JUDGE_PERF_CPUS", default="")
+# CPU time accounting and quotas for /run/ and /submit/ (see core.utils.cpu_usage): usage is
+# counted over a rolling window of JUDGE_USAGE_WINDOW_S and written to Postgres every
+# JUDGE_USAGE_FLUSH_S. Default quotas, in CPU seconds per window (0 = none), apply where no
+# CpuQuota is set. Past JUDGE_USAGE_SLOW_FRACTION of a quota, /run/ waits
+# JUDGE_USAGE_SLOW_ROUNDS admission rounds behind other users and submissions are judged
+# JUDGE_USAGE_SLOW_DELAY_S later; past it, /run/ is refused and submissions wait for room.
+JUDGE_USAGE_WINDOW_S = config("JUDGE_USAGE_WINDOW_S", default=3600, cast=int)
+JUDGE_USAGE_FLUSH_S = config("JUDGE_USAGE_FLUSH_S", default=60, cast=int)
+JUDGE_USAGE_USER_QUOTA_S = config("JUDGE_USAGE_USER_QUOTA_S", default=0, cast=int)
+JUDGE_USAGE_COURSE_QUOTA_S = config("JUDGE_USAGE_COURSE_QUOTA_S", default=0, cast=int)
+JUDGE_USAGE_SLOW_FRACTION = config("JUDGE_USAGE_SLOW_FRACTION", default=0.8, cast=float)
+JUDGE_USAGE_SLOW_ROUNDS = config("JUDGE_USAGE_SLOW_ROUNDS", default=10, cast=int)
+JUDGE_USAGE_SLOW_DELAY_S = config("JUDGE_USAGE_SLOW_DELAY_S", default=30, cast=int)
+# Submissions held back past a quota wait at most this long at a time (capped at half the
+# broker's visibility timeout), then the quota is checked again.
+JUDGE_USAGE_MAX_DELAY_S = config("JUDGE_USAGE_MAX_DELAY_S", default=600, cast=int)
+
 # ──────────────────────────────────────
 # LTI
 # ──────────────────────────────────────
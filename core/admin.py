@@ -7,8 +7,9 @@ from .models.submission_model import Submission
 from .models.challenge_model import Challenge
 from .models.challenge_correct_answer import ChallengeCorrectAnswer
 from .models.lesson import Lesson
-from .models.code_challenge import CodeChallengeConfig, CodeTestCase, CodeSubmissionResult
+from .models.code_challenge import CodeChallengeConfig, CodeTestCase, CodeSubmissionResult, ReferenceRun, Rejudge
 from .models.certificate_model import Certificate
+from .models.usage_model import CpuQuota, CpuUsage
 
 
 admin.site.register(Course)
@@ -21,4 +22,8 @@ admin.site.register(Lesson)
 admin.site.register(CodeChallengeConfig)
 admin.site.register(CodeTestCase)
 admin.site.register(CodeSubmissionResult)
+admin.site.register(ReferenceRun)
+admin.site.register(Rejudge)
 admin.site.register(Certificate)
+admin.site.register(CpuUsage)
+admin.site.register(CpuQuota)
@@ -0,0 +1,165 @@
+# core/execution/async_executor.py
+"""
+Asyncio-native variant of executor.run_code_challenge, for async views.
+
+Every test case is a child process started with asyncio.create_subprocess_exec
+and awaited with the same time limits, output cap and sandbox box as the
+threaded executor, so one event loop can hold many concurrent runs that are
+mostly waiting on their children. Results and verdicts are the executor's.
+What blocks around them, setting up and tearing down sandbox boxes and the
+compile cache's file copies, runs in threads.
+
+The warm pools, persistent JVMs and harness mode of the threaded executor
+block on their workers and are not used here: every case is a cold spawn.
+"""
+import asyncio, os, tempfile, time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from core.execution.checkers import ProgramChecker
+from core.execution.compile_cache import CompileCache
+from core.execution.executor import (
+    LANGUAGE_CONFIG, OUTPUT_LIMIT_BYTES, STORED_OUTPUT_CHARS, TestResult,
+    _judge, _phases, available_cores, fill_command, run_code_challenge, stdin_path,
+)
+from core.execution.process import communicate_async, elapsed_ms
+from core.execution.sandbox import RlimitSandbox
+
+COMPILE_TIMEOUT_S = 20
+
+
+async def run_code_challenge_async(code: str, language: str, test_cases,
+                                   time_limit_s: int = 5, memory_mb: int = 128,
+                                   parallel: bool = False,
+                                   max_workers: Optional[int] = None,
+                                   compile_cache: Optional[CompileCache] = None,
+                                   output_limit_bytes: Optional[int] = OUTPUT_LIMIT_BYTES,
+                                   stored_output_chars: int = STORED_OUTPUT_CHARS,
+                                   sandbox=None,
+                                   warm_pool_size: int = 0,
+                                   harness: bool = False,
+                                   sql_schema: str = "",
+                                   checker=None) -> List[TestResult]:
+    """
+    Awaitable run_code_challenge(): one TestResult per test case, in order.
+
+    With `parallel=True` up to `max_workers` (default: the cores available)
+    test cases run at once. `warm_pool_size` and `harness` are accepted for
+    the same call sites and ignored (see the module docstring). SQL runs
+    in-process anyway (see sql_engine), in a thread.
+    """
+    config = LANGUAGE_CONFIG.get(language)
+    if not config:
+        raise ValueError(f"Unsupported language: {language}")
+    if config.get("engine") == "sqlite":
+        return await asyncio.to_thread(
+            run_code_challenge, code, language, test_cases, time_limit_s=time_limit_s, memory_mb=memory_mb,
+            parallel=parallel, max_workers=max_workers, output_limit_bytes=output_limit_bytes,
+            stored_output_chars=stored_output_chars, sql_schema=sql_schema,
+        )
+
+    test_cases = list(test_cases)
+    sandbox = sandbox or RlimitSandbox()
+    t0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src_path = os.path.join(tmpdir, config.get("source", f"solution.{config['ext']}"))
+        bin_path = os.path.join(tmpdir, "solution")
+        with open(src_path, "w") as f:
+            f.write(code)
+        timings = {"setup": elapsed_ms(t0), "compile": None}
+
+        def _fill(parts):
+            return fill_command(parts, src_path, bin_path, tmpdir, memory_mb)
+
+        if "compile" in config:
+            t0 = time.perf_counter()
+            returncode, stderr = await _compile(language, config, code, tmpdir, _fill, compile_cache)
+            timings["compile"] = elapsed_ms(t0)
+            if returncode != 0:
+                return [
+                    TestResult(tc.id, "compilation_error", "", stderr, 0, tc.is_public,
+                               phases=_phases(timings))
+                    for tc in test_cases
+                ]
+
+        run_cmd   = _fill(config["cmd"])
+        rlimit_mb = memory_mb if config.get("rlimit_as", True) else None
+        slots     = asyncio.Semaphore(min(max_workers or available_cores(), len(test_cases)) if parallel else 1)
+
+        async def _run(tc):
+            async with slots:
+                async with _boxed(sandbox, rlimit_mb, time_limit_s) as box:
+                    path = stdin_path(tc)
+                    if path:
+                        with open(path, "rb") as f:
+                            run = box.finish(await _spawn(run_cmd, f, box, output_limit_bytes))
+                    else:
+                        run = box.finish(await _spawn(run_cmd, tc.stdin.encode(), box, output_limit_bytes))
+            t0 = time.perf_counter()
+            # A program checker blocks on its own child process
+            if isinstance(checker, ProgramChecker):
+                result = await asyncio.to_thread(_judge, tc, run, time_limit_s, output_limit_bytes,
+                                                 stored_output_chars, checker)
+            else:
+                result = _judge(tc, run, time_limit_s, output_limit_bytes, stored_output_chars, checker)
+            result.phases = _phases(timings, run, compare=elapsed_ms(t0))
+            return result
+
+        return list(await asyncio.gather(*(_run(tc) for tc in test_cases)))
+
+
+@asynccontextmanager
+async def _boxed(sandbox, memory_mb, time_limit_s):
+    """sandbox.box(), entered and left in a thread: setting up and tearing down a cgroup blocks."""
+    cm = sandbox.box(memory_mb, time_limit_s)
+    box = await asyncio.to_thread(cm.__enter__)
+    try:
+        yield box
+    except BaseException as exc:
+        if not await asyncio.to_thread(cm.__exit__, type(exc), exc, exc.__traceback__):
+            raise
+    else:
+        await asyncio.to_thread(cm.__exit__, None, None, None)
+
+
+async def _spawn(run_cmd, stdin, box, output_limit: Optional[int]):
+    """`stdin` is the input's bytes, or an open file the program reads directly."""
+    piped = isinstance(stdin, bytes)
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        *box.command(run_cmd, output_limit),
+        stdin=asyncio.subprocess.PIPE if piped else stdin,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    spawn_ms = elapsed_ms(t0)
+    run = await communicate_async(proc, stdin if piped else b"", box.wall_s, output_limit, box.watchdog)
+    run.spawn_ms = spawn_ms
+    return run
+
+
+async def _compile(language, config, code, tmpdir, fill, cache):
+    """executor._compile, awaiting the compiler. Returns (returncode, stderr)."""
+    key = cache.key(language, config["compile"], code) if cache else None
+    if cache:
+        # Copying artifacts and evicting are file I/O: off the event loop
+        hit = await asyncio.to_thread(cache.fetch, key, tmpdir)
+        if hit:
+            return hit.returncode, hit.stderr
+
+    proc = await asyncio.create_subprocess_exec(
+        *fill(config["compile"]),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, stderr = await asyncio.wait_for(proc.communicate(), COMPILE_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return -9, f"Compilation timed out after {COMPILE_TIMEOUT_S} s"
+    stderr = stderr.decode(errors="replace")
+    if cache:
+        await asyncio.to_thread(cache.store, key, tmpdir, config.get("artifacts", []), proc.returncode, stderr)
+    return proc.returncode, stderr
@@ -0,0 +1,202 @@
+# core/execution/benchmark.py
+"""
+Throughput benchmark of the executor (see the bench_executor management command).
+
+A fixed corpus of reference solutions per language, over four workloads:
+
+- trivial:    read a number, print it doubled; 3 test cases.
+- cpu:        a CPU-bound loop; 3 test cases.
+- io:         read IO_LINES numbers, print each doubled; 2 test cases.
+- many_cases: the trivial program over MANY_CASES test cases.
+
+Every submission is a run_code_challenge() call over all of a workload's test
+cases; `concurrency` submissions are in flight at once. Inputs and expected
+outputs are generated deterministically, so runs are comparable across
+executor changes.
+"""
+import shutil, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from core.execution.executor import LANGUAGE_CONFIG, run_code_challenge
+from core.execution.process import elapsed_ms
+
+WORKLOADS  = ("trivial", "cpu", "io", "many_cases")
+IO_LINES   = 20_000
+MANY_CASES = 50
+
+# Limits of every run: generous, so the benchmark measures the executor rather
+# than the limits (node needs about 1 GB of address space under RLIMIT_AS)
+TIME_LIMIT_S = 5
+MEMORY_MB    = 1024
+
+# Loop length of the cpu workload, so every language spends some tens of ms in it
+CPU_N = {"python": 300_000, "javascript": 3_000_000, "java": 3_000_000, "cpp": 3_000_000}
+
+SOURCES = {
+    "python": {
+        "trivial": "import sys\nprint(int(sys.stdin.read()) * 2)\n",
+        "cpu": (
+            "import sys\n"
+            "n = int(sys.stdin.read())\n"
+            "s = 0\n"
+            "for i in range(n):\n"
+            "    s = (s + i * i) % 1000003\n"
+            "print(s)\n"
+        ),
+        "io": (
+            "import sys\n"
+            "sys.stdout.write('\\n'.join(str(2 * int(x)) for x in sys.stdin.read().split()) + '\\n')\n"
+        ),
+    },
+    "javascript": {
+        "trivial": "const n = parseInt(require('fs').readFileSync(0, 'utf8'));\nconsole.log(n * 2);\n",
+        "cpu": (
+            "const n = parseInt(require('fs').readFileSync(0, 'utf8'));\n"
+            "let s = 0;\n"
+            "for (let i = 0; i < n; i++) s = (s + i * i) % 1000003;\n"
+            "console.log(s);\n"
+        ),
+        "io": (
+            "const xs = require('fs').readFileSync(0, 'utf8').trim().split(/\\s+/);\n"
+            "process.stdout.write(xs.map(x => 2 * Number(x)).join('\\n') + '\\n');\n"
+        ),
+    },
+    "java": {
+        "trivial": (
+            "import java.util.Scanner;\n"
+            "public class Solution {\n"
+            "    public static void main(String[] args) {\n"
+            "        System.out.println(new Scanner(System.in).nextLong() * 2);\n"
+            "    }\n"
+            "}\n"
+        ),
+        "cpu": (
+            "import java.util.Scanner;\n"
+            "public class Solution {\n"
+            "    public static void main(String[] args) {\n"
+            "        long n = new Scanner(System.in).nextLong(), s = 0;\n"
+            "        for (long i = 0; i < n; i++) s = (s + i * i) % 1000003;\n"
+            "        System.out.println(s);\n"
+            "    }\n"
+            "}\n"
+        ),
+        "io": (
+            "import java.io.*;\n"
+            "public class Solution {\n"
+            "    public static void main(String[] args) throws IOException {\n"
+            "        BufferedReader in = new BufferedReader(new InputStreamReader(System.in));\n"
+            "        StringBuilder out = new StringBuilder();\n"
+            "        for (String line; (line = in.readLine()) != null; )\n"
+            "            if (!line.isEmpty()) out.append(2 * Long.parseLong(line.trim())).append('\\n');\n"
+            "        System.out.print(out);\n"
+            "    }\n"
+            "}\n"
+        ),
+    },
+    "cpp": {
+        "trivial": "#include <iostream>\nint main() { long long n; std::cin >> n; std::cout << n * 2 << std::endl; }\n",
+        "cpu": (
+            "#include <iostream>\n"
+            "int main() {\n"
+            "    long long n, s = 0; std::cin >> n;\n"
+            "    for (long long i = 0; i < n; i++) s = (s + i * i) % 1000003;\n"
+            "    std::cout << s << std::endl;\n"
+            "}\n"
+        ),
+        "io": (
+            "#include <cstdio>\n"
+            "int main() { long long x; while (scanf(\"%lld\", &x) == 1) printf(\"%lld\\n\", 2 * x); }\n"
+        ),
+    },
+}
+
+
+@dataclass
+class Case:
+    id:              int
+    stdin:           str
+    expected_stdout: str
+    is_public:       bool = False
+
+
+def corpus(language: str, workload: str):
+    """The (code, test cases) of one workload."""
+    sources = SOURCES[language]
+    if workload == "trivial":
+        return sources["trivial"], [Case(i, str(n), str(2 * n)) for i, n in enumerate((21, -7, 10 ** 9))]
+    if workload == "many_cases":
+        return sources["trivial"], [Case(i, str(i * 37 - 500), str(2 * (i * 37 - 500))) for i in range(MANY_CASES)]
+    if workload == "cpu":
+        base = CPU_N[language]
+        return sources["cpu"], [Case(i, str(n), str(_cpu_answer(n))) for i, n in enumerate((base // 2, base, base + 1))]
+    if workload == "io":
+        cases = []
+        for i in range(2):
+            xs = [(k * 7919 + i) % 2_000_003 - 1_000_000 for k in range(IO_LINES)]
+            cases.append(Case(i, "\n".join(map(str, xs)) + "\n", "\n".join(str(2 * x) for x in xs)))
+        return sources["io"], cases
+    raise ValueError(f"Unknown workload: {workload}")
+
+
+def _cpu_answer(n: int) -> int:
+    # sum of i^2 for i < n, mod 1000003, in closed form
+    return ((n - 1) * n * (2 * n - 1) // 6) % 1000003
+
+
+def missing_toolchain(language: str) -> Optional[str]:
+    """The first program a language needs that is not installed, or None."""
+    config = LANGUAGE_CONFIG[language]
+    for argv in (config.get("compile"), config["cmd"]):
+        if argv and not argv[0].startswith("{") and shutil.which(argv[0]) is None:
+            return argv[0]
+    return None
+
+
+def measure(language: str, workload: str, concurrency: int, submissions: int,
+            warmup: int = 1, memory_mb: int = MEMORY_MB, **options) -> dict:
+    """Run `submissions` submissions of a workload, `concurrency` at a time, and summarise them."""
+    code, cases = corpus(language, workload)
+    options = {"time_limit_s": TIME_LIMIT_S, "memory_mb": memory_mb, **options}
+    for _ in range(warmup):
+        run_code_challenge(code, language, cases, **options)
+
+    def _submit(_):
+        t0 = time.perf_counter()
+        results = run_code_challenge(code, language, cases, **options)
+        return elapsed_ms(t0), results
+
+    latencies, peak_mb, failed = [], None, 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench") as pool:
+        for ms, results in pool.map(_submit, range(submissions)):
+            latencies.append(ms)
+            if any(r.status != "accepted" for r in results):
+                failed += 1
+            memory = [r.memory_mb for r in results if r.memory_mb is not None]
+            if memory:
+                peak_mb = max(peak_mb or 0, *memory)
+    wall_s = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "language":       language,
+        "workload":       workload,
+        "concurrency":    concurrency,
+        "submissions":    submissions,
+        "test_cases":     len(cases),
+        "failed":         failed,   # submissions not accepted: the numbers are not comparable
+        "wall_s":         round(wall_s, 3),
+        "throughput":     round(submissions / wall_s, 2),   # submissions per second
+        "latency_ms":     {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+        "peak_memory_mb": peak_mb,   # largest peak of a single run
+    }
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
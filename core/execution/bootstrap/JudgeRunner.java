@@ -0,0 +1,226 @@
+// core/execution/bootstrap/JudgeRunner.java
+//
+// Long-lived JVM used by core.execution.jvm_runner to run a compiled Java
+// solution against many test cases without paying JVM start-up per case.
+//
+// Started as `java -cp <runner-dir> JudgeRunner <solution-class-dir>`. The
+// solution's class files are read once; every test case then gets a fresh
+// class loader (so static state never leaks between cases) and its own
+// stdin/stdout/stderr files. Commands arrive on the process's stdin, one per
+// line:
+//
+//     RUN <token>\t<stdin-path>\t<stdout-path>\t<stderr-path>\t<timeout-ms>\t<output-limit-bytes>
+//
+// and each is answered on the process's stdout with
+// `DONE <token> <exit-code> <elapsed-ms> <peak-heap-kb> <leftover-threads>` or
+// `TIMEOUT <token>`, where <token> is the one of the command (so the judge can
+// tell a reply from anything the solution writes to the same descriptor) and
+// <leftover-threads> counts the threads the case started and left running.
+// After a TIMEOUT, or a case leaving threads behind, the judge kills this JVM.
+// A solution calling System.exit() ends the JVM with that code; the shutdown
+// hook flushes the case output first so the judge can still read it. Output
+// past the limit (-1 = none) is dropped, keeping one extra byte so the judge
+// sees it was hit.
+import java.io.*;
+import java.lang.management.ManagementFactory;
+import java.lang.management.MemoryPoolMXBean;
+import java.lang.management.MemoryType;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.nio.file.*;
+import java.util.HashMap;
+import java.util.HashSet;
+import java.util.Map;
+import java.util.Set;
+import java.util.stream.Stream;
+
+public class JudgeRunner {
+
+    static final class SolutionLoader extends ClassLoader {
+        private final Map<String, byte[]> classes;
+
+        SolutionLoader(Map<String, byte[]> classes, ClassLoader parent) {
+            super(parent);
+            this.classes = classes;
+        }
+
+        @Override
+        protected Class<?> findClass(String name) throws ClassNotFoundException {
+            byte[] bytes = classes.get(name);
+            if (bytes == null) {
+                throw new ClassNotFoundException(name);
+            }
+            return defineClass(name, bytes, 0, bytes.length);
+        }
+    }
+
+    static final class CappedOutputStream extends FilterOutputStream {
+        private long remaining;
+
+        CappedOutputStream(OutputStream out, long limit) {
+            super(out);
+            this.remaining = limit < 0 ? Long.MAX_VALUE : limit + 1;
+        }
+
+        @Override
+        public void write(int b) throws IOException {
+            if (remaining > 0) {
+                remaining--;
+                out.write(b);
+            }
+        }
+
+        @Override
+        public void write(byte[] b, int off, int len) throws IOException {
+            int n = (int) Math.min(len, remaining);
+            if (n > 0) {
+                remaining -= n;
+                out.write(b, off, n);
+            }
+        }
+    }
+
+    private static volatile PrintStream caseOut;
+    private static volatile PrintStream caseErr;
+
+    public static void main(String[] args) throws Exception {
+        Map<String, byte[]> classes = readClasses(Paths.get(args[0]));
+        ClassLoader parent = JudgeRunner.class.getClassLoader().getParent();
+
+        PrintStream control = new PrintStream(new FileOutputStream(FileDescriptor.out), true, "UTF-8");
+        BufferedReader commands = new BufferedReader(
+            new InputStreamReader(new FileInputStream(FileDescriptor.in), "UTF-8"));
+
+        Runtime.getRuntime().addShutdownHook(new Thread(JudgeRunner::flushCase));
+
+        String line;
+        while ((line = commands.readLine()) != null) {
+            if (!line.startsWith("RUN ")) {
+                continue;
+            }
+            String[] parts = line.substring(4).split("\t");
+            String token = parts[0];
+            int[] exitCode = {0};
+            Set<Thread> before = new HashSet<>(Thread.getAllStackTraces().keySet());
+            resetHeapPeaks();
+            long started = System.nanoTime();
+
+            try (InputStream in = new BufferedInputStream(new FileInputStream(parts[1]))) {
+                long limit = Long.parseLong(parts[5]);
+                caseOut = new PrintStream(new BufferedOutputStream(
+                    new CappedOutputStream(new FileOutputStream(parts[2]), limit)), false);
+                caseErr = new PrintStream(new BufferedOutputStream(
+                    new CappedOutputStream(new FileOutputStream(parts[3]), limit)), true);
+                System.setIn(in);
+                System.setOut(caseOut);
+                System.setErr(caseErr);
+
+                Method entry = new SolutionLoader(classes, parent)
+                    .loadClass("Solution")
+                    .getMethod("main", String[].class);
+
+                // Deep recursion is common in student code: give the case a large stack
+                Thread worker = new Thread(null, () -> {
+                    try {
+                        entry.invoke(null, (Object) new String[0]);
+                    } catch (InvocationTargetException e) {
+                        e.getCause().printStackTrace();
+                        exitCode[0] = 1;
+                    } catch (Throwable t) {
+                        t.printStackTrace();
+                        exitCode[0] = 1;
+                    }
+                }, "main", 256L * 1024 * 1024);
+                worker.setDaemon(true);
+                worker.start();
+                worker.join(Long.parseLong(parts[4]));
+
+                if (worker.isAlive()) {
+                    flushCase();
+                    control.println("TIMEOUT " + token);
+                    continue;
+                }
+            } catch (Throwable t) {
+                // Solution class missing or without `public static void main(String[])`
+                if (caseErr != null) {
+                    t.printStackTrace(caseErr);
+                }
+                exitCode[0] = 1;
+            }
+            closeCase();
+            control.println("DONE " + token + " " + exitCode[0] + " " + (System.nanoTime() - started) / 1_000_000.0
+                + " " + heapPeakKb() + " " + leftoverThreads(before));
+        }
+    }
+
+    // The JVM is shared by many cases, so its RSS says little about one case:
+    // the peak heap use since the case started is reported instead
+    private static void resetHeapPeaks() {
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {
+            if (pool.getType() == MemoryType.HEAP) {
+                pool.resetPeakUsage();
+            }
+        }
+    }
+
+    private static long heapPeakKb() {
+        long bytes = 0;
+        for (MemoryPoolMXBean pool : ManagementFactory.getMemoryPoolMXBeans()) {
+            if (pool.getType() == MemoryType.HEAP) {
+                bytes += pool.getPeakUsage().getUsed();
+            }
+        }
+        return bytes / 1024;
+    }
+
+    // Threads a case leaves running would keep using CPU and write into the
+    // next case's output: the judge replaces the JVM when there are any
+    private static int leftoverThreads(Set<Thread> before) {
+        int count = 0;
+        for (Thread thread : Thread.getAllStackTraces().keySet()) {
+            if (thread.isAlive() && !before.contains(thread)) {
+                count++;
+            }
+        }
+        return count;
+    }
+
+    private static void closeCase() {
+        flushCase();
+        if (caseOut != null) {
+            caseOut.close();
+        }
+        if (caseErr != null) {
+            caseErr.close();
+        }
+        caseOut = null;
+        caseErr = null;
+    }
+
+    private static void flushCase() {
+        PrintStream out = caseOut;
+        PrintStream err = caseErr;
+        if (out != null) {
+            out.flush();
+        }
+        if (err != null) {
+            err.flush();
+        }
+    }
+
+    private static Map<String, byte[]> readClasses(Path root) throws IOException {
+        Map<String, byte[]> classes = new HashMap<>();
+        try (Stream<Path> files = Files.walk(root)) {
+            for (Path file : (Iterable<Path>) files::iterator) {
+                String rel = root.relativize(file).toString();
+                if (!rel.endsWith(".class") || rel.startsWith(".")) {
+                    continue;
+                }
+                String name = rel.substring(0, rel.length() - ".class".length())
+                    .replace(File.separatorChar, '.');
+                classes.put(name, Files.readAllBytes(file));
+            }
+        }
+        return classes;
+    }
+}
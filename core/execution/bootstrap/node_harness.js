@@ -0,0 +1,208 @@
+// core/execution/bootstrap/node_harness.js
+//
+// Batched test harness used by core.execution.harness for JavaScript
+// challenges. Started as
+// `node node_harness.js <file> <control-fd> <report-fd> <output-limit>`.
+//
+// The student's file is loaded once per test case as a fresh module, inside
+// this one process. For the duration of a case, the usual ways of reading
+// input (`fs.readFileSync(0)`, `fs.readFileSync("/dev/stdin")`,
+// `process.stdin`) see the case's input, and everything written through
+// `process.stdout` / `process.stderr` (including console.*) is captured. A
+// case is finished once the work it scheduled (timers, stdin reads,
+// promises) has drained.
+//
+// Cases arrive on the control fd as `<length>\n<stdin bytes>` frames; one
+// JSON line per finished case is written to the report fd. A case writing
+// more than the output limit (-1 = none) to either stream is reported right
+// away and ends the harness.
+const fs = require("fs");
+const path = require("path");
+const Module = require("module");
+const { Readable } = require("stream");
+
+const file = path.resolve(process.argv[2]);
+const controlFd = Number(process.argv[3]);
+const reportFd = Number(process.argv[4]);
+const outputLimit = Number(process.argv[5]);
+const source = fs.readFileSync(file, "utf8");
+process.argv.splice(1, 5, file);
+
+class CaseExit extends Error {
+    constructor(code) {
+        super("process.exit");
+        this.code = code;
+    }
+}
+
+let current = null;  // the running case: { stdin, stdout: [], stderr: [], error, started }
+
+const capture = (key) => (chunk, encoding, callback) => {
+    if (typeof encoding === "function") {
+        callback = encoding;
+        encoding = undefined;
+    }
+    if (current) {
+        const buf = Buffer.isBuffer(chunk) ? chunk : Buffer.from(String(chunk), encoding);
+        current[key].push(buf);
+        current[`${key}Bytes`] += buf.length;
+        if (outputLimit >= 0 && current[`${key}Bytes`] > outputLimit) {
+            report(current, 1, { output_limit: true });
+            exitHarness(0);
+        }
+    }
+    if (callback) {
+        process.nextTick(callback);
+    }
+    return true;
+};
+process.stdout.write = capture("stdout");
+process.stderr.write = capture("stderr");
+
+const readFileSync = fs.readFileSync;
+fs.readFileSync = function (target, options) {
+    if (current && (target === 0 || target === "/dev/stdin")) {
+        const encoding = typeof options === "string" ? options : options && options.encoding;
+        return encoding ? current.stdin.toString(encoding) : Buffer.from(current.stdin);
+    }
+    return readFileSync.apply(this, arguments);
+};
+
+let caseStdin = null;
+Object.defineProperty(process, "stdin", { configurable: true, get: () => caseStdin });
+
+const exitHarness = process.exit.bind(process);
+process.exit = (code) => {
+    throw new CaseExit(code === undefined ? process.exitCode : code);
+};
+
+const fail = (err) => {
+    if (!current || current.error) {
+        return;
+    }
+    current.error = err;
+};
+process.on("uncaughtException", fail);
+process.on("unhandledRejection", fail);
+
+function readExactly(length) {
+    const buf = Buffer.alloc(length);
+    let offset = 0;
+    while (offset < length) {
+        const n = fs.readSync(controlFd, buf, offset, length - offset, null);
+        if (n === 0) {
+            throw new Error("control stream closed mid-frame");
+        }
+        offset += n;
+    }
+    return buf;
+}
+
+function readFrame() {
+    let header = "";
+    const byte = Buffer.alloc(1);
+    for (;;) {
+        if (fs.readSync(controlFd, byte, 0, 1, null) === 0) {
+            return null;
+        }
+        if (byte[0] === 10) {
+            return readExactly(Number(header));
+        }
+        header += String.fromCharCode(byte[0]);
+    }
+}
+
+const idle = () => new Promise((resolve) => setImmediate(resolve));
+
+async function drain(baseline) {
+    // Quiet for two consecutive turns of the event loop: nothing left but our own handles
+    let quiet = 0;
+    while (quiet < 2 && !(current.error instanceof CaseExit)) {
+        await idle();
+        quiet = process.getActiveResourcesInfo().length <= baseline ? quiet + 1 : 0;
+    }
+}
+
+function exitCodeOf(state) {
+    const err = state.error;
+    if (err instanceof CaseExit) {
+        return Number(err.code) || 0;
+    }
+    if (err) {
+        state.stderr.push(Buffer.from(`${err && err.stack ? err.stack : err}\n`));
+        return 1;
+    }
+    return Number(process.exitCode) || 0;
+}
+
+async function main() {
+    for (;;) {
+        const stdin = readFrame();
+        if (stdin === null) {
+            break;
+        }
+        current = { stdin, stdout: [], stderr: [], stdoutBytes: 0, stderrBytes: 0, error: null };
+        caseStdin = Readable.from([stdin]);
+        process.exitCode = undefined;
+
+        const baseline = process.getActiveResourcesInfo().length;
+        current.started = process.hrtime.bigint();
+        current.cpuStarted = process.cpuUsage();
+        try {
+            const mod = new Module(file, null);
+            mod.filename = file;
+            mod.paths = Module._nodeModulePaths(path.dirname(file));
+            mod._compile(source, file);
+        } catch (err) {
+            fail(err);
+        }
+        await drain(baseline);
+
+        const state = current;
+        current = null;
+        report(state, exitCodeOf(state));
+
+        if (process.getActiveResourcesInfo().length > baseline) {
+            // Exited with work still scheduled: it would leak into the next case,
+            // so stop here and let the judge run the remaining cases in isolation
+            break;
+        }
+    }
+}
+
+function report(state, returncode, extra) {
+    const elapsed = Number(process.hrtime.bigint() - state.started) / 1e6;
+    const cpu = process.cpuUsage(state.cpuStarted);
+    const cap = (chunks) => {
+        const buf = Buffer.concat(chunks);
+        return (outputLimit >= 0 ? buf.subarray(0, outputLimit + 1) : buf).toString("base64");
+    };
+    writeAll(Buffer.from(JSON.stringify({
+        returncode,
+        stdout: cap(state.stdout),
+        stderr: cap(state.stderr),
+        time_ms: Math.round(elapsed * 100) / 100,
+        cpu_ms: Math.round((cpu.user + cpu.system) / 10) / 100,
+        memory_kb: peakRssKb(),
+        ...extra,
+    }) + "\n"));
+}
+
+// VmHWM covers this program only; resourceUsage().maxRSS would include the
+// RSS the judge had when it forked this process
+function peakRssKb() {
+    try {
+        return Number(/VmHWM:\s+(\d+)/.exec(readFileSync("/proc/self/status", "utf8"))[1]);
+    } catch (err) {
+        return process.resourceUsage().maxRSS;
+    }
+}
+
+function writeAll(buf) {
+    let offset = 0;
+    while (offset < buf.length) {
+        offset += fs.writeSync(reportFd, buf, offset, buf.length - offset);
+    }
+}
+
+main().then(() => exitHarness(0));
@@ -0,0 +1,19 @@
+// core/execution/bootstrap/node_spare.js
+//
+// Pre-started Node process used by core.execution.warm_pool.
+// Started as `node node_spare.js <control-fd>`: the interpreter boots while the
+// spare sits idle, then blocks on the control pipe until the judge writes the
+// path of the student's file, and runs it exactly like `node <file>` would.
+// Each spare runs one program only; stdin/stdout/stderr are the process's own.
+//
+// Nothing is reported back from here: the program could overwrite it. The
+// judge measures the spare's CPU time and peak memory from outside.
+const fs = require("fs");
+const Module = require("module");
+
+const controlFd = Number(process.argv[2]);
+const file = fs.readFileSync(controlFd, "utf8").trim();
+fs.closeSync(controlFd);
+
+process.argv.splice(1, 2, file);
+Module.runMain();
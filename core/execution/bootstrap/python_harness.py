@@ -0,0 +1,133 @@
+# core/execution/bootstrap/python_harness.py
+"""
+Batched test harness used by core.execution.harness for Python challenges.
+
+Started as `python3 python_harness.py <file> <control-fd> <report-fd>
+<output-limit>`. The student's file is compiled once; every test case then
+runs it again in a fresh `__main__` namespace, exactly like `python3 <file>`
+would see it: the case's input is on fd 0 and its output is captured from
+fds 1 and 2, so `sys.stdin`, `input()` and `open(0)` all behave as in an
+isolated run.
+
+Cases arrive on the control fd as `<length>\\n<stdin bytes>` frames; one JSON
+line per finished case is written to the report fd. While a case runs,
+RLIMIT_FSIZE caps its output files one byte past the output limit (-1 = none).
+
+This file runs outside Django and must only use the standard library.
+"""
+import base64, io, json, os, resource, sys, tempfile, time, traceback
+
+
+def _exit_code(exc: SystemExit) -> int:
+    # Mirrors the interpreter's own handling of an uncaught SystemExit
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _read_frame(control):
+    header = control.readline()
+    if not header:
+        return None
+    return control.read(int(header))
+
+
+def _redirect(files):
+    for target, f in enumerate(files):
+        os.dup2(f.fileno(), target)
+    sys.stdin  = sys.__stdin__  = io.TextIOWrapper(io.open(0, "rb", closefd=False))
+    sys.stdout = sys.__stdout__ = io.TextIOWrapper(io.open(1, "wb", closefd=False))
+    sys.stderr = sys.__stderr__ = io.TextIOWrapper(
+        io.open(2, "wb", closefd=False), errors="backslashreplace", line_buffering=True,
+    )
+
+
+def _set_file_limit(limit: int):
+    _, hard = resource.getrlimit(resource.RLIMIT_FSIZE)
+    try:
+        resource.setrlimit(resource.RLIMIT_FSIZE, (hard if limit < 0 else limit, hard))
+    except (ValueError, resource.error):
+        pass
+
+
+def _peak_rss_kb() -> int:
+    # VmHWM covers this program only; getrusage() would include the RSS the judge
+    # had when it forked this process
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _run_case(code, path) -> int:
+    namespace = {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__}
+    try:
+        exec(code, namespace)
+    except SystemExit as exc:
+        return _exit_code(exc)
+    except BaseException as exc:
+        # Skip this frame so the traceback starts in the student's file
+        traceback.print_exception(type(exc), exc, exc.__traceback__.tb_next)
+        return 1
+    return 0
+
+
+def main():
+    path = sys.argv[1]
+    control = io.open(int(sys.argv[2]), "rb")
+    report  = io.open(int(sys.argv[3]), "wb")
+    output_limit = int(sys.argv[4])
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(path)
+
+    with open(path, "rb") as f:
+        code = compile(f.read(), path, "exec")
+
+    files = [tempfile.TemporaryFile() for _ in range(3)]
+    while True:
+        stdin = _read_frame(control)
+        if stdin is None:
+            break
+        for f in files:
+            f.seek(0)
+            f.truncate()
+        files[0].write(stdin)
+        files[0].flush()
+        files[0].seek(0)
+        _redirect(files)
+
+        _set_file_limit(output_limit + 1 if output_limit >= 0 else -1)
+        t0, cpu0 = time.perf_counter(), time.process_time()
+        returncode = _run_case(code, path)
+        for stream in (sys.stdout, sys.stderr):
+            try:
+                stream.flush()
+            except Exception:
+                returncode = returncode or 120
+        elapsed = round((time.perf_counter() - t0) * 1000, 2)
+        cpu_ms  = round((time.process_time() - cpu0) * 1000, 2)
+        _set_file_limit(-1)
+
+        out, err = files[1], files[2]
+        out.seek(0)
+        err.seek(0)
+        report.write(json.dumps({
+            "returncode": returncode,
+            "stdout":     base64.b64encode(out.read()).decode(),
+            "stderr":     base64.b64encode(err.read()).decode(),
+            "time_ms":    elapsed,
+            "cpu_ms":     cpu_ms,
+            "memory_kb":  _peak_rss_kb(),
+        }).encode() + b"\n")
+        report.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# core/execution/bootstrap/python_zygote.py
+"""
+Warm Python fork-server used by core.execution.warm_pool.
+
+Started once as `python3 python_zygote.py <socket-fd>`. For every request it
+receives (a JSON line plus the stdin/stdout/stderr file descriptors passed with
+SCM_RIGHTS) it forks a child that runs the student's file exactly like
+`python3 <file>` would, waits for it and reports the exit status back.
+
+A request carrying `argv` instead of `file` execs that command in the child
+(any language). Forking from this small process rather than from the judge
+keeps the child's peak RSS honest: Linux carries the pre-exec memory
+high-water mark into the exec'd program's rusage.
+
+A request carrying `cgroup` (see core.execution.sandbox) has the child join
+that cgroup before anything else; limits given as null are left to it. Its
+`cpus` are the CPUs the child may run on: those of the judge thread that sent
+the request, as a child it spawned itself would inherit (see timing.pinned).
+
+This file runs outside Django and must only use the standard library.
+"""
+import io, json, os, resource, signal, socket, sys, traceback
+
+
+def _apply_limits(memory_mb, cpu_s, output_limit):
+    # Same limits as the shell wrapper of core.execution.sandbox.Box.popen
+    if memory_mb is not None:
+        try:
+            mem = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
+        except (ValueError, resource.error):
+            pass
+    if cpu_s is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_CPU, (cpu_s, cpu_s))
+        except (ValueError, resource.error):
+            pass
+    if output_limit is not None:
+        try:
+            resource.setrlimit(resource.RLIMIT_FSIZE, (output_limit + 1, output_limit + 1))
+        except (ValueError, resource.error):
+            pass
+
+
+def _exit_code(exc: SystemExit) -> int:
+    # Mirrors the interpreter's own handling of an uncaught SystemExit
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+
+def _join_cgroup(path):
+    try:
+        with open(os.path.join(path, "cgroup.procs"), "w") as f:
+            f.write(str(os.getpid()))
+    except OSError as exc:
+        os.write(2, f"cannot join cgroup: {exc.strerror}\n".encode())
+        os._exit(125)
+
+
+def _run_child(req: dict, fds, sock: socket.socket):
+    sock.close()
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    if req.get("cgroup"):
+        _join_cgroup(req["cgroup"])
+    if req.get("cpus"):
+        try:
+            os.sched_setaffinity(0, req["cpus"])
+        except OSError:
+            pass
+
+    if "argv" in req:
+        _exec_child(req)
+
+    path = req["file"]
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(path)
+    sys.stdin  = sys.__stdin__  = io.TextIOWrapper(io.open(0, "rb", closefd=False))
+    sys.stdout = sys.__stdout__ = io.TextIOWrapper(io.open(1, "wb", closefd=False))
+    sys.stderr = sys.__stderr__ = io.TextIOWrapper(
+        io.open(2, "wb", closefd=False), errors="backslashreplace", line_buffering=True,
+    )
+
+    _apply_limits(req["memory_mb"], req["cpu_s"], req.get("output_limit"))
+
+    code = 0
+    try:
+        with open(path, "rb") as f:
+            source = f.read()
+        namespace = {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__}
+        exec(compile(source, path, "exec"), namespace)
+    except SystemExit as exc:
+        code = _exit_code(exc)
+    except BaseException as exc:
+        # Skip this frame so the traceback starts in the student's file
+        traceback.print_exception(type(exc), exc, exc.__traceback__.tb_next)
+        code = 1
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            code = code or 120
+    os._exit(code)
+
+
+def _exec_child(req: dict):
+    # Like subprocess's restore_signals: undo the interpreter's SIG_IGN before exec
+    for name in ("SIGPIPE", "SIGXFSZ"):
+        signal.signal(getattr(signal, name), signal.SIG_DFL)
+    _apply_limits(req["memory_mb"], req["cpu_s"], req.get("output_limit"))
+    try:
+        os.execvp(req["argv"][0], req["argv"])
+    except OSError as exc:
+        os.write(2, f"{req['argv'][0]}: {exc.strerror}\n".encode())
+    os._exit(127)
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    while True:
+        try:
+            msg, fds, _, _ = socket.recv_fds(sock, 65536, 3)
+        except OSError:
+            break
+        if not msg:
+            break  # parent went away
+        req = json.loads(msg)
+
+        pid = os.fork()
+        if pid == 0:
+            _run_child(req, fds, sock)
+        for fd in fds:
+            os.close(fd)
+        sock.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+
+        _, status, usage = os.wait4(pid, 0)
+        sock.sendall(json.dumps({
+            "returncode": os.waitstatus_to_exitcode(status),
+            "maxrss_kb":  usage.ru_maxrss,
+            "cpu_ms":     round((usage.ru_utime + usage.ru_stime) * 1000, 2),
+            "user_ms":    round(usage.ru_utime * 1000, 2),
+            "sys_ms":     round(usage.ru_stime * 1000, 2),
+        }).encode() + b"\n")
+
+
+if __name__ == "__main__":
+    main()
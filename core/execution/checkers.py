@@ -0,0 +1,159 @@
+# core/execution/checkers.py
+"""
+Output checkers: whether a run's output answers its test case.
+
+A checker is called as checker(tc, stdout) with the run's raw stdout bytes and
+returns None when the output is accepted, or else a message saying where it
+goes wrong (shown to the student for public test cases). The expected output
+is read from the test case's `expected_path` when it has one (file-backed
+test data, see core.utils.test_data), memory-mapped rather than loaded.
+
+- "tokens" (the default, see TokenChecker): outputs compare as sequences of
+  whitespace-separated tokens, so line endings, trailing spaces and blank
+  lines do not matter. Tokens are matched lazily as they are read and the
+  comparison stops at the first mismatch. Numbers may compare within a
+  relative/absolute `float_epsilon`.
+- "exact" (ExactChecker): the whole outputs, stripped, must be equal.
+- "program" (ProgramChecker): a teacher-supplied Python program decides,
+  run inside the judge's sandbox like student code.
+"""
+import math, mmap, os, re, subprocess, tempfile
+from contextlib import contextmanager
+from itertools import zip_longest
+from typing import Optional
+
+from core.execution.process import communicate
+from core.execution.sandbox import RlimitSandbox
+
+CHECKERS = ("tokens", "exact", "program")
+
+CHECKER_TIME_LIMIT_S  = 5
+CHECKER_MEMORY_MB     = 256
+CHECKER_OUTPUT_LIMIT  = 64 * 1024
+CHECKER_ACCEPT        = 42   # exit status of a checker program accepting the output
+CHECKER_REJECT        = 43   # and rejecting it
+MESSAGE_TOKEN_CHARS   = 40   # longest token quoted in a mismatch message
+
+_TOKEN = re.compile(rb"\S+")
+
+
+def get_checker(name: str = "tokens", float_epsilon: Optional[float] = None,
+                program: str = "", sandbox=None):
+    """The checker called `name` (see CHECKERS). Raises ValueError for an unknown one."""
+    if name == "tokens":
+        return TokenChecker(float_epsilon)
+    if name == "exact":
+        return ExactChecker()
+    if name == "program":
+        if not program.strip():
+            raise ValueError("The 'program' checker needs a checker program.")
+        return ProgramChecker(program, sandbox)
+    raise ValueError(f"Unknown checker: {name}")
+
+
+class TokenChecker:
+    def __init__(self, float_epsilon: Optional[float] = None):
+        self.float_epsilon = float_epsilon
+
+    def __call__(self, tc, stdout: bytes) -> Optional[str]:
+        with expected_output(tc) as expected:
+            return self._compare(stdout, expected)
+
+    def _compare(self, stdout: bytes, expected) -> Optional[str]:
+        pairs = zip_longest(_TOKEN.finditer(stdout), _TOKEN.finditer(expected))
+        for n, (got, want) in enumerate(pairs, 1):
+            if got is None:
+                return f"Output ends at token {n}: expected {_quote(want.group())}"
+            if want is None:
+                return f"Extra output at token {n} (line {_line(stdout, got)}): {_quote(got.group())}"
+            if got.group() != want.group() and not self._close(got.group(), want.group()):
+                return (f"Token {n} (line {_line(stdout, got)}): "
+                        f"expected {_quote(want.group())}, got {_quote(got.group())}")
+        return None
+
+    def _close(self, got: bytes, want: bytes) -> bool:
+        if self.float_epsilon is None:
+            return False
+        try:
+            a, b = float(got), float(want)
+        except ValueError:
+            return False
+        return math.isclose(a, b, rel_tol=self.float_epsilon, abs_tol=self.float_epsilon)
+
+
+class ExactChecker:
+    def __call__(self, tc, stdout: bytes) -> Optional[str]:
+        with expected_output(tc) as expected:
+            if stdout.strip() == expected[:].strip():
+                return None
+        return "Output differs from the expected output"
+
+
+class ProgramChecker:
+    """
+    Runs `python3 checker.py <input> <expected> <output>` in a box of `sandbox`.
+    Exit status 42 accepts the output, 43 rejects it (DOMjudge's convention:
+    an uncaught exception exits with 1); the first line the checker prints is
+    the message. Anything else (a crash, a timeout) rejects the output with
+    the checker's error, so a broken checker never accepts.
+    """
+
+    def __init__(self, program: str, sandbox=None):
+        self.program = program
+        self.sandbox = sandbox or RlimitSandbox()
+
+    def __call__(self, tc, stdout: bytes) -> Optional[str]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for name, data, path in (("checker.py", self.program, None),
+                                     ("input.txt", tc.stdin, getattr(tc, "stdin_path", None)),
+                                     ("expected.txt", tc.expected_stdout, getattr(tc, "expected_path", None)),
+                                     ("output.txt", stdout, None)):
+                if path is None:  # file-backed test data is passed as it is
+                    path = os.path.join(tmpdir, name)
+                    with open(path, "wb") as f:
+                        f.write(data.encode() if isinstance(data, str) else data)
+                paths.append(path)
+
+            with self.sandbox.box(CHECKER_MEMORY_MB, CHECKER_TIME_LIMIT_S) as box:
+                proc = box.popen(
+                    ["python3", *paths], CHECKER_OUTPUT_LIMIT,
+                    stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=tmpdir,
+                )
+                run = box.finish(communicate(proc, b"", box.wall_s, CHECKER_OUTPUT_LIMIT, box.watchdog))
+
+        message = run.stdout.decode(errors="replace").strip().split("\n")[0]
+        if run.timed_out:
+            return f"Checker failed: no verdict within {CHECKER_TIME_LIMIT_S} s"
+        if run.returncode == CHECKER_ACCEPT:
+            return None
+        if run.returncode == CHECKER_REJECT:
+            return message or "Wrong answer"
+        error = run.stderr.decode(errors="replace").strip().split("\n")[-1]
+        return f"Checker failed (exit status {run.returncode}): {error or message}"
+
+
+@contextmanager
+def expected_output(tc):
+    """A test case's expected output as bytes, or as a read-only mmap of its file."""
+    path = getattr(tc, "expected_path", None)
+    if not path:
+        yield tc.expected_stdout.encode()
+        return
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b""  # an empty file cannot be mapped
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def _line(data: bytes, match) -> int:
+    return data.count(b"\n", 0, match.start()) + 1
+
+
+def _quote(token: bytes) -> str:
+    text = token.decode(errors="replace")
+    if len(text) > MESSAGE_TOKEN_CHARS:
+        text = text[:MESSAGE_TOKEN_CHARS] + "..."
+    return f"'{text}'"
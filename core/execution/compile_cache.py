@@ -0,0 +1,145 @@
+# core/execution/compile_cache.py
+"""
+On-disk cache of compiled artifacts (C++ binaries, Java classes).
+
+Entries are content-addressed: the key is a hash of the language, the compile
+command template (compiler + flags) and the source, so pressing Run twice on
+unchanged code compiles once. Failed compilations are cached too, together
+with the compiler output.
+
+Layout: <root>/<key[:2]>/<key>/ holding `meta.json` plus the artifacts.
+
+Concurrency: an entry is built in a private temp dir and published with an
+atomic rename, so readers never see a half-written entry. Artifacts are
+copied in and out of the cache rather than linked: student code runs with
+write access to its run directory and must not be able to alter a cached
+artifact, and an entry evicted mid-run cannot pull a binary away from under a
+running process. Eviction is least recently used (an entry's mtime is
+bumped on every hit), bounded by total size, and serialised across
+processes with an flock.
+"""
+import fcntl, glob, hashlib, json, os, shutil, threading, time, uuid
+from dataclasses import dataclass
+from typing import Optional
+
+_META = "meta.json"
+_STALE_STAGING_S = 3600
+
+
+@dataclass
+class CachedCompile:
+    returncode: int
+    stderr:     str
+
+
+class CompileCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root      = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(language: str, compile_cmd, source: str) -> str:
+        h = hashlib.sha256()
+        for part in (language, json.dumps(compile_cmd), source):
+            h.update(part.encode())
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def fetch(self, key: str, dest_dir: str) -> Optional[CachedCompile]:
+        """Copy a cached entry's artifacts into `dest_dir`. Returns None on a miss."""
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, _META)) as f:
+                meta = json.load(f)
+            for name in meta["artifacts"]:
+                _copy(os.path.join(entry, name), os.path.join(dest_dir, name))
+            os.utime(entry)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None  # absent, evicted concurrently, or corrupt
+        return CachedCompile(meta["returncode"], meta["stderr"].replace("{dir}", dest_dir))
+
+    def store(self, key: str, src_dir: str, patterns, returncode: int, stderr: str):
+        """Publish the artifacts in `src_dir` matching `patterns` under `key`."""
+        entry   = self._entry(key)
+        staging = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        try:
+            names = []
+            if returncode == 0:
+                for pattern in patterns:
+                    for path in glob.glob(os.path.join(src_dir, pattern), recursive=True):
+                        name = os.path.relpath(path, src_dir)
+                        _copy(path, os.path.join(staging, name))
+                        names.append(name)
+            with open(os.path.join(staging, _META), "w") as f:
+                json.dump({
+                    "returncode": returncode,
+                    "stderr":     stderr.replace(src_dir, "{dir}"),
+                    "artifacts":  names,
+                }, f)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                pass  # another worker published the same key first
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        with open(os.path.join(self.root, ".evict.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another process is already evicting
+
+            # Staging dirs left behind by a worker that died mid-store
+            for staging in glob.glob(os.path.join(self.root, ".tmp-*")):
+                try:
+                    if time.time() - os.path.getmtime(staging) > _STALE_STAGING_S:
+                        shutil.rmtree(staging, ignore_errors=True)
+                except FileNotFoundError:
+                    continue
+
+            entries, total = [], 0
+            for entry in glob.glob(os.path.join(self.root, "??", "*")):
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(dirpath, name))
+                        for dirpath, _, files in os.walk(entry) for name in files
+                    )
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except FileNotFoundError:
+                    continue
+                total += size
+
+            for _, size, entry in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+
+def _copy(src: str, dst: str):
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    shutil.copy2(src, dst)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(root: str, max_mb: int) -> Optional[CompileCache]:
+    """Process-wide CompileCache for `root`, or None when caching is disabled."""
+    if not root or max_mb <= 0:
+        return None
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = CompileCache(root, max_mb * 1024 * 1024)
+        return cache
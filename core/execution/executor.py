@@ -1,106 +1,428 @@
 # core/execution/executor.py
-import subprocess, tempfile, os, resource, time
+import subprocess, tempfile, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional
+
+from core.execution import harness as batch_harness, jvm_runner, sql_engine, warm_pool
+from core.execution.checkers import TokenChecker
+from core.execution.compile_cache import CompileCache
+from core.execution.process import ProcessRun, communicate, elapsed_ms, over_limit, truncate_middle
+from core.execution.sandbox import RlimitSandbox
 
 LANGUAGE_CONFIG = {
     "python":     {"ext": "py",   "cmd": ["python3", "{file}"]},
     "javascript": {"ext": "js",   "cmd": ["node",    "{file}"]},
-    "java":       {"ext": "java", "cmd": ["java", "-cp", "{dir}", "Solution"]},
+    "java":       {"ext": "java",
+                   "source":    "Solution.java",   # javac requires the file to match `public class Solution`
+                   "compile":   ["javac", "-encoding", "UTF-8", "-d", "{dir}", "{file}"],
+                   "artifacts": ["**/*.class"],
+                   "cmd":       ["java", "{jvm_args}", "-cp", "{dir}", "Solution"],
+                   "runner":    "jvm",             # test cases run in persistent JVMs, see jvm_runner
+                   "rlimit_as": False},            # memory is bounded by -Xmx instead
     "cpp":        {"ext": "cpp",
-                   "compile": ["g++", "-O2", "-o", "{bin}", "{file}"],
-                   "cmd":     ["{bin}"]},
+                   "compile":   ["g++", "-O2", "-o", "{bin}", "{file}"],
+                   "artifacts": ["solution"],   # files kept by the compile cache
+                   "cmd":       ["{bin}"]},
+    "sql":        {"ext": "sql",
+                   "engine":    "sqlite"},         # queries run in-process, see sql_engine
 }
 
+OUTPUT_LIMIT_BYTES  = 8 * 1024 * 1024   # per stream; the run is killed beyond this
+STORED_OUTPUT_CHARS = 64 * 1024         # kept per stream in a TestResult (prefix + suffix)
+
+# What each runtime prints when an allocation fails under the memory limit
+MEMORY_ERROR_MARKERS = (
+    b"MemoryError",                    # python
+    b"std::bad_alloc",                 # c++
+    b"JavaScript heap out of memory",  # node
+    b"Fatal process out of memory",    # node (V8 could not reserve memory)
+    b"java.lang.OutOfMemoryError",     # java (-Xmx)
+)
+
+# Timed phases of a run, in TestResult.phases (ms; None when not measured). setup
+# and compile are shared by all test cases of a run; wall is the program's run
+# time from the judge's side, spawn the start-up before it, user and sys its CPU time.
+PHASES = ("setup", "compile", "spawn", "user", "sys", "wall", "compare")
+
+DEFAULT_CHECKER = TokenChecker()   # outputs compare token by token (see checkers)
+
+
 @dataclass
 class TestResult:
     test_case_id:  str
-    status:        str    # accepted | wrong_answer | time_limit | runtime_error | compilation_error
+    status:        str    # accepted | wrong_answer | time_limit | memory_limit | output_limit | runtime_error | compilation_error | skipped
     stdout:        str
     stderr:        str
     time_ms:       float
     is_public:     bool
+    memory_mb:     Optional[float] = None   # peak RSS (heap for java)
+    cpu_ms:        Optional[float] = None   # CPU time, next to the wall time in time_ms
+    phases:        Optional[dict]  = None   # ms per phase of the run, see PHASES
+    message:       Optional[str]   = None   # the checker's note on a wrong answer, e.g. the first mismatch
 
 
 def run_code_challenge(code: str, language: str, test_cases,
-                       time_limit_s: int = 5, memory_mb: int = 128) -> List[TestResult]:
+                       time_limit_s: int = 5, memory_mb: int = 128,
+                       parallel: bool = False,
+                       max_workers: Optional[int] = None,
+                       warm_pool_size: int = 0,
+                       compile_cache: Optional[CompileCache] = None,
+                       harness: bool = False,
+                       output_limit_bytes: Optional[int] = OUTPUT_LIMIT_BYTES,
+                       stored_output_chars: int = STORED_OUTPUT_CHARS,
+                       sandbox=None,
+                       fail_fast: bool = False,
+                       sql_schema: str = "",
+                       checker=None) -> List[TestResult]:
+    """
+    Run `code` against every test case and return one TestResult per case,
+    in the order of `test_cases`.
+
+    With `warm_pool_size > 0`, python and javascript runs are served by
+    pre-started interpreters (see warm_pool) instead of a cold spawn per case.
+    Compiled languages reuse artifacts from `compile_cache` when the same
+    source was compiled before.
+
+    With `parallel=True` the test cases are fanned out over a thread pool of at
+    most `max_workers` (default: the cores available to this process). Every
+    case still runs in its own child process with its own time and memory limits.
+
+    With `harness=True` (python and javascript only) the test cases are first
+    run in batches inside single harness processes (see harness); only cases
+    the harness could not report are then run in isolation.
+
+    Every result carries the run's peak memory; runs that fail allocating
+    memory under the limit are `memory_limit` rather than `runtime_error`.
+
+    Output is captured as it is produced: a run writing more than
+    `output_limit_bytes` to stdout or stderr is stopped with `output_limit`.
+    The outputs kept in the results are cut to `stored_output_chars` (start
+    and end) after judging.
+
+    Every result carries the time spent in each phase of its run (see PHASES),
+    to tell the judge's own overhead from the time taken by the student's code.
+
+    Every run is confined by `sandbox` (see sandbox; rlimits by default). With
+    the cgroup backend, time limits apply to CPU time; the CPU time of each
+    run is reported next to its wall time either way.
+
+    With `fail_fast=True` the test cases run one at a time, whatever
+    `parallel` says, cheapest (smallest input) first, and none is started once
+    one has failed; the cases left out are reported as `skipped`. Nothing is
+    in flight next to a failing case, so a suite of timeouts costs one limit.
+
+    Outputs are judged by `checker` (see checkers; by default token by token).
+
+    A test case whose `stdin_path` is set (see core.utils.test_data) gets that
+    file as its stdin, opened straight onto the child: large inputs never go
+    through this process. Such cases are cold spawns (no warm pool, JVM or
+    harness). Likewise the checkers read `expected_path` when set.
+
+    SQL queries run in-process on a copy of `sql_schema` (see sql_engine);
+    a test case's stdin is SQL loading its data, and its expected output is
+    the result rows, compared in canonical form whatever the `checker`.
+    """
     config  = LANGUAGE_CONFIG.get(language)
     if not config:
         raise ValueError(f"Unsupported language: {language}")
 
-    results = []
+    test_cases = list(test_cases)
+    # fail_fast runs one case at a time: cases running next to a failing one could not be stopped
+    workers = min(max_workers or available_cores(), len(test_cases)) if parallel and not fail_fast else 1
+    if config.get("engine") == "sqlite":
+        return _run_sql(code, sql_schema, test_cases, time_limit_s, memory_mb, output_limit_bytes,
+                        stored_output_chars, workers, fail_fast)
+
+    sandbox = sandbox or RlimitSandbox()
+    t0 = time.perf_counter()
     with tempfile.TemporaryDirectory() as tmpdir:
         ext      = config["ext"]
-        src_path = os.path.join(tmpdir, f"solution.{ext}")
+        src_path = os.path.join(tmpdir, config.get("source", f"solution.{ext}"))
         bin_path = os.path.join(tmpdir, "solution")
 
         with open(src_path, "w") as f:
             f.write(code)
+        timings = {"setup": elapsed_ms(t0), "compile": None}
+
+        def _fill(parts):
+            return fill_command(parts, src_path, bin_path, tmpdir, memory_mb)
 
         # Compile step (C++ / Java)
         if "compile" in config:
-            compile_cmd = [
-                p.replace("{file}", src_path)
-                 .replace("{bin}",  bin_path)
-                 .replace("{dir}",  tmpdir)
-                for p in config["compile"]
-            ]
-            cp = subprocess.run(compile_cmd, capture_output=True, timeout=20)
-            if cp.returncode != 0:
+            t0 = time.perf_counter()
+            returncode, stderr = _compile(language, config, code, tmpdir, _fill, compile_cache)
+            timings["compile"] = elapsed_ms(t0)
+            if returncode != 0:
                 return [
-                    TestResult(tc.id, "compilation_error", "",
-                               cp.stderr.decode(errors="replace"), 0, tc.is_public)
+                    TestResult(tc.id, "compilation_error", "", stderr, 0, tc.is_public,
+                               phases=_phases(timings))
                     for tc in test_cases
                 ]
 
-        for tc in test_cases:
-            run_cmd = [
-                p.replace("{file}", src_path)
-                 .replace("{bin}",  bin_path)
-                 .replace("{dir}",  tmpdir)
-                for p in config["cmd"]
-            ]
+        run_cmd = _fill(config["cmd"])
+        spawner = warm_pool.get_spawner(max(workers, available_cores()))
+        rlimit_mb = memory_mb if config.get("rlimit_as", True) else None
 
-            t0 = time.perf_counter()
-            try:
-                proc = subprocess.run(
-                    run_cmd,
-                    input=tc.stdin.encode(),
-                    capture_output=True,
-                    timeout=time_limit_s,
-                    preexec_fn=lambda: _apply_limits(memory_mb, time_limit_s),
-                )
-                elapsed = round((time.perf_counter() - t0) * 1000, 2)
-
-                actual   = proc.stdout.decode(errors="replace").strip()
-                expected = tc.expected_stdout.strip()
-
-                if proc.returncode != 0:
-                    status = "runtime_error"
-                elif actual == expected:
-                    status = "accepted"
-                else:
-                    status = "wrong_answer"
-
-                results.append(TestResult(
-                    tc.id, status, actual,
-                    proc.stderr.decode(errors="replace"),
-                    elapsed, tc.is_public
-                ))
-
-            except subprocess.TimeoutExpired:
-                results.append(TestResult(tc.id, "time_limit", "", "", time_limit_s * 1000, tc.is_public))
-
-    return results
-
-
-def _apply_limits(memory_mb: int, time_limit_s: int):
+        def _launch(stdin, box) -> ProcessRun:
+            return _spawn(run_cmd, stdin, box, output_limit_bytes, spawner)
+
+        batched = {}
+        inline  = [tc for tc in test_cases if not stdin_path(tc)]
+        if harness and batch_harness.supports(language) and inline:
+            batched = _run_batches(language, src_path, inline, time_limit_s, memory_mb,
+                                   output_limit_bytes, workers, sandbox)
+
+        with _warm_runner(language, config, tmpdir, memory_mb, workers, warm_pool_size, compile_cache,
+                          time_limit_s, output_limit_bytes, sandbox) as warm:
+
+            def _run(tc):
+                run = batched.get(tc.id)
+                if run is None:
+                    run = _execute(src_path, tc, time_limit_s, rlimit_mb, output_limit_bytes,
+                                   sandbox, _launch, warm)
+                t0 = time.perf_counter()
+                result = _judge(tc, run, time_limit_s, output_limit_bytes, stored_output_chars, checker)
+                result.phases = _phases(timings, run, compare=elapsed_ms(t0))
+                return result
+
+            return _run_cases(test_cases, _run, workers, fail_fast, done=batched)
+
+
+def _run_cases(test_cases, run, workers: int, fail_fast: bool, done=()) -> List[TestResult]:
+    """
+    run(tc) over the test cases, `workers` at a time; results in test case
+    order. With `fail_fast`, one at a time, cheapest first, and no case started
+    after a failure, except those already run (ids in `done`), which are
+    judged regardless.
+    """
+    if fail_fast:
+        workers = 1
+    failed = threading.Event()
+    order  = sorted(test_cases, key=_cost) if fail_fast else test_cases
+
+    def _run(tc):
+        if failed.is_set() and tc.id not in done:
+            return TestResult(tc.id, "skipped", "", "", 0, tc.is_public)
+        result = run(tc)
+        if fail_fast and result.status != "accepted":
+            failed.set()
+        return result
+
+    if workers <= 1:
+        results = [_run(tc) for tc in order]
+    else:
+        # pool.map yields results in submission order, not completion order
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="judge") as pool:
+            results = list(pool.map(_run, order))
+
+    by_case = {id(tc): r for tc, r in zip(order, results)}
+    return [by_case[id(tc)] for tc in test_cases]
+
+
+def _run_sql(query, schema, test_cases, time_limit_s, memory_mb, output_limit, stored_output_chars,
+             workers, fail_fast) -> List[TestResult]:
+    """run_code_challenge() for SQL: every test case on its own copy of the schema's template."""
+    t0 = time.perf_counter()
+    fixture = sql_engine.template(schema)
+    checker = sql_engine.RowChecker(query)
+    timings = {"setup": elapsed_ms(t0), "compile": None}
+
+    def _run(tc):
+        path = stdin_path(tc)
+        if path:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                setup_sql = f.read()
+        else:
+            setup_sql = tc.stdin
+        run = sql_engine.execute(fixture, query, setup_sql, time_limit_s, memory_mb, output_limit)
+        t0 = time.perf_counter()
+        result = _judge(tc, run, time_limit_s, output_limit, stored_output_chars, checker)
+        result.phases = _phases(timings, run, compare=elapsed_ms(t0))
+        return result
+
+    return _run_cases(test_cases, _run, workers, fail_fast)
+
+
+def _run_batches(language, src_path, test_cases, time_limit_s, memory_mb, output_limit,
+                 workers, sandbox) -> dict:
+    """Harness runs keyed by test case id; one harness process per worker."""
+    size    = -(-len(test_cases) // workers)
+    batches = [test_cases[i:i + size] for i in range(0, len(test_cases), size)]
+
+    def _run(batch):
+        runs = batch_harness.run_batch(
+            language, src_path, [tc.stdin.encode() for tc in batch],
+            time_limit_s, memory_mb, output_limit, sandbox,
+        )
+        return {tc.id: run for tc, run in zip(batch, runs) if run is not None}
+
+    batched = {}
+    with ThreadPoolExecutor(max_workers=len(batches), thread_name_prefix="harness") as pool:
+        for runs in pool.map(_run, batches):
+            batched.update(runs)
+    return batched
+
+
+@contextmanager
+def _warm_runner(language, config, tmpdir, memory_mb, workers, warm_pool_size, compile_cache,
+                 time_limit_s, output_limit, sandbox):
+    """The pre-started runner serving this run's test cases, or None for a cold spawn per case."""
+    if config.get("runner") != "jvm":
+        yield warm_pool.get_pool(language, warm_pool_size)
+        return
+
+    runner_dir = os.path.join(tmpdir, ".runner")
+    if not jvm_runner.prepare_runner(runner_dir, compile_cache):
+        yield None
+        return
+    with jvm_runner.JvmPool(runner_dir, tmpdir, memory_mb, workers, time_limit_s, output_limit, sandbox) as pool:
+        yield pool
+
+
+def fill_command(parts, src_path: str, bin_path: str, tmpdir: str, memory_mb: int) -> list:
+    """A LANGUAGE_CONFIG command with its placeholders filled in."""
+    filled = []
+    for p in parts:
+        if p == "{jvm_args}":
+            filled.extend(jvm_runner.jvm_args(memory_mb))
+            continue
+        filled.append(
+            p.replace("{file}", src_path)
+             .replace("{bin}",  bin_path)
+             .replace("{dir}",  tmpdir)
+        )
+    return filled
+
+
+def _phases(timings: dict, run: Optional[ProcessRun] = None, compare: Optional[float] = None) -> dict:
+    phases = dict.fromkeys(PHASES)
+    phases.update(timings)
+    if run is not None:
+        phases.update(spawn=run.spawn_ms, user=run.user_ms, sys=run.sys_ms, wall=run.time_ms,
+                      compare=compare)
+    return phases
+
+
+def _cost(tc) -> int:
+    """Expected cost of a test case, for running the cheap ones first: its input size."""
+    path = stdin_path(tc)
+    return os.path.getsize(path) if path else len(tc.stdin)
+
+
+def stdin_path(tc) -> Optional[str]:
+    """The file holding a test case's input, when it is not inline (see core.utils.test_data)."""
+    return getattr(tc, "stdin_path", None)
+
+
+def _compile(language, config, code, tmpdir, fill, cache):
+    """Compile into `tmpdir` (or restore from the cache). Returns (returncode, stderr)."""
+    key = cache.key(language, config["compile"], code) if cache else None
+    if cache:
+        hit = cache.fetch(key, tmpdir)
+        if hit:
+            return hit.returncode, hit.stderr
+
+    cp = subprocess.run(fill(config["compile"]), capture_output=True, timeout=20)
+    stderr = cp.stderr.decode(errors="replace")
+    if cache:
+        cache.store(key, tmpdir, config.get("artifacts", []), cp.returncode, stderr)
+    return cp.returncode, stderr
+
+
+def available_cores() -> int:
+    """Number of CPUs this process may run on (honours taskset / cpuset pinning)."""
     try:
-        mem = memory_mb * 1024 * 1024
-        resource.setrlimit(resource.RLIMIT_AS, (mem, mem))
-    except (ValueError, resource.error):
-        pass  # RLIMIT_AS not supported on macOS
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return os.cpu_count() or 1
+
+
+def _execute(src_path, tc, time_limit_s: int, memory_mb: Optional[int],
+             output_limit: Optional[int], sandbox, launch, warm=None) -> ProcessRun:
+    """Run one test case in its own process and box (warm when a runner is available)."""
+    path = stdin_path(tc)
+    if path:
+        # Warm runners are fed through a pipe: file-backed input goes to a cold spawn
+        with sandbox.box(memory_mb, time_limit_s) as box, open(path, "rb") as f:
+            return box.finish(launch(f, box))
+
+    stdin = tc.stdin.encode()
+    if isinstance(warm, jvm_runner.JvmPool):
+        # Persistent JVMs hold a box of their own for their whole life (see jvm_runner)
+        run = warm.execute(src_path, stdin, time_limit_s, memory_mb, output_limit)
+        if run is not None:
+            return run
+        warm = None
+    with sandbox.box(memory_mb, time_limit_s) as box:
+        run = warm.execute(src_path, stdin, box, output_limit) if warm else None
+        if run is None:
+            run = launch(stdin, box)
+        return box.finish(run)
+
+
+def _judge(tc, run: ProcessRun, time_limit_s: int,
+           output_limit: Optional[int], stored_output_chars: int, checker=None) -> TestResult:
+    memory_mb = round(run.memory_kb / 1024, 2) if run.memory_kb is not None else None
+    if run.timed_out:
+        return TestResult(tc.id, "time_limit", "", "", time_limit_s * 1000, tc.is_public,
+                          memory_mb, run.cpu_ms)
+
+    message = None
+    if run.output_limit or over_limit(run, output_limit):
+        status = "output_limit"
+    elif run.returncode != 0 and (run.memory_limit or _out_of_memory(run)):
+        status = "memory_limit"
+    elif run.returncode != 0:
+        status = "runtime_error"
+    else:
+        message = (checker or DEFAULT_CHECKER)(tc, run.stdout)
+        status = "accepted" if message is None else "wrong_answer"
+
+    return TestResult(
+        tc.id, status,
+        truncate_middle(run.stdout.decode(errors="replace").strip(), stored_output_chars),
+        truncate_middle(run.stderr.decode(errors="replace"), stored_output_chars),
+        run.time_ms, tc.is_public, memory_mb, run.cpu_ms, message=message,
+    )
+
+
+def _out_of_memory(run: ProcessRun) -> bool:
+    """A failed run that died allocating memory rather than from a bug."""
+    return any(marker in run.stderr for marker in MEMORY_ERROR_MARKERS)
+
+
+def _spawn(run_cmd, stdin, box, output_limit: Optional[int], spawner=None) -> ProcessRun:
+    """
+    Cold run, launched from the spawner's fork-server when one is free.
+    `stdin` is the input's bytes, or an open file the program reads directly.
+    """
+    piped = isinstance(stdin, bytes)
+    run = spawner.spawn(run_cmd, stdin, box, output_limit) if spawner and piped else None
+    if run is not None:
+        return run
+
+    parent_kb = _rss_kb()
+    t0 = time.perf_counter()
+    proc = box.popen(
+        run_cmd, output_limit,
+        stdin=subprocess.PIPE if piped else stdin,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    spawn_ms = elapsed_ms(t0)
+    run = communicate(proc, stdin if piped else b"", box.wall_s, output_limit, box.watchdog)
+    run.spawn_ms = spawn_ms
+    if run.memory_kb is not None and run.memory_kb <= parent_kb:
+        # The child's rusage includes the RSS it had when forked from this process
+        run.memory_kb = None
+    return run
+
+
+def _rss_kb() -> int:
     try:
-        resource.setrlimit(resource.RLIMIT_CPU, (time_limit_s, time_limit_s))
-    except (ValueError, resource.error):
-        pass
\ No newline at end of file
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        return 0  # no procfs (macOS)
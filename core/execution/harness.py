@@ -0,0 +1,134 @@
+# core/execution/harness.py
+"""
+Batched test harness: all of a submission's test cases in one process.
+
+For challenges with many small test cases, spawning an interpreter per case
+dominates the run time. In harness mode (CodeChallengeConfig.execution_mode
+== "harness") the cases are streamed to a single harness process
+(bootstrap/python_harness.py, bootstrap/node_harness.js) that re-runs the
+student's program once per case in-process and reports each case's exit
+code, output and timing separately. The memory reported for a case is the
+harness process's peak RSS so far, an upper bound for that case. The whole
+batch runs in one sandbox box, whose CPU budget covers every case.
+
+Cases share one process, so this is only meant for pure-function style
+challenges; isolated runs stay the default. Whatever the harness could not
+report (it crashed, the program killed it, the program does not compile)
+comes back as None and is run in isolation by the executor.
+"""
+import base64, json, os, selectors, subprocess, threading, time
+from typing import List, Optional
+
+from core.execution.process import ProcessRun
+from core.execution.sandbox import WALL_FACTOR
+
+_BOOTSTRAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bootstrap")
+
+HARNESS_CMD = {
+    "python":     ["python3", os.path.join(_BOOTSTRAP_DIR, "python_harness.py")],
+    "javascript": ["node",    os.path.join(_BOOTSTRAP_DIR, "node_harness.js")],
+}
+
+_START_GRACE_S = 5  # interpreter start-up allowance on top of the first case's time limit
+
+
+def supports(language: str) -> bool:
+    return language in HARNESS_CMD
+
+
+def run_batch(language: str, src_path: str, stdins: List[bytes], time_limit_s: int,
+              memory_mb: int, output_limit: Optional[int], sandbox) -> List[Optional[ProcessRun]]:
+    """
+    Run the program at `src_path` once per entry of `stdins` inside one
+    harness process. Returns one ProcessRun per input, or None for inputs the
+    harness did not get to report.
+
+    The batch runs in one box of `sandbox` whose CPU limit covers the whole
+    batch; each case's time is checked here, on CPU time when the box
+    measures it. The harness enforces `output_limit` per case itself: it must
+    still be able to write the next case's input.
+    """
+    cpu_budget_s = time_limit_s * len(stdins) + _START_GRACE_S
+    runs: List[Optional[ProcessRun]] = [None] * len(stdins)
+    with sandbox.box(memory_mb, cpu_budget_s) as box:
+        ctl_r, ctl_w = os.pipe()
+        rep_r, rep_w = os.pipe()
+        try:
+            proc = box.popen(
+                [*HARNESS_CMD[language], src_path, str(ctl_r), str(rep_w),
+                 str(-1 if output_limit is None else output_limit)],
+                None,
+                pass_fds=[ctl_r, rep_w],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError:
+            for fd in (ctl_r, ctl_w, rep_r, rep_w):
+                os.close(fd)
+            return runs
+        os.close(ctl_r)
+        os.close(rep_w)
+
+        writer = threading.Thread(target=_feed, args=(ctl_w, stdins), daemon=True)
+        writer.start()
+        try:
+            with os.fdopen(rep_r, "rb", buffering=0) as reports:
+                _collect(reports, runs, time_limit_s, proc, box.cpu_time)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+            writer.join()
+    return runs
+
+
+def _feed(fd: int, stdins: List[bytes]):
+    """Stream the cases as `<length>\\n<bytes>` frames."""
+    try:
+        with os.fdopen(fd, "wb") as control:
+            for stdin in stdins:
+                control.write(b"%d\n" % len(stdin))
+                control.write(stdin)
+    except BrokenPipeError:
+        pass  # the harness died; its unreported cases are rerun in isolation
+
+
+def _collect(reports, runs, time_limit_s: int, proc, cpu_judged: bool):
+    buf = b""
+    grace = _START_GRACE_S
+    wall_s = time_limit_s * WALL_FACTOR if cpu_judged else time_limit_s
+    with selectors.DefaultSelector() as sel:
+        sel.register(reports, selectors.EVENT_READ)
+        for i in range(len(runs)):
+            deadline = time.monotonic() + wall_s + grace
+            while b"\n" not in buf:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not sel.select(remaining):
+                    # Stuck in this case: it is a time limit, the rest run in isolation
+                    proc.kill()
+                    runs[i] = ProcessRun(-9, b"", b"", time_limit_s * 1000, True)
+                    return
+                chunk = reports.read(65536)
+                if not chunk:
+                    return  # harness exited
+                buf += chunk
+            line, buf = buf.split(b"\n", 1)
+            report = json.loads(line)
+            time_ms = report["time_ms"]
+            cpu_ms  = report.get("cpu_ms")
+            spent   = cpu_ms if cpu_judged and cpu_ms is not None else time_ms
+            if spent > time_limit_s * 1000:
+                runs[i] = ProcessRun(-9, b"", b"", time_limit_s * 1000, True)
+            else:
+                runs[i] = ProcessRun(
+                    report["returncode"],
+                    base64.b64decode(report["stdout"]),
+                    base64.b64decode(report["stderr"]),
+                    time_ms,
+                    False,
+                    report.get("output_limit", False),
+                    report.get("memory_kb"),
+                    cpu_ms,
+                )
+            grace = 1
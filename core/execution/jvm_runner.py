@@ -0,0 +1,237 @@
+# core/execution/jvm_runner.py
+"""
+Persistent JVM runners for Java challenges.
+
+Starting a JVM costs far more than a typical test case, so a submission's test
+cases are run inside long-lived JVMs (bootstrap/JudgeRunner.java) that load
+the compiled solution once and run each case with a fresh class loader and
+its own stdin/stdout/stderr files.
+
+`JvmPool` serves the executor like a warm pool. Each JVM runs in a sandbox box
+of its own, held for the JVM's life, with a CPU budget for `_CASES_PER_JVM`
+cases; a case's CPU time is measured from procfs, not reported by the JVM.
+A JVM is killed and replaced after a timeout, after a case that left threads
+running, and on any reply it should not have sent (the solution shares the
+JVM's stdout). `execute(src_path, stdin, time_limit_s, memory_mb,
+output_limit)` returns a ProcessRun, or None when no runner is available and
+the case must be run cold with `java`.
+"""
+import os, queue, secrets, selectors, subprocess, tempfile, threading, time
+from contextlib import ExitStack
+from typing import Optional
+
+from core.execution.process import ProcessRun, ProcUsage, over_limit, read_capped
+
+_RUNNER_SOURCE  = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bootstrap", "JudgeRunner.java")
+_RUNNER_COMPILE = ["javac", "-encoding", "UTF-8", "-d", "{dir}", "{file}"]
+_START_GRACE_S  = 10  # JVM start-up allowance on top of the first case's time limit
+_CASES_PER_JVM  = 32  # cases one JVM runs before it is replaced; its CPU budget is sized on it
+
+
+def jvm_args(memory_mb: int):
+    # The JVM reserves far more address space than it uses, so memory is bounded by
+    # the heap size instead of RLIMIT_AS
+    return [f"-Xmx{memory_mb}m", "-Xss64m", "-XX:+UseSerialGC"]
+
+
+def prepare_runner(dest_dir: str, cache=None) -> bool:
+    """Compile JudgeRunner into `dest_dir` (through the compile cache when given)."""
+    with open(_RUNNER_SOURCE) as f:
+        source = f.read()
+    key = cache.key("java-runner", _RUNNER_COMPILE, source) if cache else None
+    os.makedirs(dest_dir, exist_ok=True)
+    if cache and cache.fetch(key, dest_dir):
+        return os.path.exists(os.path.join(dest_dir, "JudgeRunner.class"))
+
+    cmd = [p.replace("{dir}", dest_dir).replace("{file}", _RUNNER_SOURCE) for p in _RUNNER_COMPILE]
+    try:
+        cp = subprocess.run(cmd, capture_output=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    if cache:
+        cache.store(key, dest_dir, ["*.class"], cp.returncode, cp.stderr.decode(errors="replace"))
+    return cp.returncode == 0
+
+
+class _JvmUnavailable(Exception):
+    """The JVM died before it could take the case (e.g. it failed to start)."""
+
+
+class _Jvm:
+    def __init__(self, runner_dir: str, class_dir: str, memory_mb: int, time_limit_s: int,
+                 output_limit: Optional[int], sandbox):
+        # The box holds the whole JVM; its CPU budget covers every case it may run, and
+        # memory is bounded by -Xmx as for a cold `java` run
+        budget_s = _START_GRACE_S + 2 * time_limit_s * _CASES_PER_JVM
+        self._stack = ExitStack()
+        box = self._stack.enter_context(sandbox.box(None, budget_s))
+        try:
+            self.proc = box.popen(
+                ["java", *jvm_args(memory_mb), "-cp", runner_dir, "JudgeRunner", class_dir],
+                output_limit,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        except BaseException:
+            self._stack.close()
+            raise
+        self.usage   = ProcUsage(self.proc.pid)
+        self.io_dir  = tempfile.mkdtemp(prefix="jvm-io-")
+        self.started = False
+        self.cases   = 0
+        self.clean   = True   # no reason yet to replace this JVM
+        self._buf = b""
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def reusable(self) -> bool:
+        return self.clean and self.cases < _CASES_PER_JVM and self.alive()
+
+    def close(self):
+        if self.alive():
+            self.proc.kill()
+        self.proc.wait()
+        self._stack.close()   # a cgroup box also takes down anything the JVM started
+        for name in os.listdir(self.io_dir):
+            os.unlink(os.path.join(self.io_dir, name))
+        os.rmdir(self.io_dir)
+
+    def _read_line(self, timeout: float) -> Optional[bytes]:
+        """Next control line, or None on timeout / EOF (the JVM exited)."""
+        deadline = time.monotonic() + timeout
+        fd = self.proc.stdout.fileno()
+        with selectors.DefaultSelector() as sel:
+            sel.register(fd, selectors.EVENT_READ)
+            while b"\n" not in self._buf:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not sel.select(remaining):
+                    return None
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    return None
+                self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return line.strip()
+
+    def _cpu_ms(self) -> Optional[float]:
+        self.usage.sample()
+        return self.usage.cpu_ms
+
+    def execute(self, stdin: bytes, time_limit_s: int, output_limit: Optional[int]) -> ProcessRun:
+        paths = [os.path.join(self.io_dir, name) for name in ("in", "out", "err")]
+        with open(paths[0], "wb") as f:
+            f.write(stdin)
+        open(paths[1], "wb").close()
+        open(paths[2], "wb").close()
+
+        token = secrets.token_hex(16)
+        grace = 2 if self.started else _START_GRACE_S
+        cpu_before = self._cpu_ms() if self.started else 0.0   # JVM start-up counts, as for a cold run
+        t0 = time.perf_counter()
+        try:
+            limit = -1 if output_limit is None else output_limit
+            self.proc.stdin.write(
+                f"RUN {token}\t{paths[0]}\t{paths[1]}\t{paths[2]}\t{time_limit_s * 1000}\t{limit}\n".encode()
+            )
+            self.proc.stdin.flush()
+        except BrokenPipeError as exc:
+            raise _JvmUnavailable() from exc
+        reply = self._read_line(time_limit_s + grace)
+        elapsed = round((time.perf_counter() - t0) * 1000, 2)
+        cpu_after = self._cpu_ms()
+        cpu_ms = None if cpu_before is None or cpu_after is None else round(cpu_after - cpu_before, 2)
+        first_case, self.started = not self.started, True
+        self.cases += 1
+
+        with open(paths[1], "rb") as out, open(paths[2], "rb") as err:
+            stdout = read_capped(out, output_limit)
+            stderr = read_capped(err, output_limit)
+
+        fields = (reply or b"").split()
+        if len(fields) == 6 and fields[:2] == [b"DONE", token.encode()]:
+            # The runner's own timing excludes JVM start-up and control round trips
+            _, _, code, case_ms, heap_kb, leftover = fields
+            self.clean = leftover == b"0"
+            run = ProcessRun(int(code), stdout, stderr, round(float(case_ms), 2), False,
+                             memory_kb=int(heap_kb), cpu_ms=cpu_ms)
+            if cpu_ms is not None and cpu_ms > time_limit_s * 1000:
+                # Threads of its own got it more CPU time than a cold run's RLIMIT_CPU allows
+                return ProcessRun(-9, b"", b"", time_limit_s * 1000, True, cpu_ms=cpu_ms)
+            return run
+        if reply is not None and fields != [b"TIMEOUT", token.encode()]:
+            # Not the runner's reply to this case: the solution wrote to the control
+            # descriptor. Nothing the JVM says can be trusted now, so run the case cold
+            self.clean = False
+            raise _JvmUnavailable()
+        if reply is not None or self.alive():
+            self.proc.kill()
+            run = ProcessRun(-9, stdout, stderr, elapsed, False, True, cpu_ms=cpu_ms)
+            if over_limit(run, output_limit):
+                return run  # it was still printing when the clock ran out
+            return ProcessRun(-9, b"", b"", time_limit_s * 1000, True, cpu_ms=cpu_ms)
+        returncode = self.proc.wait()
+        if first_case or returncode < 0:
+            # Runner broken, solution exited on its first case, or the JVM killed for
+            # going over its CPU budget: a cold run tells which
+            raise _JvmUnavailable()
+        # The solution called System.exit(): the JVM is gone, its exit code is the case's
+        return ProcessRun(returncode, stdout, stderr, elapsed, False, cpu_ms=cpu_ms)
+
+
+class JvmPool:
+    """Up to `size` JVMs for one submission, each in its own box; each runs one test case at a time."""
+
+    def __init__(self, runner_dir: str, class_dir: str, memory_mb: int, size: int,
+                 time_limit_s: int, output_limit: Optional[int], sandbox):
+        self._args = (runner_dir, class_dir, memory_mb, time_limit_s, output_limit, sandbox)
+        self._size = size
+        self._idle = queue.SimpleQueue()
+        self._all  = []
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> Optional[_Jvm]:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if len(self._all) >= self._size:
+                return None
+            try:
+                jvm = _Jvm(*self._args)
+            except OSError:
+                return None
+            self._all.append(jvm)
+            return jvm
+
+    def execute(self, src_path, stdin, time_limit_s, memory_mb, output_limit) -> Optional[ProcessRun]:
+        jvm = self._acquire()
+        if jvm is None:
+            return None
+        try:
+            run = jvm.execute(stdin, time_limit_s, output_limit)
+        except _JvmUnavailable:
+            run = None
+        if run is not None and jvm.reusable():
+            self._idle.put(jvm)
+        else:
+            # Timed out, exited, left threads running, misbehaved, ran its share of
+            # cases or never started: make room for a fresh JVM
+            with self._lock:
+                self._all.remove(jvm)
+            jvm.close()
+        return run
+
+    def close(self):
+        with self._lock:
+            jvms, self._all = self._all, []
+        for jvm in jvms:
+            jvm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,242 @@
+# core/execution/process.py
+import asyncio, os, selectors, subprocess, time
+from dataclasses import dataclass
+from typing import Optional
+
+WATCH_INTERVAL_S = 0.05  # how often communicate() polls its watchdog
+
+
+@dataclass
+class ProcessRun:
+    """Raw outcome of one execution of the student's program, before judging."""
+    returncode:   int
+    stdout:       bytes
+    stderr:       bytes
+    time_ms:      float
+    timed_out:    bool
+    output_limit: bool = False   # killed (or cut off) for writing more than the output cap
+    memory_kb:    Optional[int] = None   # peak resident set size, when known
+    cpu_ms:       Optional[float] = None   # CPU time (user + system), when known
+    memory_limit: bool = False   # killed by the sandbox for going over the memory limit
+    spawn_ms:     Optional[float] = None   # starting the process, until it runs (cold or warm)
+    user_ms:      Optional[float] = None   # the CPU time in cpu_ms, split into user
+    sys_ms:       Optional[float] = None   # and system time, when known
+
+
+def communicate(proc: subprocess.Popen, stdin: bytes, timeout: float,
+                output_limit: Optional[int], watchdog=None) -> ProcessRun:
+    """
+    Feed `stdin` to `proc` and collect its stdout/stderr as they are produced,
+    like Popen.communicate() but never holding more than `output_limit` bytes
+    per stream: the process is killed as soon as either stream goes over the
+    cap. `proc` must have been started with stdout/stderr pipes.
+
+    The process is reaped with wait4() so its peak RSS and CPU time come back
+    too. Linux counts the RSS the child had when it was forked in that figure.
+
+    `watchdog`, when given, is polled while the process runs; once it returns
+    True the process is killed as if `timeout` had expired.
+
+    A process started with a file as its stdin (no stdin pipe) reads that
+    file itself; `stdin` is then ignored.
+    """
+    t0       = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    out      = {proc.stdout.fileno(): bytearray(), proc.stderr.fileno(): bytearray()}
+    pending  = memoryview(stdin if proc.stdin else b"")
+    stdin_fd = proc.stdin.fileno() if proc.stdin else None
+    timed_out = exceeded = False
+
+    with selectors.DefaultSelector() as sel:
+        for fd in out:
+            sel.register(fd, selectors.EVENT_READ)
+        if pending:
+            os.set_blocking(stdin_fd, False)
+            sel.register(stdin_fd, selectors.EVENT_WRITE)
+        elif proc.stdin:
+            proc.stdin.close()
+
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                timed_out = True
+                break
+            if watchdog is not None:
+                if watchdog():
+                    timed_out = True
+                    break
+                remaining = min(remaining, WATCH_INTERVAL_S)
+            for key, _ in sel.select(remaining):
+                fd = key.fd
+                if fd == stdin_fd:
+                    try:
+                        pending = pending[os.write(fd, pending[:65536]):]
+                    except BrokenPipeError:
+                        pending = pending[:0]  # the program stopped reading; like communicate()
+                    if not pending:
+                        sel.unregister(fd)
+                        proc.stdin.close()
+                    continue
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    sel.unregister(fd)
+                    continue
+                out[fd] += chunk
+                if output_limit is not None and len(out[fd]) > output_limit:
+                    exceeded = True
+                    break
+            if exceeded:
+                break
+
+    if timed_out or exceeded:
+        proc.kill()
+    returncode, memory_kb, user_ms, sys_ms = wait_with_usage(proc)
+    cpu_ms = None if user_ms is None else round(user_ms + sys_ms, 2)
+    for stream in (proc.stdin, proc.stdout, proc.stderr):
+        if stream and not stream.closed:
+            stream.close()
+    elapsed = elapsed_ms(t0)
+
+    stdout, stderr = (bytes(b) for b in out.values())
+    if timed_out:
+        return ProcessRun(-9, b"", b"", timeout * 1000, True, memory_kb=memory_kb, cpu_ms=cpu_ms,
+                          user_ms=user_ms, sys_ms=sys_ms)
+    return ProcessRun(returncode, stdout, stderr, elapsed, False, exceeded, memory_kb, cpu_ms,
+                      user_ms=user_ms, sys_ms=sys_ms)
+
+
+async def communicate_async(proc: asyncio.subprocess.Process, stdin: bytes, timeout: float,
+                            output_limit: Optional[int], watchdog=None) -> ProcessRun:
+    """
+    communicate() for a process started with asyncio.create_subprocess_exec:
+    the same time limit, output cap and watchdog, awaiting rather than holding
+    a thread.
+
+    asyncio reaps the process itself, so its rusage is lost: peak memory and
+    CPU time are sampled from procfs while it runs instead (missing for runs
+    shorter than one sample; a cgroup box measures both on its own).
+    """
+    t0       = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    out, err = bytearray(), bytearray()
+    usage    = ProcUsage(proc.pid)
+    exceeded = False
+
+    async def _feed():
+        if proc.stdin is None:
+            return  # reading a file
+        try:
+            if stdin:
+                proc.stdin.write(stdin)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the program stopped reading; like communicate()
+        finally:
+            proc.stdin.close()
+
+    async def _read(stream, buf):
+        nonlocal exceeded
+        while not exceeded:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return
+            buf += chunk
+            if output_limit is not None and len(buf) > output_limit:
+                exceeded = True
+
+    # Done once the output is closed and the process has exited
+    pending = {asyncio.ensure_future(c) for c in (_feed(), _read(proc.stdout, out), _read(proc.stderr, err))}
+    pending.add(asyncio.ensure_future(proc.wait()))
+    timed_out = False
+    while pending and not exceeded:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (watchdog is not None and watchdog()):
+            timed_out = True
+            break
+        _, pending = await asyncio.wait(pending, timeout=min(remaining, WATCH_INTERVAL_S),
+                                        return_when=asyncio.FIRST_COMPLETED)
+        usage.sample()
+
+    if timed_out or exceeded:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    returncode = await proc.wait()
+    elapsed = elapsed_ms(t0)
+
+    if timed_out:
+        return ProcessRun(-9, b"", b"", timeout * 1000, True, memory_kb=usage.hwm_kb,
+                          cpu_ms=usage.cpu_ms, user_ms=usage.user_ms, sys_ms=usage.sys_ms)
+    return ProcessRun(returncode, bytes(out), bytes(err), elapsed, False, exceeded, usage.hwm_kb,
+                      usage.cpu_ms, user_ms=usage.user_ms, sys_ms=usage.sys_ms)
+
+
+class ProcUsage:
+    """Peak RSS and CPU time of a running process, as last seen in procfs."""
+
+    _TICK_MS = 1000 / os.sysconf("SC_CLK_TCK")
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.hwm_kb = self.user_ms = self.sys_ms = None
+
+    @property
+    def cpu_ms(self) -> Optional[float]:
+        return None if self.user_ms is None else round(self.user_ms + self.sys_ms, 2)
+
+    def sample(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("Name:") and line.split()[1] == "sh":
+                        return  # still the box's shell wrapper, not the program
+                    if line.startswith("VmHWM:"):
+                        self.hwm_kb = int(line.split()[1])
+                        break
+            with open(f"/proc/{self.pid}/stat") as f:
+                # after the parenthesised command name: fields 14 and 15 are utime and stime
+                fields = f.read().rsplit(")", 1)[1].split()
+            self.user_ms = round(int(fields[11]) * self._TICK_MS, 2)
+            self.sys_ms  = round(int(fields[12]) * self._TICK_MS, 2)
+        except (OSError, ValueError, IndexError):
+            pass  # exited already, or no procfs (macOS)
+
+
+def wait_with_usage(proc: subprocess.Popen):
+    """Reap `proc` and return (returncode, peak RSS in KB, user CPU ms, system CPU ms)."""
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:  # already reaped
+        return proc.wait(), None, None, None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in KB on Linux
+    return (proc.returncode, usage.ru_maxrss,
+            round(usage.ru_utime * 1000, 2), round(usage.ru_stime * 1000, 2))
+
+
+def elapsed_ms(t0: float) -> float:
+    """Milliseconds since the time.perf_counter() reading `t0`."""
+    return round((time.perf_counter() - t0) * 1000, 2)
+
+
+def read_capped(f, output_limit: Optional[int]) -> bytes:
+    """Read a captured output file from the start, at most one byte past the cap."""
+    f.seek(0)
+    return f.read() if output_limit is None else f.read(output_limit + 1)
+
+
+def over_limit(run: ProcessRun, output_limit: Optional[int]) -> bool:
+    return output_limit is not None and max(len(run.stdout), len(run.stderr)) > output_limit
+
+
+def truncate_middle(text: str, max_chars: int) -> str:
+    """Keep the start and the end of an over-long output, dropping the middle."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    head = max_chars // 2
+    tail = max_chars - head
+    return f"{text[:head]}\n... [{len(text) - max_chars} characters truncated] ...\n{text[-tail:]}"
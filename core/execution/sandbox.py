@@ -0,0 +1,238 @@
+# core/execution/sandbox.py
+"""
+Sandbox backends: how the processes running student code are confined.
+
+- RlimitSandbox ("rlimit", the default): per-process rlimits. RLIMIT_AS bounds
+  memory, RLIMIT_CPU backs up the wall-clock time limit and RLIMIT_FSIZE bounds
+  files written.
+- CgroupSandbox ("cgroup"): every run gets its own cgroup v2 below a delegated
+  root, with cpu.max (one CPU), memory.max and pids.max. The cgroup bounds the
+  whole process tree, reports its CPU time and peak memory, and is killed as a
+  whole with cgroup.kill. Time limits are enforced on CPU time, with a
+  wall-clock backstop, so a loaded judge host does not turn accepted solutions
+  into time limits. Controllers missing under the root fall back to rlimits.
+
+A backend's `box(memory_mb, time_limit_s)` context yields the Box of one run:
+the limits to apply and, for cgroups, where to put the process. Processes are
+never started with a preexec_fn, which is not safe in the threaded judge:
+`Box.popen()` applies the box through a small /bin/sh wrapper (`ulimit`, and
+writing `$$` to the run's cgroup.procs) that then execs the program. Fork
+servers (bootstrap/python_zygote.py) apply the same limits in their
+single-threaded children.
+"""
+import logging, os, subprocess, threading, time, uuid
+from contextlib import contextmanager
+from typing import Optional
+
+from core.execution.process import ProcessRun
+
+logger = logging.getLogger(__name__)
+
+CPU_PERIOD_US = 100_000
+WALL_FACTOR   = 3    # cgroup runs: wall-clock backstop, in multiples of the CPU time limit
+_FSIZE_BLOCK  = 512  # unit of `ulimit -f` in POSIX sh
+
+
+class SandboxUnavailable(Exception):
+    """The requested backend cannot be used on this host."""
+
+
+class Box:
+    """The limits of one run, applied to its process as rlimits."""
+
+    path     = None    # the run's cgroup, if any
+    watchdog = None    # polled while the run is going; True stops it as a time limit
+    cpu_time = False   # time limits apply to CPU time rather than wall time
+
+    def __init__(self, memory_mb: Optional[int], time_limit_s: int):
+        self.time_limit_s = time_limit_s
+        self.rlimit_mb    = memory_mb      # RLIMIT_AS, MB
+        self.rlimit_cpu_s = time_limit_s   # RLIMIT_CPU, s
+        self.wall_s       = time_limit_s   # wall-clock limit, s
+
+    def popen(self, argv, output_limit: Optional[int], **kwargs) -> subprocess.Popen:
+        """Start `argv` inside the box, through a shell wrapper instead of a preexec_fn."""
+        return subprocess.Popen(self.command(argv, output_limit), **kwargs)
+
+    def command(self, argv, output_limit: Optional[int]) -> list:
+        """`argv` wrapped so that it runs inside the box (see popen)."""
+        script = ""
+        if self.path is not None:
+            # Join the cgroup before exec, so everything the program starts is in it too
+            script += 'echo $$ > "$1/cgroup.procs" || exit 125; '
+        if self.rlimit_mb is not None:
+            script += f"ulimit -v {self.rlimit_mb * 1024} 2>/dev/null; "
+        if self.rlimit_cpu_s is not None:
+            script += f"ulimit -t {self.rlimit_cpu_s} 2>/dev/null; "
+        if output_limit is not None:
+            # One block past the cap, so going over it is detectable
+            script += f"ulimit -f {(output_limit + 1) // _FSIZE_BLOCK + 1} 2>/dev/null; "
+        script += 'shift; exec "$@"'
+        return ["/bin/sh", "-c", script, "sh", self.path or "", *argv]
+
+    def add(self, pid: int):
+        """Move an already running process (a pre-started interpreter) into the box."""
+
+    def finish(self, run: ProcessRun) -> ProcessRun:
+        """Fold what the box measured into `run`."""
+        return run
+
+
+class CgroupBox(Box):
+    """One run's cgroup. Reads its CPU time and memory peak, kills and removes it."""
+
+    def __init__(self, path: str, memory_mb: Optional[int], time_limit_s: int, controllers):
+        super().__init__(memory_mb, time_limit_s)
+        self.path = path
+        self.cpu_limit_us = time_limit_s * 1_000_000
+        self.rlimit_cpu_s = None
+        self.wall_s       = time_limit_s * WALL_FACTOR
+        self.watchdog     = self.over_cpu
+        self.cpu_time     = True
+        if "memory" in controllers:
+            self.rlimit_mb = None
+
+    def _read(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _keyed(self, name: str) -> dict:
+        lines = (line.split() for line in (self._read(name) or "").splitlines())
+        return {fields[0]: int(fields[1]) for fields in lines if len(fields) == 2}
+
+    def cpu_us(self) -> int:
+        return self._keyed("cpu.stat").get("usage_usec", 0)
+
+    def over_cpu(self) -> bool:
+        return self.cpu_us() > self.cpu_limit_us
+
+    def add(self, pid: int):
+        with open(os.path.join(self.path, "cgroup.procs"), "w") as f:
+            f.write(str(pid))
+
+    def finish(self, run: ProcessRun) -> ProcessRun:
+        stat = self._keyed("cpu.stat")
+        cpu_us = stat.get("usage_usec", 0)
+        run.cpu_ms = round(cpu_us / 1000, 2)
+        if "user_usec" in stat:
+            run.user_ms = round(stat["user_usec"] / 1000, 2)
+            run.sys_ms  = round(stat.get("system_usec", 0) / 1000, 2)
+        peak = (self._read("memory.peak") or "").strip()
+        if run.memory_kb is None and peak.isdigit():
+            run.memory_kb = int(peak) // 1024
+        if self._keyed("memory.events").get("oom_kill", 0):
+            run.memory_limit = True
+        if cpu_us > self.cpu_limit_us:
+            # Finished between two polls of the watchdog, but over the CPU budget
+            run.timed_out = True
+        return run
+
+    def close(self):
+        try:
+            with open(os.path.join(self.path, "cgroup.kill"), "w") as f:
+                f.write("1")
+        except OSError:
+            pass
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                os.rmdir(self.path)
+                return
+            except FileNotFoundError:
+                return
+            except OSError:
+                # cgroup.kill is asynchronous: wait for the cgroup to empty
+                if time.monotonic() > deadline:
+                    logger.warning(f"Could not remove cgroup {self.path}")
+                    return
+                time.sleep(0.01)
+
+
+class RlimitSandbox:
+    name = "rlimit"
+
+    @contextmanager
+    def box(self, memory_mb: Optional[int], time_limit_s: int):
+        yield Box(memory_mb, time_limit_s)
+
+
+class CgroupSandbox:
+    name = "cgroup"
+
+    def __init__(self, root: str, pids_max: int = 64):
+        if not os.path.exists(os.path.join(root, "cgroup.procs")):
+            raise SandboxUnavailable(f"{root} is not a cgroup v2 directory")
+        if not os.access(os.path.join(root, "cgroup.subtree_control"), os.W_OK):
+            raise SandboxUnavailable(f"{root} is not delegated to this user")
+        self.root = root
+        self.pids_max = pids_max
+        self.controllers = self._enable_controllers()
+        missing = {"cpu", "memory", "pids"} - self.controllers
+        if missing:
+            logger.warning(
+                f"cgroup controllers {sorted(missing)} are not available under {root}; "
+                "rlimits are used in their place"
+            )
+
+    def _enable_controllers(self) -> set:
+        with open(os.path.join(self.root, "cgroup.controllers")) as f:
+            available = set(f.read().split()) & {"cpu", "memory", "pids"}
+        if available:
+            try:
+                with open(os.path.join(self.root, "cgroup.subtree_control"), "w") as f:
+                    f.write(" ".join(f"+{c}" for c in sorted(available)))
+            except OSError as exc:
+                raise SandboxUnavailable(f"cannot enable controllers under {self.root}: {exc}") from exc
+        return available
+
+    @contextmanager
+    def box(self, memory_mb: Optional[int], time_limit_s: int):
+        path = os.path.join(self.root, f"run-{uuid.uuid4().hex}")
+        os.mkdir(path)
+        box = CgroupBox(path, memory_mb, time_limit_s, self.controllers)
+        try:
+            if "cpu" in self.controllers:
+                _write(path, "cpu.max", f"{CPU_PERIOD_US} {CPU_PERIOD_US}")
+            if "memory" in self.controllers and memory_mb is not None:
+                _write(path, "memory.max", str(memory_mb * 1024 * 1024))
+                if os.path.exists(os.path.join(path, "memory.swap.max")):
+                    _write(path, "memory.swap.max", "0")
+            if "pids" in self.controllers:
+                _write(path, "pids.max", str(self.pids_max))
+            yield box
+        finally:
+            box.close()
+
+
+def _write(path: str, name: str, value: str):
+    with open(os.path.join(path, name), "w") as f:
+        f.write(value)
+
+
+_sandboxes = {}
+_sandboxes_lock = threading.Lock()
+
+
+def get_sandbox(name: str = "rlimit", cgroup_root: str = "", pids_max: int = 64):
+    """
+    Process-wide sandbox backend. A cgroup backend that cannot be set up on
+    this host falls back to rlimits, with an error logged.
+    """
+    with _sandboxes_lock:
+        sandbox = _sandboxes.get((name, cgroup_root))
+        if sandbox is None:
+            if name == "cgroup":
+                try:
+                    sandbox = CgroupSandbox(cgroup_root, pids_max)
+                except (SandboxUnavailable, OSError) as exc:
+                    logger.error(f"cgroup sandbox unavailable, using rlimits: {exc}")
+                    sandbox = RlimitSandbox()
+            elif name == "rlimit":
+                sandbox = RlimitSandbox()
+            else:
+                raise ValueError(f"Unknown sandbox backend: {name}")
+            _sandboxes[(name, cgroup_root)] = sandbox
+        return sandbox
@@ -0,0 +1,211 @@
+# core/execution/sql_engine.py
+"""
+In-process execution of SQL challenges on SQLite.
+
+A challenge's fixture schema (CREATE TABLE and INSERT statements) is loaded
+once into an in-memory template database, kept in a small LRU pool keyed by
+the schema's hash. Every test case then runs on a private copy of the
+template made with the online backup API, a page copy that costs far less
+than replaying the schema and needs no process spawn. A test case's stdin is
+extra SQL run on its copy before the student's query, for per-case data.
+
+The student's query is a single statement. It runs under an authorizer (no
+ATTACH or PRAGMA), a cap on the size of any single value and of the copy
+(from the memory limit), a time budget enforced by a progress handler, and
+row and output budgets, checked row by row as it is fetched; its rows come back as ProcessRun stdout in the canonical text
+form of render(), and RowChecker compares them with the expected output.
+"""
+import hashlib, re, sqlite3, threading, time
+from collections import OrderedDict
+from typing import Optional
+
+from core.execution.checkers import expected_output
+from core.execution.process import ProcessRun, elapsed_ms
+
+MAX_ROWS           = 10_000       # rows a query may return; beyond that it is an output_limit
+MAX_VALUE_BYTES    = 1_000_000    # largest string or blob a query may build
+TEMPLATE_POOL_SIZE = 32           # fixture schemas kept loaded
+PROGRESS_STEPS     = 1000         # SQLite VM instructions between two time budget checks
+
+_DENIED = {sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH, sqlite3.SQLITE_PRAGMA}
+
+_templates = OrderedDict()   # sha256 of the schema -> _Template
+_templates_lock = threading.Lock()
+
+
+class _Template:
+    """A loaded fixture schema. Copies are serialised: a connection is not safe to share."""
+
+    def __init__(self, schema: str):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript(schema)
+
+    def copy(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        with self.lock:
+            self.conn.backup(conn)
+        return conn
+
+
+def template(schema: str) -> _Template:
+    """The loaded template of `schema`. Raises ValueError when the schema does not load."""
+    key = hashlib.sha256(schema.encode()).hexdigest()
+    with _templates_lock:
+        loaded = _templates.get(key)
+        if loaded is not None:
+            _templates.move_to_end(key)
+            return loaded
+    try:
+        loaded = _Template(schema)
+    except sqlite3.Error as exc:
+        raise ValueError(f"Invalid SQL schema: {exc}")
+    with _templates_lock:
+        _templates[key] = loaded
+        while len(_templates) > TEMPLATE_POOL_SIZE:
+            _templates.popitem(last=False)
+    return loaded
+
+
+def execute(fixture: _Template, query: str, setup_sql: str, time_limit_s: float,
+            memory_mb: int, output_limit: Optional[int], max_rows: int = MAX_ROWS) -> ProcessRun:
+    """Run `query` on a fresh copy of `fixture`, after the test case's `setup_sql`."""
+    t0 = time.perf_counter()
+    conn = fixture.copy()
+    try:
+        if setup_sql.strip():
+            conn.executescript(setup_sql)
+        spawn_ms = elapsed_ms(t0)
+
+        # The copy and its temp tables may grow by at most the memory limit
+        page_kb = conn.execute("PRAGMA page_size").fetchone()[0] / 1024
+        for schema in ("main", "temp"):
+            pages = conn.execute(f"PRAGMA {schema}.page_count").fetchone()[0]
+            conn.execute(f"PRAGMA {schema}.max_page_count = {pages + int(memory_mb * 1024 / page_kb)}")
+        conn.set_authorizer(_authorize)
+        conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, MAX_VALUE_BYTES)
+        deadline = time.monotonic() + time_limit_s
+        conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+
+        # Rows are rendered as they are fetched, and fetching stops past the output limit or
+        # the memory limit: the result lives in the judge's memory, which memory_mb does not bound
+        memory_bytes = memory_mb * 1024 * 1024
+        budget = memory_bytes if output_limit is None else min(output_limit, memory_bytes)
+
+        t0, cpu0 = time.perf_counter(), time.thread_time()
+        lines, size, timed_out, too_many, full, error = [], -1, False, False, False, b""
+        try:
+            for row in conn.execute(query):
+                if len(lines) == max_rows:
+                    too_many = True
+                    break
+                lines.append(_line(row).encode())
+                size += len(lines[-1]) + 1   # with the newline before it
+                if size > budget:
+                    break
+        except sqlite3.OperationalError as exc:
+            timed_out = time.monotonic() > deadline   # interrupted by the progress handler
+            full = exc.sqlite_errorcode == sqlite3.SQLITE_FULL
+            error = str(exc).encode()
+        except (sqlite3.Error, sqlite3.Warning, OverflowError) as exc:
+            error = str(exc).encode()
+        cpu_ms = round((time.thread_time() - cpu0) * 1000, 2)
+
+        stdout = b"\n".join(lines)
+        over = too_many or (output_limit is not None and len(stdout) > output_limit)
+        if not over and len(stdout) > memory_bytes:
+            full, error = True, b"The query result is larger than the memory limit"
+        return ProcessRun(
+            returncode=1 if error else 0,
+            stdout=stdout[:output_limit] if output_limit is not None else stdout,
+            stderr=error,
+            time_ms=elapsed_ms(t0),
+            timed_out=timed_out,
+            output_limit=over,
+            cpu_ms=cpu_ms,
+            memory_limit=full,
+            spawn_ms=spawn_ms,   # copying the template and loading the case's data
+            user_ms=cpu_ms,      # the query runs in this thread: no user/system split
+        )
+    finally:
+        conn.close()
+
+
+def _authorize(action, *_):
+    return sqlite3.SQLITE_DENY if action in _DENIED else sqlite3.SQLITE_OK
+
+
+def render(rows) -> str:
+    """Rows in canonical text form: one line per row, values separated by '|'."""
+    return "\n".join(_line(row) for row in rows)
+
+
+def _line(row) -> str:
+    return "|".join(_value(v) for v in row)
+
+
+def _value(v) -> str:
+    if v is None:
+        return "NULL"
+    if isinstance(v, float):
+        return _number(v)
+    if isinstance(v, bytes):
+        return v.hex()
+    return str(v)
+
+
+def _number(v: float) -> str:
+    # Integral floats as integers, others to 6 decimals: SUM() over REAL and AVG() compare equal to 3 / 2.5
+    if v.is_integer():
+        return str(int(v))
+    text = f"{v:.6f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+class RowChecker:
+    """
+    Output checker (see checkers) of a query: its rendered rows must match the
+    expected ones (rows as render() writes them). Numbers compare by value;
+    row order only counts when the query sorts its result with a top-level
+    ORDER BY.
+    """
+
+    def __init__(self, query: str):
+        self.ordered = _ordered(query)
+
+    def __call__(self, tc, stdout: bytes) -> Optional[str]:
+        with expected_output(tc) as expected:
+            expected = _rows(expected[:].decode(errors="replace"))
+        actual = _rows(stdout.decode(errors="replace"))
+        if not self.ordered:
+            actual, expected = sorted(actual), sorted(expected)
+        if len(actual) != len(expected):
+            return f"Expected {len(expected)} rows, got {len(actual)}"
+        for n, (got, want) in enumerate(zip(actual, expected), 1):
+            if got != want:
+                order = "" if self.ordered else " (rows sorted, as the query has no ORDER BY)"
+                return f"Row {n}{order}: expected '{'|'.join(want)}', got '{'|'.join(got)}'"
+        return None
+
+
+def _rows(text: str):
+    return [tuple(_cell(c) for c in line.split("|")) for line in text.strip().splitlines() if line.strip()]
+
+
+def _cell(text: str) -> str:
+    text = text.strip()
+    try:
+        return _number(float(text))
+    except (ValueError, OverflowError):
+        return text
+
+
+def _ordered(query: str) -> bool:
+    # Drop string literals, comments and parenthesised subqueries, then look for ORDER BY
+    text = re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", " ", query, flags=re.S)
+    while True:
+        stripped = re.sub(r"\([^()]*\)", " ", text)
+        if stripped == text:
+            break
+        text = stripped
+    return re.search(r"\border\s+by\b", text, re.I) is not None
@@ -0,0 +1,90 @@
+# core/execution/timing.py
+"""
+Repeated, pinned timing runs of a program (see core.utils.performance).
+
+One run of a test case says little about how fast a program is: start-up,
+page cache, other runs on the host and frequency scaling move a single
+measurement by tens of percent. time_code() therefore runs every test case
+`runs` times, one run at a time, after an untimed warm-up run, with the
+calling thread pinned to `cpus` (os.sched_setaffinity): cold spawns, the
+fork-servers (see bootstrap/python_zygote.py) and the JVMs started for the
+runs inherit the pinning. No warm pool is used, so every run starts alike.
+
+The time of a run is its CPU time, or its wall time where the sandbox does not
+report CPU time. A test case's statistic is the trimmed mean of its runs (the
+`trim` fraction of the fastest and of the slowest runs dropped) and its noise
+the median absolute deviation of the runs, relative to their median, in percent.
+"""
+import os, statistics
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from core.execution.executor import run_code_challenge
+
+
+@dataclass
+class Timing:
+    time_ms:   float          # trimmed mean of the runs
+    noise_pct: float          # median absolute deviation, % of the median
+    samples:   List[float]
+
+
+def trimmed_mean(samples, trim: float) -> float:
+    """Mean of `samples` without the `trim` fraction of the lowest and of the highest ones."""
+    ordered = sorted(samples)
+    cut = min(int(len(ordered) * trim), (len(ordered) - 1) // 2)
+    kept = ordered[cut:len(ordered) - cut]
+    return sum(kept) / len(kept)
+
+
+def noise_pct(samples) -> float:
+    """Median absolute deviation of `samples`, in percent of their median."""
+    median = statistics.median(samples)
+    if median <= 0:
+        return 0.0
+    return 100 * statistics.median(abs(s - median) for s in samples) / median
+
+
+@contextmanager
+def pinned(cpus):
+    """Pin the calling thread (and what it starts) to `cpus`; no-op when empty or unsupported."""
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        yield
+        return
+    before = os.sched_getaffinity(0)
+    try:
+        os.sched_setaffinity(0, cpus)
+    except OSError:
+        yield   # CPUs outside this process's cpuset: run unpinned
+        return
+    try:
+        yield
+    finally:
+        os.sched_setaffinity(0, before)
+
+
+def time_code(code: str, language: str, test_cases, runs: int = 5, trim: float = 0.2,
+              cpus=None, **options) -> Dict[str, Optional[Timing]]:
+    """
+    Time `code` on every test case (test case id -> Timing). A test case
+    that was not accepted on every run gets None. `options` are passed to
+    run_code_challenge() (limits, sandbox, checker...); parallel runs and warm
+    pools are turned off.
+    """
+    options.update(parallel=False, warm_pool_size=0, fail_fast=False)
+    samples = {tc.id: [] for tc in test_cases}
+    failed = set()
+    with pinned(cpus):
+        run_code_challenge(code, language, test_cases, **options)   # warm-up: caches, compilation
+        for _ in range(runs):
+            for r in run_code_challenge(code, language, test_cases, **options):
+                if r.status != "accepted":
+                    failed.add(r.test_case_id)
+                else:
+                    samples[r.test_case_id].append(r.cpu_ms if r.cpu_ms is not None else r.time_ms)
+    return {
+        tc_id: None if tc_id in failed or not times
+        else Timing(round(trimmed_mean(times, trim), 3), round(noise_pct(times), 2), times)
+        for tc_id, times in samples.items()
+    }
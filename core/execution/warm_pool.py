@@ -0,0 +1,332 @@
+# core/execution/warm_pool.py
+"""
+Warm interpreter pools for interpreted languages.
+
+Interpreter start-up (tens of milliseconds for python3 / node) often costs
+more than the student's solution itself. The pools below keep interpreters
+started ahead of time:
+
+- python:     a few long-lived fork-servers ("zygotes", see
+              bootstrap/python_zygote.py). Each execution is a fresh fork of an
+              already initialised interpreter, which joins the run's sandbox
+              box (see sandbox) before the student's code runs.
+- javascript: Node cannot fork, so spare `node` processes are pre-spawned with
+              the rlimits already applied and each one runs a single program
+              (see bootstrap/node_spare.js); a spare is moved into the run's
+              cgroup when it is handed a program. Replacements are started in
+              the background, off the critical path.
+
+The zygotes double as a launcher for every other run (`get_spawner`): forking
+from a small process rather than from the judge worker keeps the peak RSS
+reported for the child its own.
+
+A pool that cannot serve a request returns None and the executor falls back
+to a cold spawn, so a broken or exhausted pool never fails a run.
+"""
+import json, os, queue, signal, socket, subprocess, tempfile, threading, time
+from typing import Optional
+
+from core.execution import sandbox
+from core.execution.process import WATCH_INTERVAL_S, ProcessRun, ProcUsage, communicate, elapsed_ms, read_capped
+
+_BOOTSTRAP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bootstrap")
+
+
+class WarmPoolError(Exception):
+    """The warm worker broke down mid-request; the caller should run cold."""
+
+
+class _Zygote:
+    def __init__(self):
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.proc = subprocess.Popen(
+                ["python3", os.path.join(_BOOTSTRAP_DIR, "python_zygote.py"), str(child.fileno())],
+                pass_fds=[child.fileno()],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+        finally:
+            child.close()
+        self.sock = parent
+        self._buf = b""
+
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def close(self):
+        self.sock.close()
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def _read_message(self, timeout: Optional[float]) -> dict:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b"\n" not in self._buf:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise socket.timeout()
+            self.sock.settimeout(remaining)
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise WarmPoolError("zygote closed the connection")
+            self._buf += chunk
+        line, self._buf = self._buf.split(b"\n", 1)
+        return json.loads(line)
+
+    def execute(self, src_path: str, stdin: bytes, box: sandbox.Box,
+                output_limit: Optional[int]) -> ProcessRun:
+        return self._run({"file": src_path}, stdin, box, output_limit)
+
+    def spawn(self, argv, stdin: bytes, box: sandbox.Box, output_limit: Optional[int]) -> ProcessRun:
+        return self._run({"argv": argv}, stdin, box, output_limit)
+
+    def _wait_done(self, pid: int, box: sandbox.Box):
+        """The child's exit report, and whether it had to be killed over its time limit."""
+        deadline = time.monotonic() + box.wall_s
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining > 0 and not (box.watchdog and box.watchdog()):
+                if box.watchdog is not None:
+                    remaining = min(remaining, WATCH_INTERVAL_S)
+                try:
+                    return self._read_message(timeout=remaining), False
+                except socket.timeout:
+                    continue
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            return self._read_message(timeout=5), True
+
+    def _run(self, target: dict, stdin: bytes, box: sandbox.Box,
+             output_limit: Optional[int]) -> ProcessRun:
+        with tempfile.TemporaryFile() as fin, \
+             tempfile.TemporaryFile() as fout, \
+             tempfile.TemporaryFile() as ferr:
+            fin.write(stdin)
+            fin.seek(0)
+
+            request = json.dumps({
+                **target, "memory_mb": box.rlimit_mb, "cpu_s": box.rlimit_cpu_s,
+                "output_limit": output_limit, "cgroup": box.path, "cpus": _thread_cpus(),
+            }).encode()
+            t0 = time.perf_counter()
+            try:
+                socket.send_fds(self.sock, [request], [fin.fileno(), fout.fileno(), ferr.fileno()])
+                pid = self._read_message(timeout=5)["pid"]
+            except (OSError, ValueError) as exc:
+                raise WarmPoolError(str(exc)) from exc
+            spawn_ms = elapsed_ms(t0)
+
+            try:
+                done, timed_out = self._wait_done(pid, box)
+            except (OSError, ValueError) as exc:
+                raise WarmPoolError(str(exc)) from exc
+            elapsed = elapsed_ms(t0)
+
+            # The child's RLIMIT_FSIZE keeps the files at most one byte past the cap
+            return ProcessRun(
+                done["returncode"],
+                read_capped(fout, output_limit),
+                read_capped(ferr, output_limit),
+                elapsed, timed_out,
+                memory_kb=done.get("maxrss_kb"),
+                cpu_ms=done.get("cpu_ms"),
+                spawn_ms=spawn_ms,
+                user_ms=done.get("user_ms"),
+                sys_ms=done.get("sys_ms"),
+            )
+
+
+class PythonZygotePool:
+    """Up to `size` fork-servers, each serving one execution at a time."""
+
+    def __init__(self, size: int):
+        self.size  = size
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+
+    def _acquire(self) -> Optional[_Zygote]:
+        while True:
+            try:
+                zygote = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if zygote.alive():
+                return zygote
+            self._discard(zygote)
+        with self._lock:
+            if self._started >= self.size:
+                return None
+            self._started += 1
+        try:
+            return _Zygote()
+        except OSError:
+            with self._lock:
+                self._started -= 1
+            return None
+
+    def _discard(self, zygote: _Zygote):
+        zygote.close()
+        with self._lock:
+            self._started -= 1
+
+    def execute(self, src_path, stdin, box, output_limit) -> Optional[ProcessRun]:
+        return self._serve("execute", src_path, stdin, box, output_limit)
+
+    def spawn(self, argv, stdin, box, output_limit) -> Optional[ProcessRun]:
+        """Run an arbitrary command from a zygote (see python_zygote.py)."""
+        return self._serve("spawn", argv, stdin, box, output_limit)
+
+    def _serve(self, method, *args) -> Optional[ProcessRun]:
+        zygote = self._acquire()
+        if zygote is None:
+            return None
+        try:
+            run = getattr(zygote, method)(*args)
+        except WarmPoolError:
+            self._discard(zygote)
+            return None
+        self._idle.put(zygote)
+        return run
+
+
+class _NodeSpare:
+    def __init__(self, limits: sandbox.Box, output_limit: Optional[int]):
+        read_fd, self.control_fd = os.pipe()
+        try:
+            self.proc = limits.popen(
+                ["node", os.path.join(_BOOTSTRAP_DIR, "node_spare.js"), str(read_fd)],
+                output_limit,
+                pass_fds=[read_fd],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+        except OSError:
+            os.close(self.control_fd)
+            raise
+        finally:
+            os.close(read_fd)
+
+    def execute(self, src_path: str, stdin: bytes, box: sandbox.Box,
+                output_limit: Optional[int]) -> ProcessRun:
+        # Everything is measured from this side: the program shares the spare's process
+        # and could forge any report of its own. What booting node cost is taken off
+        usage = ProcUsage(self.proc.pid)
+        usage.sample()
+        boot_user_ms, boot_sys_ms = usage.user_ms or 0.0, usage.sys_ms or 0.0
+
+        def watch():
+            usage.sample()   # VmHWM only grows: the last sample is the peak up to then
+            return bool(box.watchdog and box.watchdog())
+
+        t0 = time.perf_counter()
+        os.write(self.control_fd, src_path.encode() + b"\n")
+        os.close(self.control_fd)
+        spawn_ms = elapsed_ms(t0)  # already running: handing it the program is the whole start
+        run = communicate(self.proc, stdin, box.wall_s, output_limit, watch)
+        run.spawn_ms = spawn_ms
+        # The rusage peak RSS counts the judge's RSS when the spare was forked off it
+        run.memory_kb = usage.hwm_kb
+        if run.user_ms is not None:
+            run.user_ms = round(max(run.user_ms - boot_user_ms, 0.0), 2)
+            run.sys_ms  = round(max(run.sys_ms - boot_sys_ms, 0.0), 2)
+            run.cpu_ms  = round(run.user_ms + run.sys_ms, 2)
+        return run
+
+    def discard(self):
+        os.close(self.control_fd)
+        self.proc.kill()
+        self.proc.wait()
+
+
+class NodeSparePool:
+    """
+    Keeps `size` idle node processes per (memory, CPU time, output) rlimits,
+    since those are applied when a spare is spawned.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._spares  = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _spawn(self, key):
+        memory_mb, cpu_s, output_limit = key
+        try:
+            spare = _NodeSpare(sandbox.Box(memory_mb, cpu_s), output_limit)
+        except OSError:
+            spare = None
+        with self._lock:
+            self._pending[key] -= 1
+            if spare is not None:
+                self._spares.setdefault(key, []).append(spare)
+
+    def execute(self, src_path, stdin, box, output_limit) -> Optional[ProcessRun]:
+        key = (box.rlimit_mb, box.rlimit_cpu_s, output_limit)
+        with self._lock:
+            spares  = self._spares.setdefault(key, [])
+            # Oldest first: it is the most likely to have finished booting
+            spare   = spares.pop(0) if spares else None
+            missing = self.size - len(spares) - self._pending.get(key, 0)
+            self._pending[key] = self._pending.get(key, 0) + max(missing, 0)
+        for _ in range(missing):
+            threading.Thread(target=self._spawn, args=(key,), daemon=True).start()
+
+        if spare is None or spare.proc.poll() is not None:
+            return None
+        try:
+            box.add(spare.proc.pid)
+        except OSError:
+            spare.discard()  # could not be moved into the run's cgroup
+            return None
+        return spare.execute(src_path, stdin, box, output_limit)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_spawner = None
+
+
+def get_pool(language: str, size: int):
+    """
+    Return the process-wide warm pool for `language`, or None when the language
+    has no warm mode.
+    """
+    if language not in ("python", "javascript") or size <= 0:
+        return None
+    with _pools_lock:
+        pool = _pools.get(language)
+        if pool is None:
+            if language == "python":
+                pool = PythonZygotePool(size)
+            else:
+                pool = NodeSparePool(size)
+            _pools[language] = pool
+        return pool
+
+
+def get_spawner(size: int) -> Optional[PythonZygotePool]:
+    """The process-wide launcher for runs without a warm runner (None when size <= 0)."""
+    global _spawner
+    if size <= 0:
+        return None
+    with _pools_lock:
+        if _spawner is None:
+            _spawner = PythonZygotePool(size)
+        return _spawner
+
+
+def _thread_cpus() -> Optional[list]:
+    """The CPUs the calling thread may run on, for the fork-server's child (see timing.pinned)."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS
+        return None
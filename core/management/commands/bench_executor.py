@@ -0,0 +1,141 @@
+import json, os, platform, subprocess
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.execution import benchmark
+from core.execution.executor import LANGUAGE_CONFIG, available_cores
+from core.utils.grading import execution_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the code executor on a fixed corpus of reference solutions: submissions per "
+        "second, p50/p95/p99 latency and peak memory per language, workload and concurrency level. "
+        "Runs with the JUDGE_* settings of this host."
+    )
+
+    def add_arguments(self, parser):
+        runnable = [lang for lang in LANGUAGE_CONFIG if lang in benchmark.SOURCES]
+        parser.add_argument("--languages", default=",".join(runnable),
+                            help=f"Comma-separated, from {', '.join(runnable)}. Default: all")
+        parser.add_argument("--workloads", default=",".join(benchmark.WORKLOADS),
+                            help=f"Comma-separated, from {', '.join(benchmark.WORKLOADS)}. Default: all")
+        parser.add_argument("--concurrency", default="1,4",
+                            help="Comma-separated submissions in flight at once. Default: 1,4")
+        parser.add_argument("--submissions", type=int, default=20,
+                            help="Submissions per language, workload and concurrency level. Default: 20")
+        parser.add_argument("--warmup", type=int, default=1,
+                            help="Untimed submissions before each workload. Default: 1")
+        parser.add_argument("--memory-mb", type=int, default=benchmark.MEMORY_MB,
+                            help=f"Memory limit of every run. Default: {benchmark.MEMORY_MB}")
+        parser.add_argument("--no-compile-cache", action="store_true",
+                            help="Compile every submission, as for code never seen before")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+        parser.add_argument("--compare", help="Earlier JSON results to show the change against")
+
+    def handle(self, *args, **opts):
+        languages = _split(opts["languages"])
+        workloads = _split(opts["workloads"])
+        unknown = [lang for lang in languages if lang not in benchmark.SOURCES] + \
+                  [w for w in workloads if w not in benchmark.WORKLOADS]
+        if unknown:
+            raise CommandError(f"Unknown language or workload: {', '.join(unknown)}")
+        try:
+            levels = [int(c) for c in _split(opts["concurrency"])]
+        except ValueError:
+            raise CommandError("--concurrency must be comma-separated integers")
+        if not levels or min(levels) < 1 or opts["submissions"] < 1:
+            raise CommandError("--concurrency and --submissions must be at least 1")
+
+        options = execution_options()
+        if opts["no_compile_cache"]:
+            options["compile_cache"] = None
+
+        baseline = {}
+        if opts["compare"]:
+            with open(opts["compare"]) as f:
+                baseline = {_row_key(row): row for row in json.load(f)["results"]}
+
+        rows, skipped = [], {}
+        for language in languages:
+            missing = benchmark.missing_toolchain(language)
+            if missing:
+                skipped[language] = f"{missing} not installed"
+                self.stderr.write(f"{language}: skipped, {missing} not installed")
+                continue
+            for workload in workloads:
+                for concurrency in levels:
+                    row = benchmark.measure(language, workload, concurrency, opts["submissions"],
+                                            warmup=opts["warmup"], memory_mb=opts["memory_mb"], **options)
+                    rows.append(row)
+                    self.stdout.write(_describe(row, baseline.get(_row_key(row))))
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "host": {
+                "platform": platform.platform(),
+                "python":   platform.python_version(),
+                "cores":    available_cores(),
+                "commit":   _git_commit(),
+            },
+            "options": {
+                "parallel":       options["parallel"],
+                "max_workers":    options["max_workers"],
+                "warm_pool_size": options["warm_pool_size"],
+                "compile_cache":  options["compile_cache"] is not None,
+                "sandbox":        options["sandbox"].name,
+                "submissions":    opts["submissions"],
+                "warmup":         opts["warmup"],
+                "time_limit_s":   benchmark.TIME_LIMIT_S,
+                "memory_mb":      opts["memory_mb"],
+            },
+            "skipped": skipped,
+            "results": rows,
+        }
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {opts['output']}"))
+
+
+def _split(value: str):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def _row_key(row: dict):
+    return row["language"], row["workload"], row["concurrency"]
+
+
+def _describe(row: dict, before: dict = None) -> str:
+    latency = row["latency_ms"]
+    line = (
+        f"{row['language']:<10} {row['workload']:<10} c={row['concurrency']:<3} "
+        f"{row['throughput']:>8.2f} subs/s  p50 {latency['p50']:>8.1f} ms  "
+        f"p95 {latency['p95']:>8.1f} ms  p99 {latency['p99']:>8.1f} ms  "
+        f"peak {row['peak_memory_mb'] or 0:>7.1f} MB"
+    )
+    if row["failed"]:
+        line += f"  ({row['failed']} not accepted)"
+    if before:
+        line += (
+            f"  [throughput {_change(before['throughput'], row['throughput'])}, "
+            f"p95 {_change(before['latency_ms']['p95'], latency['p95'])}]"
+        )
+    return line
+
+
+def _change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
@@ -0,0 +1,138 @@
+import json, statistics, time, uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from authentication.models import User
+from core.execution.executor import TestResult
+from core.models.challenge_model import Challenge
+from core.models.code_challenge import CodeChallengeConfig, CodeSubmissionResult, CodeTestCase
+from core.models.course_model import Course
+from core.models.submission_model import Submission
+from core.models.topic_model import Topic
+from core.utils.grading import save_code_results
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark storing a graded code submission: the per-row write path (one INSERT per "
+        "result, a scan of the test cases per result, the Submission saved on its own) against "
+        "grading.save_code_results (one transaction, bulk insert, one UPDATE). No code runs; the "
+        "results are synthetic. Everything written is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cases", default="100,500,1000",
+                            help="Comma-separated test suite sizes. Default: 100,500,1000")
+        parser.add_argument("--repeat", type=int, default=5,
+                            help="Submissions stored per path and size. Default: 5")
+        parser.add_argument("--output", help="Write the results as JSON to this file")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = [int(n) for n in opts["cases"].split(",") if n.strip()]
+        except ValueError:
+            raise CommandError("--cases must be comma-separated integers")
+        if not sizes or min(sizes) < 1 or opts["repeat"] < 1:
+            raise CommandError("--cases and --repeat must be at least 1")
+
+        rows = []
+        try:
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    email=f"bench-{uuid.uuid4().hex}@example.com", username=f"bench-{uuid.uuid4().hex[:20]}",
+                    password=None,
+                )
+                course = Course.objects.create(owner=user, title="Grading benchmark", description="Benchmark")
+                topic = Topic.objects.create(course=course, title="Grading benchmark", owner=user)
+                for size in sizes:
+                    config = _challenge(topic, size)
+                    test_cases = list(config.test_cases.all())
+                    results = [
+                        TestResult(tc.id, "accepted" if i % 3 else "wrong_answer", "x" * 64, "", 12.5, tc.is_public,
+                                   9.5, 10.0, phases={"wall": 12.5}, message=None if i % 3 else "Token 1")
+                        for i, tc in enumerate(test_cases)
+                    ]
+                    for path, store in (("per_row", _per_row), ("bulk", save_code_results)):
+                        row = _measure(path, store, user, config, test_cases, results, opts["repeat"])
+                        rows.append(row)
+                        self.stdout.write(
+                            f"{size:>6} cases  {path:<8} p50 {row['p50_ms']:>9.1f} ms  "
+                            f"max {row['max_ms']:>9.1f} ms  {row['queries']:>6} queries"
+                        )
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        for size in sizes:
+            per_row, bulk = (next(r for r in rows if r["cases"] == size and r["path"] == p) for p in ("per_row", "bulk"))
+            self.stdout.write(self.style.SUCCESS(
+                f"{size:>6} cases  bulk is {per_row['p50_ms'] / bulk['p50_ms']:.1f}x faster "
+                f"({per_row['queries']} -> {bulk['queries']} queries)"
+            ))
+        if opts["output"]:
+            with open(opts["output"], "w") as f:
+                json.dump({"vendor": connection.vendor, "repeat": opts["repeat"], "results": rows}, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {opts['output']}"))
+
+
+def _challenge(topic, size: int):
+    challenge = Challenge.objects.create(
+        topic=topic, title=f"Grading benchmark {size}", body="Benchmark", points=100, challenge_type="code",
+    )
+    config = CodeChallengeConfig.objects.create(challenge=challenge, language="python")
+    CodeTestCase.objects.bulk_create([
+        CodeTestCase(config=config, stdin=str(i), expected_stdout=str(i), is_public=i < 3) for i in range(size)
+    ])
+    return config
+
+
+def _measure(path, store, user, config, test_cases, results, repeat: int) -> dict:
+    times, queries = [], 0
+    for attempt in range(repeat):
+        submission = Submission.objects.create(
+            user=user, challenge=config.challenge, attempt_no=Submission.objects.filter(user=user).count() + 1,
+            answer_text="", status="pending",
+        )
+        with CaptureQueriesContext(connection) as captured:
+            t0 = time.perf_counter()
+            store(submission, config, test_cases, results)
+            times.append((time.perf_counter() - t0) * 1000)
+        queries = len(captured)
+    return {
+        "path": path,
+        "cases": len(test_cases),
+        "p50_ms": round(statistics.median(times), 2),
+        "max_ms": round(max(times), 2),
+        "queries": queries,
+    }
+
+
+def _per_row(submission, config, test_cases, results):
+    """The write path grading used before save_code_results, kept as the baseline."""
+    challenge = config.challenge
+    submission.test_results.all().delete()
+    total_weight = sum(tc.weight for tc in test_cases)
+    earned_weight = 0
+    passed = 0
+    for r in results:
+        CodeSubmissionResult.objects.create(
+            submission=submission, test_case_id=r.test_case_id, status=r.status, stdout=r.stdout,
+            stderr=r.stderr, execution_time_ms=r.time_ms, cpu_time_ms=r.cpu_ms, memory_used_mb=r.memory_mb,
+            phase_timings=r.phases, message=r.message or "",
+        )
+        if r.status == "accepted":
+            passed += 1
+            tc = next(tc for tc in test_cases if tc.id == r.test_case_id)
+            earned_weight += tc.weight
+    all_passed = passed == len(results)
+    submission.score = round((earned_weight / total_weight) * challenge.points) if total_weight else 0
+    submission.status = "passed" if all_passed else "failed"
+    submission.feedback = f"{passed}/{len(results)} test cases passed."
+    submission.save()
+    return all_passed
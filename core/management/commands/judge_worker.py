@@ -0,0 +1,68 @@
+import logging, multiprocessing, signal, threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.execution.benchmark import missing_toolchain
+from core.execution.executor import LANGUAGE_CONFIG
+from core.utils.judge_fleet import JudgeWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a judge worker of the fleet (see core.utils.judge_fleet): take code runs for the "
+        "languages installed on this host off the Redis queues and run them with this host's "
+        "JUDGE_* settings. --processes starts several workers, e.g. to try the fleet locally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--languages",
+                            help="Comma-separated languages to serve. Default: all installed on this host")
+        parser.add_argument("--slots", type=int, default=settings.JUDGE_FLEET_SLOTS,
+                            help=f"Jobs run at once per worker. Default: {settings.JUDGE_FLEET_SLOTS}")
+        parser.add_argument("--processes", type=int, default=1,
+                            help="Worker processes to start, each one a worker of its own. Default: 1")
+
+    def handle(self, *args, **opts):
+        if opts["languages"]:
+            languages = [lang.strip() for lang in opts["languages"].split(",") if lang.strip()]
+            unknown = [lang for lang in languages if lang not in LANGUAGE_CONFIG]
+            if unknown:
+                raise CommandError(f"Unknown language: {', '.join(unknown)}")
+        else:
+            languages = [lang for lang, config in LANGUAGE_CONFIG.items()
+                         if config.get("engine") or not missing_toolchain(lang)]
+        if not languages:
+            raise CommandError("No language can run on this host")
+        if opts["slots"] < 1 or opts["processes"] < 1:
+            raise CommandError("--slots and --processes must be at least 1")
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+        if opts["processes"] == 1:
+            _work(languages, opts["slots"])
+            return
+
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_work, args=(languages, opts["slots"]), name=f"judge-worker-{i}")
+            for i in range(opts["processes"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} judge workers for {', '.join(languages)}")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()   # each one finishes its running jobs first
+            for process in processes:
+                process.join()
+
+
+def _work(languages, slots: int):
+    """Run one worker until SIGTERM or SIGINT, then let its running jobs finish."""
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    JudgeWorker(languages, slots).run(stop)
@@ -1,4 +1,5 @@
 # core/models/code_challenge.py
+from django.conf import settings
 from django.db import models
 
 class CodeChallengeConfig(models.Model):
@@ -9,6 +10,15 @@ class CodeChallengeConfig(models.Model):
         ("cpp",        "C++"),
         ("sql",        "SQL"),
     ]
+    CHECKER_CHOICES = [
+        ("tokens",  "Token by token"),             # whitespace-insensitive, optional float tolerance
+        ("exact",   "Exact output"),
+        ("program", "Custom checker program"),     # checker_program decides, see core.execution.checkers
+    ]
+    EXECUTION_MODE_CHOICES = [
+        ("isolated", "One process per test case"),
+        ("harness",  "All test cases in one harness process"),  # pure-function challenges only
+    ]
     challenge         = models.OneToOneField(
         "Challenge", on_delete=models.CASCADE, related_name="code_config"
     )
@@ -17,6 +27,19 @@ class CodeChallengeConfig(models.Model):
     solution_hidden   = models.TextField(blank=True)   # reference solution, never exposed
     time_limit_seconds = models.PositiveIntegerField(default=5)
     memory_limit_mb    = models.PositiveIntegerField(default=128)
+    execution_mode     = models.CharField(
+        max_length=20, choices=EXECUTION_MODE_CHOICES, default="isolated"
+    )
+    test_cases_version = models.PositiveIntegerField(default=0)  # bumped when test cases are replaced
+    partial_credit     = models.BooleanField(default=True)   # score by passed test weight, else all or nothing
+    fail_fast          = models.BooleanField(default=False)  # without partial credit: stop grading at the first failure
+    sql_schema         = models.TextField(blank=True)   # sql only: CREATE TABLE / INSERT fixture every query runs on
+    checker            = models.CharField(max_length=20, choices=CHECKER_CHOICES, default="tokens")
+    float_epsilon      = models.FloatField(null=True, blank=True)  # tokens: numbers this close are equal; null = exact
+    checker_program    = models.TextField(blank=True)   # program: python3 checker.py <input> <expected> <output>, exits 42 / 43
+    # Share of the points earned by runtime against the reference solution (see core.utils.performance); 0 = not graded on runtime
+    performance_weight    = models.FloatField(default=0)
+    performance_max_ratio = models.FloatField(default=10.0)   # this many times the reference runtime earns no runtime points
 
     def __str__(self):
         return f"Config for {self.challenge.slug} ({self.language})"
@@ -28,9 +51,18 @@ class CodeTestCase(models.Model):
     )
     stdin           = models.TextField(blank=True)
     expected_stdout = models.TextField()
+    # sha256 of large data stored as a file instead (see core.utils.test_data); the text field is then empty
+    stdin_digest    = models.CharField(max_length=64, blank=True)
+    expected_digest = models.CharField(max_length=64, blank=True)
     is_public       = models.BooleanField(default=False)  # True = show as example
     weight          = models.FloatField(default=1.0)
     description     = models.CharField(max_length=200, blank=True)
+    # Measured on the last reference run (see core.utils.reference); null until one ran
+    reference_time_ms   = models.FloatField(null=True, blank=True)
+    reference_memory_mb = models.FloatField(null=True, blank=True)
+    # Timed runs of the reference solution (see core.utils.performance); null until timed
+    reference_perf_ms        = models.FloatField(null=True, blank=True)
+    reference_perf_noise_pct = models.FloatField(null=True, blank=True)
 
     class Meta:
         ordering = ["id"]
@@ -42,8 +74,10 @@ class CodeSubmissionResult(models.Model):
         ("wrong_answer",       "Wrong Answer"),
         ("time_limit",         "Time Limit Exceeded"),
         ("memory_limit",       "Memory Limit Exceeded"),
+        ("output_limit",       "Output Limit Exceeded"),
         ("runtime_error",      "Runtime Error"),
         ("compilation_error",  "Compilation Error"),
+        ("skipped",            "Skipped"),   # not run: an earlier test case failed (fail_fast)
     ]
     submission      = models.ForeignKey(
         "Submission", on_delete=models.CASCADE, related_name="test_results"
@@ -53,4 +87,62 @@ class CodeSubmissionResult(models.Model):
     stdout          = models.TextField(blank=True)
     stderr          = models.TextField(blank=True)
     execution_time_ms = models.FloatField(null=True)
-    memory_used_mb    = models.FloatField(null=True)
\ No newline at end of file
+    cpu_time_ms       = models.FloatField(null=True)
+    memory_used_mb    = models.FloatField(null=True)
+    phase_timings     = models.JSONField(null=True, blank=True)  # ms per phase of the run, see executor.PHASES
+    message           = models.TextField(blank=True)   # the checker's note on a wrong answer
+    # Performance-graded challenges: trimmed mean and noise of the timed runs (see core.utils.performance)
+    perf_time_ms      = models.FloatField(null=True, blank=True)
+    perf_noise_pct    = models.FloatField(null=True, blank=True)
+
+
+class ReferenceRun(models.Model):
+    """A run of a challenge's hidden reference solution over its test cases (see core.utils.reference)."""
+    MODE_CHOICES = [
+        ("fill",  "Fill in expected outputs"),   # expected_stdout := the reference output
+        ("check", "Check expected outputs"),     # report the cases the reference solution fails
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done",    "Done"),
+        ("failed",  "Failed"),    # the reference solution did not compile or could not be run
+    ]
+    config         = models.ForeignKey(
+        CodeChallengeConfig, on_delete=models.CASCADE, related_name="reference_runs"
+    )
+    created_by     = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    mode           = models.CharField(max_length=10, choices=MODE_CHOICES, default="check")
+    set_time_limit = models.BooleanField(default=False)   # apply the suggested time limit when every case ran
+    status         = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    detail         = models.TextField(blank=True)          # why the run failed
+    results        = models.JSONField(default=list, blank=True)   # one entry per test case
+    suggested_time_limit_seconds = models.PositiveIntegerField(null=True, blank=True)
+    created_at     = models.DateTimeField(auto_now_add=True)
+    finished_at    = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class Rejudge(models.Model):
+    """A re-judge of the latest submissions to a challenge after its test cases changed (see core.utils.rejudge)."""
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done",    "Done"),
+    ]
+    config      = models.ForeignKey(
+        CodeChallengeConfig, on_delete=models.CASCADE, related_name="rejudges"
+    )
+    full        = models.BooleanField(default=False)   # limits or checker changed: every test case runs again
+    status      = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    total       = models.PositiveIntegerField(default=0)   # submissions to re-judge
+    processed   = models.PositiveIntegerField(default=0)
+    changed     = models.PositiveIntegerField(default=0)   # submissions whose passed / failed status changed
+    errors      = models.PositiveIntegerField(default=0)   # submissions that could not be re-judged
+    created_at  = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
@@ -19,6 +19,7 @@ class Submission(models.Model):
     )
     attempt_no = models.PositiveIntegerField(default=1)
     answer_text = models.TextField(blank=True, null=True)
+    language = models.CharField(max_length=30, blank=True)  # code: the language it was judged as
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     score = models.FloatField(default=0)
     feedback = models.TextField(blank=True)
@@ -0,0 +1,47 @@
+# core/models/usage_model.py
+from django.conf import settings
+from django.db import models
+
+
+class CpuUsage(models.Model):
+    """CPU time the judge spent on a user's code in a course, per day (flushed from Redis, see core.utils.cpu_usage)."""
+    KIND_CHOICES = [
+        ("run",    "Dry runs"),              # /run/
+        ("submit", "Graded submissions"),    # /submit/
+    ]
+    user    = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="cpu_usage")
+    course  = models.ForeignKey("Course", on_delete=models.CASCADE, related_name="cpu_usage")
+    kind    = models.CharField(max_length=10, choices=KIND_CHOICES)
+    day     = models.DateField()
+    cpu_ms  = models.FloatField(default=0)
+    runs    = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-day"]
+        unique_together = [("user", "course", "kind", "day")]
+
+
+class CpuQuota(models.Model):
+    """
+    CPU seconds of judging allowed per rolling JUDGE_USAGE_WINDOW_S (see core.utils.cpu_usage).
+    Teachers set them for their courses; quotas without a course are site-wide and set by admins.
+    """
+    SCOPE_CHOICES = [
+        ("user",   "Each student"),       # one student's usage (in the course, or everywhere)
+        ("course", "The whole course"),   # every student of the course together
+    ]
+    course      = models.ForeignKey(
+        "Course", on_delete=models.CASCADE, null=True, blank=True, related_name="cpu_quotas"
+    )   # null: site-wide
+    user        = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="cpu_quotas"
+    )   # "user" scope only: this student; null = every student
+    scope       = models.CharField(max_length=10, choices=SCOPE_CHOICES, default="user")
+    cpu_seconds = models.PositiveIntegerField()
+    updated_by  = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    updated_at  = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("course", "user", "scope")]
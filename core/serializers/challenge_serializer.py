@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from core.models.challenge_model import Challenge
+from core.execution import sql_engine
 from core.models.code_challenge import CodeTestCase, CodeChallengeConfig
+from core.utils.test_data import test_case_fields
 from core.models.topic_model import Topic
 from core.models.challenge_correct_answer import ChallengeCorrectAnswer
 from core.models.challenge_option import ChallengeOption
@@ -98,6 +100,7 @@ class ChallengeListSerializer(serializers.ModelSerializer):
     options = serializers.SerializerMethodField()
     code_language = serializers.SerializerMethodField()
     code_template = serializers.SerializerMethodField()
+    code_sql_schema = serializers.SerializerMethodField()
     code_test_cases = serializers.SerializerMethodField()
     user_status = serializers.SerializerMethodField()
     hint_available = serializers.SerializerMethodField()
@@ -115,7 +118,7 @@ class ChallengeListSerializer(serializers.ModelSerializer):
             "challenge_type", "sort_order",
             "photo", "slug",
             "options",
-            "code_language", "code_template", "code_test_cases",
+            "code_language", "code_template", "code_sql_schema", "code_test_cases",
             "user_status",
             "hint_available", "solution_available",
             "user_hint_used", "user_solution_revealed",
@@ -158,6 +161,12 @@ class ChallengeListSerializer(serializers.ModelSerializer):
             return obj.code_config.solution_template
         return None
 
+    def get_code_sql_schema(self, obj):
+        # The tables a SQL query runs on, shown to the student next to the statement
+        if obj.challenge_type == "code" and hasattr(obj, "code_config") and obj.code_config.language == "sql":
+            return obj.code_config.sql_schema
+        return None
+
     def get_code_test_cases(self, obj):
         request = self.context.get("request")
         if obj.challenge_type != "code" or not hasattr(obj, "code_config"):
@@ -169,7 +178,9 @@ class ChallengeListSerializer(serializers.ModelSerializer):
             return None
         if not request or not request.user.is_authenticated or request.user != topic_owner:
             return None
-        return list(obj.code_config.test_cases.values("id", "stdin", "expected_stdout", "is_public"))
+        return list(obj.code_config.test_cases.values(
+            "id", "stdin", "expected_stdout", "stdin_digest", "expected_digest", "is_public",
+        ))
 
     def get_user_status(self, obj):
         request = self.context.get("request")
@@ -215,7 +226,26 @@ class CodeConfigSerializer(serializers.ModelSerializer):
     class Meta:
         model  = CodeChallengeConfig
         fields = ["language", "solution_template", "solution_hidden",
-                  "time_limit_seconds", "memory_limit_mb", "test_cases"]
+                  "time_limit_seconds", "memory_limit_mb", "execution_mode",
+                  "partial_credit", "fail_fast", "sql_schema",
+                  "checker", "float_epsilon", "checker_program",
+                  "performance_weight", "performance_max_ratio", "test_cases"]
+
+    def validate(self, data):
+        if data.get("language") == "sql":
+            try:
+                sql_engine.template(data.get("sql_schema", ""))
+            except ValueError as exc:
+                raise serializers.ValidationError({"sql_schema": str(exc)})
+        if data.get("checker") == "program" and not data.get("checker_program", "").strip():
+            raise serializers.ValidationError({"checker_program": "Required when checker is 'program'."})
+        if data.get("float_epsilon") is not None and data["float_epsilon"] < 0:
+            raise serializers.ValidationError({"float_epsilon": "Must not be negative."})
+        if not 0 <= data.get("performance_weight", 0) <= 1:
+            raise serializers.ValidationError({"performance_weight": "Must be between 0 and 1."})
+        if data.get("performance_max_ratio", 10.0) <= 1:
+            raise serializers.ValidationError({"performance_max_ratio": "Must be greater than 1."})
+        return data
 
 class ChallengeCreateSerializer(serializers.ModelSerializer):
     code_config = CodeConfigSerializer(required=False)
@@ -240,6 +270,7 @@ class ChallengeCreateSerializer(serializers.ModelSerializer):
         if config_data:
             config = CodeChallengeConfig.objects.create(challenge=challenge, **config_data)
             for tc in test_cases:
-                CodeTestCase.objects.create(config=config, **tc)
+                data = test_case_fields(tc.pop("stdin", ""), tc.pop("expected_stdout"))
+                CodeTestCase.objects.create(config=config, **tc, **data)
 
         return challenge
\ No newline at end of file
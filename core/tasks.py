@@ -0,0 +1,121 @@
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def judge_submission(submission_id: int, language: str, deferrals: int = 0):
+    """
+    Grade a pending code submission on the judge queue.
+    Routed to the dedicated ``judge`` queue (see CELERY_TASK_ROUTES) so long
+    running test suites never occupy a web worker.
+
+    A submission whose user is over a CPU quota is held back again, up to
+    cpu_usage.max_deferrals() times (`deferrals` so far), then judged anyway.
+    """
+    from core.models.submission_model import Submission
+    from core.utils import cpu_usage
+    from core.utils.grading import grade_code_submission, reject_code_submission
+
+    try:
+        submission = Submission.objects.select_related(
+            "user", "challenge__code_config", "challenge__topic__course",
+        ).get(id=submission_id)
+    except Submission.DoesNotExist:
+        logger.error(f"Submission {submission_id} not found, skipping judge run")
+        return
+
+    if submission.status != "pending":
+        # Redelivered after the first delivery already finished grading
+        return
+
+    if deferrals < cpu_usage.max_deferrals():
+        verdict = cpu_usage.check(submission.user_id, submission.challenge.topic.course_id)
+        if verdict.state == "over":
+            judge_submission.apply_async((submission_id, language, deferrals + 1),
+                                         countdown=cpu_usage.judge_delay(verdict))
+            return
+
+    try:
+        grade_code_submission(submission, language)
+    except ValueError as exc:
+        reject_code_submission(submission, str(exc))
+    except Exception:
+        # Never leave it pending: a pending submission holds its user back (see cpu_usage).
+        # One whose results were stored already keeps them
+        logger.exception(f"Judging submission {submission_id} failed")
+        submission.refresh_from_db(fields=["status"])
+        if submission.status == "pending":
+            reject_code_submission(submission, "The judge could not run this submission. Please submit it again.")
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_reference_solution(reference_run_id: int):
+    """
+    Run a challenge's hidden reference solution over its test cases on the
+    judge queue (see core.utils.reference).
+    """
+    from core.models.code_challenge import ReferenceRun
+    from core.utils.reference import fail_reference, run_reference
+
+    try:
+        reference_run = ReferenceRun.objects.select_related("config").get(id=reference_run_id)
+    except ReferenceRun.DoesNotExist:
+        logger.error(f"Reference run {reference_run_id} not found, skipping")
+        return
+
+    if reference_run.status in ("done", "failed"):
+        # Redelivered after the first delivery already finished; a "running" one died half-way
+        return
+
+    reference_run.status = "running"
+    reference_run.save(update_fields=["status"])
+    try:
+        run_reference(reference_run)
+    except ValueError as exc:
+        fail_reference(reference_run, str(exc))
+    except Exception:
+        logger.exception(f"Reference run {reference_run_id} failed")
+        fail_reference(reference_run, "The judge could not run the reference solution. Please try again.")
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def rejudge_challenge(rejudge_id: int):
+    """
+    Split a re-judge into chunks of submissions, each one a rejudge_submissions
+    task on the judge queue (see core.utils.rejudge).
+    """
+    from core.models.code_challenge import Rejudge
+    from core.utils.rejudge import plan
+
+    try:
+        rejudge = Rejudge.objects.select_related("config").get(id=rejudge_id)
+    except Rejudge.DoesNotExist:
+        logger.error(f"Re-judge {rejudge_id} not found, skipping")
+        return
+
+    if rejudge.status != "pending":
+        # Redelivered after its chunks were queued
+        return
+
+    for chunk in plan(rejudge):
+        rejudge_submissions.delay(rejudge_id, chunk)
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def rejudge_submissions(rejudge_id: int, submission_ids: list):
+    """Re-judge one chunk of a re-judge's submissions."""
+    from core.models.code_challenge import Rejudge
+    from core.utils.rejudge import rejudge_chunk
+
+    rejudge = Rejudge.objects.select_related("config__challenge__topic__course").get(id=rejudge_id)
+    rejudge_chunk(rejudge, submission_ids)
+
+
+@shared_task
+def flush_cpu_usage():
+    """Move the CPU usage counted in Redis into CpuUsage rows (see core.utils.cpu_usage)."""
+    from core.utils.cpu_usage import flush
+
+    flush()
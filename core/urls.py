@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from core.views.challenge_view import ChallengeCreateAPIView, ChallengeListAPIView, ChallengeCreateView, UseHintView, RevealSolutionView, ChallengeUpdateAPIView, ChallengeDeleteAPIView
@@ -15,10 +16,14 @@ from core.views.lesson_view import (
     LessonUpdateView, LessonDeleteView,
     TopicItemsView,
 )
-from core.views.submission_view import SubmitChallengeView
-from core.views.run_code_view import RunCodeView
+from core.views.submission_view import SubmitChallengeView, SubmissionStatusView
+from core.views.run_code_view import RunCodeAsyncView, RunCodeView
+from core.views.metrics_view import JudgeFleetView, JudgeMetricsView
+from core.views.reference_run_view import ReferenceRunCreateView, ReferenceRunStatusView
+from core.views.rejudge_view import RejudgeCreateView, RejudgeStatusView
 from core.views.certificate_view import CourseCertificateView, CourseCertificateDownloadView
 from core.views.enrollment_view import CourseStudentsView, CourseStudentRemoveView
+from core.views.cpu_quota_view import CourseCpuQuotaView
 from core.views.bookmark_view import CourseBookmarkToggleView, BookmarkedCoursesView
 from core.views.feedback_view import (
     CourseFeedbackListView, CourseFeedbackCreateView,
@@ -38,6 +43,7 @@ urlpatterns = [
     path('courses/<slug:slug>/certificate/download/', CourseCertificateDownloadView.as_view(), name='course-certificate-download'),
     path('courses/<slug:slug>/students/', CourseStudentsView.as_view(), name='course-students'),
     path('courses/<slug:slug>/students/<str:username>/', CourseStudentRemoveView.as_view(), name='course-student-remove'),
+    path('courses/<slug:slug>/cpu-quota/', CourseCpuQuotaView.as_view(), name='course-cpu-quota'),
     path('courses/<slug:slug>/bookmark/', CourseBookmarkToggleView.as_view(), name='course-bookmark'),
     path('courses/<slug:slug>/feedback/', CourseFeedbackListView.as_view(), name='course-feedback-list'),
     path('courses/<slug:slug>/feedback/submit/', CourseFeedbackCreateView.as_view(), name='course-feedback-create'),
@@ -62,10 +68,20 @@ urlpatterns = [
     path('challenge/create-code/', ChallengeCreateView.as_view(), name='challenge-create-code'),
     path('topics/<slug:slug>/challenges/', ChallengeListAPIView.as_view(), name='challenge-list'),
     path('challenges/<slug:slug>/check/', ChallengeAnswerCheckAPIView.as_view(), name='challenge-check'),
-    path('challenges/<slug:slug>/run/', RunCodeView.as_view(), name='challenge-run'),
+    path('challenges/<slug:slug>/run/',
+         (RunCodeAsyncView if settings.JUDGE_ASYNC_RUNS else RunCodeView).as_view(), name='challenge-run'),
     path('challenges/<slug:slug>/submit/', SubmitChallengeView.as_view(), name='challenge-submit'),
     path('challenges/<slug:slug>/use-hint/', UseHintView.as_view(), name='challenge-use-hint'),
     path('challenges/<slug:slug>/reveal-solution/', RevealSolutionView.as_view(), name='challenge-reveal-solution'),
     path('challenges/<slug:slug>/update/', ChallengeUpdateAPIView.as_view(), name='challenge-update'),
     path('challenges/<slug:slug>/delete/', ChallengeDeleteAPIView.as_view(), name='challenge-delete'),
+    path('challenges/<slug:slug>/reference-run/', ReferenceRunCreateView.as_view(), name='challenge-reference-run'),
+    path('challenges/<slug:slug>/rejudge/', RejudgeCreateView.as_view(), name='challenge-rejudge'),
+    path('submissions/<int:submission_id>/', SubmissionStatusView.as_view(), name='submission-status'),
+    path('reference-runs/<int:reference_run_id>/', ReferenceRunStatusView.as_view(), name='reference-run-status'),
+    path('rejudges/<int:rejudge_id>/', RejudgeStatusView.as_view(), name='rejudge-status'),
+
+    # Judge
+    path('judge/metrics/', JudgeMetricsView.as_view(), name='judge-metrics'),
+    path('judge/fleet/', JudgeFleetView.as_view(), name='judge-fleet'),
 ]
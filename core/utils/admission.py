@@ -0,0 +1,176 @@
+import math, socket, time, uuid
+from contextlib import asynccontextmanager, contextmanager
+
+import redis
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+from core.execution.executor import available_cores
+from core.utils.redis_client import get_redis, mark_redis_down, redis_down, wait_steps, wait_steps_async
+
+# Waiting runs are ordered by score = k * ROUND + enqueue time (ms), where k is how
+# many runs the same user already has queued or running: everyone's first run goes
+# before anyone's second run, first come first served within a round.
+ROUND = 10 ** 13
+
+_POLL_S = 0.1
+
+# KEYS: running, queue
+# ARGV: user, member, now_ms, max_queue, stale_ms, ROUND, rounds_behind
+# Returns the member's round, or -1 when the queue is full.
+_ENQUEUE = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+local prefix = ARGV[1] .. ':'
+local k = 0
+for _, key in ipairs(KEYS) do
+    local entries = redis.call('ZRANGE', key, 0, -1, 'WITHSCORES')
+    for i = 1, #entries, 2 do
+        local enqueued = tonumber(entries[i + 1]) % tonumber(ARGV[6])
+        if key == KEYS[2] and enqueued < tonumber(ARGV[3]) - tonumber(ARGV[5]) then
+            redis.call('ZREM', key, entries[i])  -- the waiter went away
+        elseif string.sub(entries[i], 1, #prefix) == prefix then
+            k = k + 1
+        end
+    end
+end
+if redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[4]) then
+    return -1
+end
+k = k + tonumber(ARGV[7])
+redis.call('ZADD', KEYS[2], k * tonumber(ARGV[6]) + tonumber(ARGV[3]), ARGV[2])
+return k
+"""
+
+# KEYS: running, queue
+# ARGV: member, now_ms, cap, lease_ms
+# Returns 1 when admitted, 0 to keep waiting, -1 when no longer queued.
+_TRY_ADMIT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+local rank = redis.call('ZRANK', KEYS[2], ARGV[1])
+if not rank then
+    return -1
+end
+if rank < tonumber(ARGV[3]) - redis.call('ZCARD', KEYS[1]) then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('ZADD', KEYS[1], tonumber(ARGV[2]) + tonumber(ARGV[4]), ARGV[1])
+    return 1
+end
+return 0
+"""
+
+_scripts = {}
+
+
+def _script(name: str, client: redis.Redis):
+    if name not in _scripts:
+        _scripts[name] = client.register_script({"enqueue": _ENQUEUE, "try_admit": _TRY_ADMIT}[name])
+    return _scripts[name]
+
+
+def _keys():
+    node = settings.JUDGE_NODE_NAME or socket.gethostname()
+    return [f"judge:admission:{node}:running", f"judge:admission:{node}:queue"]
+
+
+def node_capacity() -> int:
+    return settings.JUDGE_ADMISSION_NODE_CAP or available_cores()
+
+
+@contextmanager
+def admit_run(user_id, rounds_behind: int = 0):
+    """
+    Hold one of this node's run slots for the duration of the block.
+
+    Runs wait in a per-node queue shared through Redis, fairly across users
+    (see ROUND), for at most JUDGE_ADMISSION_MAX_WAIT_S. A full queue, or no
+    slot within that time, raises Throttled (429 with Retry-After). Slots are
+    leases: a worker that dies holding one gives it back after
+    JUDGE_ADMISSION_LEASE_S. A run `rounds_behind` waits that many rounds
+    behind (a user slowed down for their CPU usage, see core.utils.cpu_usage).
+
+    Without Redis there is no admission control: the run goes ahead (fail
+    open) rather than failing every run.
+    """
+    ticket = _ticket(user_id)
+    admitted = False
+    if ticket is not None:
+        try:
+            wait_steps(_slot_steps(*ticket, rounds_behind))
+            admitted = True
+        except redis.RedisError as exc:
+            mark_redis_down(exc, "admitting runs without admission control")
+    try:
+        yield
+    finally:
+        if admitted:
+            _release(*ticket)
+
+
+@asynccontextmanager
+async def admit_run_async(user_id, rounds_behind: int = 0):
+    """admit_run() for async callers: waiting for a slot does not block the event loop."""
+    ticket = _ticket(user_id)
+    admitted = False
+    if ticket is not None:
+        try:
+            await wait_steps_async(_slot_steps(*ticket, rounds_behind))
+            admitted = True
+        except redis.RedisError as exc:
+            mark_redis_down(exc, "admitting runs without admission control")
+    try:
+        yield
+    finally:
+        if admitted:
+            _release(*ticket)
+
+
+def _ticket(user_id):
+    """(keys, member) of a run to admit, or None without admission control."""
+    if not settings.JUDGE_ADMISSION_ENABLED or redis_down():
+        return None
+    return _keys(), f"{user_id}:{uuid.uuid4().hex}"
+
+
+def _release(keys, member):
+    try:
+        get_redis().zrem(keys[0], member)
+    except redis.RedisError:
+        pass  # the lease expires on its own
+
+
+def _slot_steps(keys, member, rounds_behind: int = 0):
+    """Queue for a slot and poll until admitted; yields the seconds between polls (see wait_steps)."""
+    max_wait_s = settings.JUDGE_ADMISSION_MAX_WAIT_S
+    lease_ms = settings.JUDGE_ADMISSION_LEASE_S * 1000
+    user = member.split(":", 1)[0]
+    cap = node_capacity()
+
+    client = get_redis()
+    round_ = _script("enqueue", client)(
+        keys=keys,
+        args=[user, member, _now_ms(), settings.JUDGE_ADMISSION_QUEUE_MAX,
+              int(max_wait_s * 2000), ROUND, rounds_behind],
+        client=client,
+    )
+    if round_ < 0:
+        raise Throttled(wait=_retry_after(client, keys, cap), detail="Too many code runs are queued.")
+
+    deadline = time.monotonic() + max_wait_s
+    while True:
+        admitted = _script("try_admit", client)(keys=keys, args=[member, _now_ms(), cap, lease_ms], client=client)
+        if admitted == 1:
+            return
+        if admitted < 0 or time.monotonic() >= deadline:
+            client.zrem(keys[1], member)
+            raise Throttled(wait=_retry_after(client, keys, cap), detail="Code runners are busy.")
+        yield _POLL_S
+
+
+def _retry_after(client, keys, cap) -> int:
+    """Seconds until the runs queued now should have gone through."""
+    queued = client.zcard(keys[1])
+    return max(1, math.ceil(settings.JUDGE_ADMISSION_MAX_WAIT_S * (queued + 1) / cap))
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
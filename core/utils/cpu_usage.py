@@ -0,0 +1,263 @@
+"""
+CPU time accounting and quotas for the code students run (/run/ and /submit/).
+
+Every judged run adds its CPU time (wall time where the sandbox reports no
+CPU time; a time limit counts in full) to three rolling windows of
+JUDGE_USAGE_WINDOW_S kept in Redis: the user's, the user's in the course and
+the course's. A window is a hash of per-bucket totals (WINDOW_BUCKETS buckets
+per window), so old usage ages out one bucket at a time.
+
+The same CPU time is added to a pending hash, per user, course, kind and day,
+which flush() moves into CpuUsage rows. The first run recorded after a flush
+schedules the next one JUDGE_USAGE_FLUSH_S later (the flush_cpu_usage task),
+so Postgres sees one write per user and day every JUDGE_USAGE_FLUSH_S at
+most, not one per run.
+
+Quotas (CpuQuota, in CPU seconds per window) apply to those windows:
+
+- "user" quotas of the course, for this student or every student, to the
+  user's window in the course;
+- site-wide "user" quotas, or JUDGE_USAGE_USER_QUOTA_S, to the user's window;
+- the course's "course" quota, a site-wide one or JUDGE_USAGE_COURSE_QUOTA_S,
+  to the course's window.
+
+Past JUDGE_USAGE_SLOW_FRACTION of a quota the user's runs are slowed: /run/
+waits JUDGE_USAGE_SLOW_ROUNDS rounds behind other users' runs for a slot
+(see core.utils.admission), submissions are judged JUDGE_USAGE_SLOW_DELAY_S
+later. Past the quota, /run/ answers 429 and submissions are judged once the
+window has room again: they are held back JUDGE_USAGE_MAX_DELAY_S at most at a
+time (a Celery countdown must stay below the broker's visibility timeout) and
+the quota is checked again when they come up. Without Redis nothing is
+counted or limited (fail open).
+"""
+import logging, math, time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from rest_framework.exceptions import Throttled
+
+from core.models.usage_model import CpuQuota, CpuUsage
+from core.utils.redis_client import get_redis, mark_redis_down, redis_down
+
+logger = logging.getLogger(__name__)
+
+_PREFIX        = "judge:usage"
+PENDING_KEY    = f"{_PREFIX}:pending"     # "<user>:<course>:<kind>:<day>:ms" / ":runs" -> totals not flushed yet
+_FLUSH_DUE_KEY = f"{_PREFIX}:flush_due"   # set while a flush is scheduled
+WINDOW_BUCKETS = 60
+
+
+@dataclass
+class Verdict:
+    state:         str              # ok | slow | over
+    used_s:        float = 0.0      # CPU seconds in the window closest to its quota
+    quota_s:       Optional[int] = None
+    scope:         Optional[str] = None   # user | user_course | course
+    retry_after_s: int = 0          # over: until the window has room again
+
+
+def _window_key(scope: str, *ids) -> str:
+    return f"{_PREFIX}:window:{scope}:{':'.join(str(i) for i in ids)}"
+
+
+def _windows(user_id, course_id) -> dict:
+    return {
+        "user": _window_key("user", user_id),
+        "user_course": _window_key("user_course", user_id, course_id),
+        "course": _window_key("course", course_id),
+    }
+
+
+def _bucket_s() -> float:
+    return settings.JUDGE_USAGE_WINDOW_S / WINDOW_BUCKETS
+
+
+def cpu_ms(results) -> float:
+    """CPU time of a run's results (wall time where no CPU time was measured)."""
+    return sum((r.cpu_ms if r.cpu_ms is not None else r.time_ms) or 0 for r in results)
+
+
+# ── Accounting ───────────────────────────────────────────────────────────────
+
+def record(user_id, course_id, kind: str, ms: float, runs: int = 1):
+    """
+    Count `ms` of CPU time spent on `runs` runs of `kind` (run | submit) by the
+    user in the course; no runs for more time spent on a run already counted.
+    """
+    if ms <= 0 or redis_down():
+        return
+    bucket = int(time.time() // _bucket_s())
+    pending = f"{user_id}:{course_id}:{kind}:{date.today().isoformat()}"
+    try:
+        r = get_redis()
+        with r.pipeline(transaction=False) as pipe:
+            for key in _windows(user_id, course_id).values():
+                pipe.hincrbyfloat(key, bucket, ms)
+                pipe.expire(key, settings.JUDGE_USAGE_WINDOW_S + math.ceil(_bucket_s()))
+            pipe.hincrbyfloat(PENDING_KEY, f"{pending}:ms", ms)
+            pipe.hincrby(PENDING_KEY, f"{pending}:runs", runs)
+            pipe.set(_FLUSH_DUE_KEY, 1, nx=True, ex=settings.JUDGE_USAGE_FLUSH_S)
+            due = pipe.execute()[-1]
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "not counting CPU usage")
+        return
+    if due:
+        _schedule_flush()
+
+
+def _schedule_flush():
+    from core.tasks import flush_cpu_usage
+
+    try:
+        flush_cpu_usage.apply_async(countdown=settings.JUDGE_USAGE_FLUSH_S)
+    except Exception:
+        logger.exception("Could not schedule the CPU usage flush")
+        try:
+            get_redis().delete(_FLUSH_DUE_KEY)   # the next run tries again
+        except redis.RedisError:
+            pass
+
+
+def flush():
+    """Move the pending CPU usage from Redis into CpuUsage rows. Returns the rows written."""
+    r = get_redis()
+    # Renaming is atomic: runs counted from now on go to a new pending hash
+    flushing = f"{_PREFIX}:flushing:{time.time_ns()}"
+    try:
+        r.rename(PENDING_KEY, flushing)
+    except redis.ResponseError:
+        return 0   # nothing pending
+
+    totals = defaultdict(lambda: [0.0, 0])
+    for field, value in r.hgetall(flushing).items():
+        entry, what = field.decode().rsplit(":", 1)
+        totals[entry][0 if what == "ms" else 1] += float(value)
+
+    with transaction.atomic():
+        for entry, (ms, runs) in totals.items():
+            user_id, course_id, kind, day = entry.split(":")
+            usage, _ = CpuUsage.objects.get_or_create(user_id=user_id, course_id=course_id, kind=kind, day=day)
+            CpuUsage.objects.filter(id=usage.id).update(cpu_ms=F("cpu_ms") + ms, runs=F("runs") + int(runs))
+    r.delete(flushing)
+    return len(totals)
+
+
+def window_usage(user_id=None, course_id=None, scope: str = "user_course") -> float:
+    """CPU seconds of one window (user, user_course or course) now. Raises redis.RedisError."""
+    ids = {"user": (user_id,), "user_course": (user_id, course_id), "course": (course_id,)}[scope]
+    buckets = _live(get_redis().hgetall(_window_key(scope, *ids)))
+    return round(sum(buckets.values()) / 1000, 3)
+
+
+def _live(fields) -> dict:
+    """Bucket -> ms of a window hash, without the buckets that aged out."""
+    oldest = int(time.time() // _bucket_s()) - WINDOW_BUCKETS + 1
+    buckets = {int(k): float(v) for k, v in fields.items()}
+    return {b: ms for b, ms in buckets.items() if b >= oldest}
+
+
+# ── Quotas ───────────────────────────────────────────────────────────────────
+
+def quotas(user_id, course_id) -> dict:
+    """The CPU seconds per window allowed to each window of the user in the course (None: no quota)."""
+    found = {
+        (q.course_id, q.user_id, q.scope): q.cpu_seconds
+        for q in CpuQuota.objects.filter(Q(course_id=course_id) | Q(course=None),
+                                         Q(user_id=user_id) | Q(user=None))
+    }
+
+    def first(*keys, default=None):
+        return next((found[k] for k in keys if k in found), default)
+
+    return {
+        "user_course": first((course_id, user_id, "user"), (course_id, None, "user")),
+        "user": first((None, user_id, "user"), (None, None, "user"),
+                      default=settings.JUDGE_USAGE_USER_QUOTA_S or None),
+        "course": first((course_id, None, "course"), (None, None, "course"),
+                        default=settings.JUDGE_USAGE_COURSE_QUOTA_S or None),
+    }
+
+
+def check(user_id, course_id) -> Verdict:
+    """Whether the user's next run in the course goes ahead, is slowed, or is over a quota."""
+    limits = {scope: q for scope, q in quotas(user_id, course_id).items() if q is not None}
+    if not limits or redis_down():
+        return Verdict("ok")
+    keys = _windows(user_id, course_id)
+    try:
+        r = get_redis()
+        with r.pipeline(transaction=False) as pipe:
+            for scope in limits:
+                pipe.hgetall(keys[scope])
+            windows = dict(zip(limits, pipe.execute()))
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "not enforcing CPU quotas")
+        return Verdict("ok")
+
+    worst = Verdict("ok")
+    for scope, quota in limits.items():
+        buckets = _live(windows[scope])
+        used_ms = sum(buckets.values())
+        verdict = Verdict("ok", round(used_ms / 1000, 3), quota, scope)
+        if used_ms >= quota * 1000:
+            verdict.state = "over"
+            verdict.retry_after_s = _room_after(buckets, used_ms - quota * 1000)
+        elif used_ms >= quota * 1000 * settings.JUDGE_USAGE_SLOW_FRACTION:
+            verdict.state = "slow"
+        rank = ("ok", "slow", "over")
+        if (rank.index(verdict.state), verdict.retry_after_s) > (rank.index(worst.state), worst.retry_after_s):
+            worst = verdict
+    return worst
+
+
+def _room_after(buckets: dict, excess_ms: float) -> int:
+    """Seconds until buckets holding more than `excess_ms` have aged out of the window."""
+    now, bucket_s = time.time(), _bucket_s()
+    freed = 0.0
+    for bucket in sorted(buckets):
+        freed += buckets[bucket]
+        if freed > excess_ms:
+            return max(1, math.ceil((bucket + WINDOW_BUCKETS) * bucket_s - now))
+    return settings.JUDGE_USAGE_WINDOW_S
+
+
+def admission_rounds(user_id, course_id) -> int:
+    """Admission rounds the user's next /run/ waits behind (see admit_run); raises Throttled past a quota."""
+    verdict = check(user_id, course_id)
+    if verdict.state == "over":
+        raise Throttled(wait=verdict.retry_after_s, detail=_over_detail(verdict))
+    return settings.JUDGE_USAGE_SLOW_ROUNDS if verdict.state == "slow" else 0
+
+
+def judge_delay(verdict: Verdict) -> int:
+    """Seconds to hold a submission back before judging it (or checking its quota again)."""
+    if verdict.state == "over":
+        return min(verdict.retry_after_s, max_judge_delay_s())
+    return settings.JUDGE_USAGE_SLOW_DELAY_S if verdict.state == "slow" else 0
+
+
+def max_judge_delay_s() -> int:
+    """
+    Longest countdown of a held-back submission. Redis redelivers a task not
+    acknowledged within its visibility timeout, and judge tasks are only
+    acknowledged once done, so a longer one would be judged twice.
+    """
+    visibility_s = settings.CELERY_BROKER_TRANSPORT_OPTIONS.get("visibility_timeout", 3600)
+    return max(1, min(settings.JUDGE_USAGE_MAX_DELAY_S, visibility_s // 2))
+
+
+def max_deferrals() -> int:
+    """Times a submission is held back again before it is judged regardless: one window's worth."""
+    return math.ceil(settings.JUDGE_USAGE_WINDOW_S / max_judge_delay_s())
+
+
+def _over_detail(verdict: Verdict) -> str:
+    whose = "The course has" if verdict.scope == "course" else "You have"
+    return (f"{whose} used {verdict.used_s:.0f} of {verdict.quota_s} CPU seconds allowed per "
+            f"{settings.JUDGE_USAGE_WINDOW_S // 60} minutes.")
@@ -0,0 +1,233 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.execution.checkers import get_checker
+from core.execution.compile_cache import get_cache
+from core.execution.executor import run_code_challenge
+from core.execution.sandbox import get_sandbox
+from core.models.code_challenge import CodeSubmissionResult
+from core.utils import cpu_usage, judge_fleet
+from core.utils.completion import check_and_issue_certificate
+from core.utils.judge_metrics import record_phases
+from core.utils.performance import graded_on_runtime, measure, runtime_performance
+from core.utils.run_cache import run_key
+from core.utils.single_flight import run_once
+from core.utils.test_data import localize
+
+logger = logging.getLogger(__name__)
+
+RESULT_BATCH_SIZE = 500   # rows per INSERT of a bulk write of results
+
+
+def trigger_grade_passback(user, course, score_0_to_1: float):
+    """Fire LTI grade passback if the user has an active LTI session for this course."""
+    try:
+        from lti.models import LTISession
+        from lti.tasks import send_grade_to_platform
+        session = LTISession.objects.filter(
+            user=user,
+            resource_mapping__course=course,
+        ).order_by("-created_at").first()
+        if session:
+            send_grade_to_platform.delay(str(session.id), score_0_to_1)
+    except Exception:
+        pass  # never let grade passback break the submission response
+
+
+def trigger_grade_passbacks(course, scores: dict):
+    """trigger_grade_passback() for many users at once: scores maps users to 0..1."""
+    if not scores:
+        return
+    try:
+        from lti.models import LTISession
+        from lti.tasks import send_grade_to_platform
+        latest = {}
+        for session in LTISession.objects.filter(
+            user__in=list(scores), resource_mapping__course=course,
+        ).order_by("created_at"):
+            latest[session.user_id] = session   # the newest one wins
+        for user, score in scores.items():
+            if user.id in latest:
+                send_grade_to_platform.delay(str(latest[user.id].id), score)
+    except Exception:
+        pass  # never let grade passback break a re-judge
+
+
+def execution_options() -> dict:
+    """Executor keyword arguments shared by every code run (see JUDGE_* settings)."""
+    return {
+        "parallel": settings.JUDGE_PARALLEL_TESTS,
+        "max_workers": settings.JUDGE_MAX_PARALLEL_TESTS or None,
+        "warm_pool_size": settings.JUDGE_WARM_POOL_SIZE,
+        "compile_cache": get_cache(settings.JUDGE_COMPILE_CACHE_DIR, settings.JUDGE_COMPILE_CACHE_MAX_MB),
+        "output_limit_bytes": settings.JUDGE_OUTPUT_LIMIT_KB * 1024,
+        "stored_output_chars": settings.JUDGE_STORED_OUTPUT_KB * 1024,
+        "sandbox": _sandbox(),
+    }
+
+
+def output_checker(config):
+    """The checker judging outputs for a code challenge (see core.execution.checkers)."""
+    return get_checker(config.checker, config.float_epsilon, config.checker_program, _sandbox())
+
+
+def run_tests(code: str, language: str, test_cases, config, fail_fast: bool = False):
+    """
+    run_code_challenge() with the limits and checker of the challenge `config`:
+    on the judge fleet when JUDGE_FLEET_ENABLED (see core.utils.judge_fleet),
+    else, or when the fleet cannot take it, on this host.
+    """
+    if settings.JUDGE_FLEET_ENABLED:
+        results = judge_fleet.run_remote(code, language, test_cases, config, fail_fast)
+        if results is not None:
+            return results
+    return run_code_challenge(
+        code,
+        language,
+        test_cases,
+        time_limit_s=config.time_limit_seconds,
+        memory_mb=config.memory_limit_mb,
+        harness=config.execution_mode == "harness",
+        fail_fast=fail_fast,
+        sql_schema=config.sql_schema,
+        checker=output_checker(config),
+        **execution_options(),
+    )
+
+
+def _sandbox():
+    return get_sandbox(settings.JUDGE_SANDBOX, settings.JUDGE_CGROUP_ROOT, settings.JUDGE_CGROUP_PIDS_MAX)
+
+
+def grade_code_submission(submission, language: str):
+    """
+    Run a pending code submission against every test case of its challenge,
+    store one CodeSubmissionResult per test case and finalise the Submission.
+
+    Returns the certificate issued or updated by this submission (or None).
+    """
+    challenge = submission.challenge
+    config = challenge.code_config
+    test_cases = localize(list(config.test_cases.all()))
+
+    def execute():
+        results = run_tests(
+            submission.answer_text,
+            language,
+            test_cases,
+            config,
+            # Without partial credit, the first failure decides the score
+            fail_fast=config.fail_fast and not config.partial_credit,
+        )
+        record_phases(language, results)
+        # Charged to whoever ran it, not again to the submissions sharing its results
+        cpu_usage.record(submission.user_id, challenge.topic.course_id, "submit", cpu_usage.cpu_ms(results))
+        return results
+
+    # Identical submissions graded at the same time (double clicks, retries) share one execution
+    results = run_once(run_key(submission.answer_text, language, config, scope="all"), execute)
+
+    timings = {}
+    if graded_on_runtime(config) and results and all(r.status == "accepted" for r in results):
+        timings = measure(submission.answer_text, language, test_cases, config)
+        cpu_usage.record(submission.user_id, challenge.topic.course_id, "submit",
+                         sum(sum(t.samples) for t in timings.values() if t), runs=0)
+
+    all_passed = save_code_results(submission, config, test_cases, results, timings)
+
+    course = challenge.topic.course
+    cert, score_changed = check_and_issue_certificate(submission.user, course) if all_passed else (None, False)
+    if cert and score_changed:
+        trigger_grade_passback(submission.user, course, cert.score_pct / 100)
+    return cert
+
+
+def save_code_results(submission, config, test_cases, results, timings=None) -> bool:
+    """
+    Store the results of a graded code submission and its score as one
+    transaction: one bulk insert of the results, one update of the
+    Submission. `timings` are its timed runs on a performance-graded
+    challenge (see core.utils.performance). Returns whether every test case passed.
+    """
+    with transaction.atomic():
+        # Results of an earlier grading of it (a submission set back to pending) are replaced
+        submission.test_results.all().delete()
+        CodeSubmissionResult.objects.bulk_create(result_rows(submission, results, timings),
+                                                 batch_size=RESULT_BATCH_SIZE)
+        all_passed = score_code_submission(submission, config, test_cases,
+                                           {r.test_case_id: r.status for r in results}, timings)
+        submission.save(update_fields=["status", "score", "feedback", "graded_at"])
+    return all_passed
+
+
+def result_rows(submission, results, timings=None):
+    """Unsaved CodeSubmissionResult rows of a submission's TestResults (and timed runs)."""
+    timings = timings or {}
+    return [
+        CodeSubmissionResult(
+            submission=submission,
+            test_case_id=r.test_case_id,
+            status=r.status,
+            stdout=r.stdout,
+            stderr=r.stderr,
+            execution_time_ms=r.time_ms,
+            cpu_time_ms=r.cpu_ms,
+            memory_used_mb=r.memory_mb,
+            phase_timings=r.phases,
+            message=r.message or "",
+            perf_time_ms=timings[r.test_case_id].time_ms if timings.get(r.test_case_id) else None,
+            perf_noise_pct=timings[r.test_case_id].noise_pct if timings.get(r.test_case_id) else None,
+        )
+        for r in results
+    ]
+
+
+def score_code_submission(submission, config, test_cases, statuses: dict, timings=None) -> bool:
+    """
+    Set the status, score, feedback and graded_at of a code submission from
+    the status of each of its test cases (test case id -> status) and, on a
+    performance-graded challenge, its timed runs (test case id -> Timing).
+    Does not save it. Returns whether every test case passed.
+    """
+    passed = [tc for tc in test_cases if statuses.get(tc.id) == "accepted"]
+    all_passed = len(passed) == len(test_cases)
+    points = config.challenge.points
+    if config.partial_credit:
+        total_weight = sum(tc.weight for tc in test_cases)
+        earned = sum(tc.weight for tc in passed) / total_weight if total_weight else 0
+    else:
+        earned = 1 if all_passed else 0
+    performance = runtime_performance(config, test_cases, timings or {}) if all_passed else None
+    if performance is not None:
+        # The runtime points take their share from the test case points
+        earned = earned * (1 - config.performance_weight) + config.performance_weight * performance.credit
+    score = round(earned * points)
+    if submission.hint_used and all_passed:
+        score = round(score * 0.5)
+
+    skipped = sum(1 for tc in test_cases if statuses.get(tc.id) == "skipped")
+    submission.status = "passed" if all_passed else "failed"
+    submission.score = score
+    submission.feedback = f"{len(passed)}/{len(test_cases)} test cases passed."
+    if skipped:
+        submission.feedback += f" {skipped} not run after the first failure."
+    if performance is not None:
+        runtime_points = points * config.performance_weight
+        submission.feedback += (
+            f" Runtime {performance.ratio:.2f}x the reference solution (±{performance.noise_pct:.0f}%): "
+            f"{round(runtime_points * performance.credit)}/{round(runtime_points)} runtime points."
+        )
+    submission.graded_at = timezone.now()
+    return all_passed
+
+
+def reject_code_submission(submission, reason: str):
+    """Mark a submission that could not be executed at all (e.g. unsupported language)."""
+    logger.warning(f"Submission {submission.id} rejected: {reason}")
+    submission.status = "rejected"
+    submission.feedback = reason
+    submission.graded_at = timezone.now()
+    submission.save(update_fields=["status", "feedback", "graded_at"])
@@ -0,0 +1,301 @@
+"""
+A fleet of judge workers fed from Redis, apart from the web and Celery tiers.
+
+Workers (`manage.py judge_worker`, one per judge node or several locally) run
+code with run_code_challenge and the JUDGE_* settings of their own host. They
+need this project's settings (Redis, the judge_data storage) but no database:
+a job carries everything about the run, test cases included.
+
+- Jobs wait in one Redis list per language. A worker claims a job by moving
+  it atomically into its own `claimed` list, and removes it from there when
+  it has pushed the job's results to the job's result list.
+- Every JUDGE_FLEET_HEARTBEAT_S a worker refreshes a key that expires after
+  JUDGE_FLEET_WORKER_TTL_S, and advertises its languages, slots (jobs run at
+  once) and busy slots in the `workers` hash. A worker shutting down claims
+  no more jobs but beats on until the ones it has are finished.
+- A worker whose key expired is dead: whoever notices first (any worker, or
+  a caller waiting on a result) takes its claimed list over by renaming it
+  and puts its jobs back at the head of their queues. A job whose workers
+  died JUDGE_FLEET_MAX_ATTEMPTS times fails instead.
+
+run_remote() sends a run to the fleet and waits for its results. Callers fall
+back to running it themselves when Redis is down, no live worker serves the
+language, or no worker took the job within JUDGE_FLEET_WAIT_S (see
+grading.run_tests). A job a worker has taken is waited for however long it
+runs: its worker answers, or dies and the job goes back in the queue.
+"""
+import dataclasses, json, logging, os, socket, threading, time, uuid
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from typing import List, Optional
+
+import redis
+from django.conf import settings
+
+from core.execution.checkers import get_checker
+from core.execution.executor import TestResult, run_code_challenge
+from core.utils.redis_client import get_redis, mark_redis_down, redis_down
+from core.utils.test_data import localize
+
+logger = logging.getLogger(__name__)
+
+_PREFIX        = "judge:fleet"
+WORKERS_KEY    = f"{_PREFIX}:workers"   # worker id -> JSON of what it advertises
+RESULT_TTL_S   = 600                    # results nobody collected
+POLL_S         = 0.1                    # idle worker: wait before trying the queues again
+RESULT_WAIT_S  = 1                      # one blocking wait for a result (below the client's socket timeout)
+
+_TEST_CASE_FIELDS = ("id", "stdin", "expected_stdout", "stdin_digest", "expected_digest", "is_public")
+
+
+def _queue_key(language: str) -> str:
+    return f"{_PREFIX}:queue:{language}"
+
+
+def _claimed_key(worker_id: str) -> str:
+    return f"{_PREFIX}:claimed:{worker_id}"
+
+
+def _alive_key(worker_id: str) -> str:
+    return f"{_PREFIX}:alive:{worker_id}"
+
+
+def _result_key(job_id: str) -> str:
+    return f"{_PREFIX}:result:{job_id}"
+
+
+# ── Callers ──────────────────────────────────────────────────────────────────
+
+def run_remote(code: str, language: str, test_cases, config, fail_fast: bool = False) -> Optional[List[TestResult]]:
+    """
+    run_code_challenge() on the fleet, with the limits and checker of the
+    challenge `config`. Returns None when the fleet cannot run it (the caller
+    runs it itself); raises ValueError when a worker rejected the job.
+    """
+    if redis_down():
+        return None
+    job = {
+        "id": uuid.uuid4().hex,
+        "language": language,
+        "code": code,
+        "time_limit_s": config.time_limit_seconds,
+        "memory_mb": config.memory_limit_mb,
+        "harness": config.execution_mode == "harness",
+        "fail_fast": fail_fast,
+        "sql_schema": config.sql_schema,
+        "checker": {"name": config.checker, "float_epsilon": config.float_epsilon,
+                    "program": config.checker_program},
+        "test_cases": [{f: getattr(tc, f) for f in _TEST_CASE_FIELDS} for tc in test_cases],
+        "attempts": 0,
+    }
+    payload = json.dumps(job)
+    try:
+        r = get_redis()
+        reap(r)
+        if language not in live_languages(r):
+            return None
+        r.lpush(_queue_key(language), payload)
+        deadline = time.monotonic() + settings.JUDGE_FLEET_WAIT_S
+        while True:
+            got = r.blpop([_result_key(job["id"])], timeout=RESULT_WAIT_S)
+            if got:
+                break
+            reap(r)
+            # Withdrawn only while no worker has it: running a taken job here too would run it twice
+            if time.monotonic() > deadline and _withdraw(r, job):
+                logger.warning(f"No judge worker took job {job['id']} within "
+                               f"{settings.JUDGE_FLEET_WAIT_S} s, running it here")
+                return None
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "running code here")
+        return None
+
+    result = json.loads(got[1])
+    if "error" in result:
+        raise ValueError(result["error"])
+    return [TestResult(**res) for res in result["results"]]
+
+
+def _withdraw(r, job: dict) -> bool:
+    """Take a job out of its queue, at whatever delivery it waits for. False when it is not queued."""
+    with r.pipeline() as pipe:
+        for attempts in range(settings.JUDGE_FLEET_MAX_ATTEMPTS):
+            # requeue() puts it back with only its attempts changed
+            pipe.lrem(_queue_key(job["language"]), 1, json.dumps({**job, "attempts": attempts}))
+        return any(pipe.execute())
+
+
+def workers(r=None) -> dict:
+    """Live workers: worker id -> what it advertises (languages, slots, busy, host, pid, beat_at)."""
+    r = r or get_redis()
+    entries = {k.decode(): json.loads(v) for k, v in r.hgetall(WORKERS_KEY).items()}
+    with r.pipeline(transaction=False) as pipe:
+        for worker_id in entries:
+            pipe.exists(_alive_key(worker_id))
+        alive = pipe.execute()
+    return {worker_id: info for (worker_id, info), up in zip(entries.items(), alive) if up}
+
+
+def queue_lengths(languages, r=None) -> dict:
+    """Jobs waiting for a worker, per language."""
+    r = r or get_redis()
+    with r.pipeline(transaction=False) as pipe:
+        for language in languages:
+            pipe.llen(_queue_key(language))
+        return dict(zip(languages, pipe.execute()))
+
+
+def live_languages(r=None) -> set:
+    return {lang for info in workers(r).values() for lang in info["languages"]}
+
+
+def reap(r=None):
+    """Put the jobs of dead workers back in their queues."""
+    r = r or get_redis()
+    for worker_id in r.hkeys(WORKERS_KEY):
+        worker_id = worker_id.decode()
+        if not r.exists(_alive_key(worker_id)):
+            requeue(r, worker_id)
+
+
+def requeue(r, worker_id: str):
+    # Renaming is atomic: of several reapers, one takes the claimed list over
+    reaping = f"{_PREFIX}:reaping:{uuid.uuid4().hex}"
+    try:
+        r.rename(_claimed_key(worker_id), reaping)
+    except redis.ResponseError:
+        r.hdel(WORKERS_KEY, worker_id)  # claimed nothing, or already taken over
+        return
+
+    for raw in r.lrange(reaping, 0, -1):
+        job = json.loads(raw)
+        job["attempts"] += 1
+        if job["attempts"] >= settings.JUDGE_FLEET_MAX_ATTEMPTS:
+            logger.error(f"Judge job {job['id']} failed: {job['attempts']} workers died running it")
+            _push_result(r, job["id"], {"error": f"The judge failed {job['attempts']} times on this run."})
+        else:
+            logger.warning(f"Judge worker {worker_id} died, job {job['id']} requeued")
+            r.rpush(_queue_key(job["language"]), json.dumps(job))  # the next one taken
+    r.delete(reaping)
+    r.hdel(WORKERS_KEY, worker_id)
+
+
+def _push_result(r, job_id: str, result: dict):
+    with r.pipeline() as pipe:
+        pipe.rpush(_result_key(job_id), json.dumps(result))
+        pipe.expire(_result_key(job_id), RESULT_TTL_S)
+        pipe.execute()
+
+
+# ── Workers ──────────────────────────────────────────────────────────────────
+
+def execute_job(job: dict) -> List[TestResult]:
+    """Run a job with this host's execution options."""
+    from core.utils.grading import _sandbox, execution_options
+
+    checker = job["checker"]
+    test_cases = localize([SimpleNamespace(**tc) for tc in job["test_cases"]])
+    return run_code_challenge(
+        job["code"],
+        job["language"],
+        test_cases,
+        time_limit_s=job["time_limit_s"],
+        memory_mb=job["memory_mb"],
+        harness=job["harness"],
+        fail_fast=job["fail_fast"],
+        sql_schema=job["sql_schema"],
+        checker=get_checker(checker["name"], checker["float_epsilon"], checker["program"], _sandbox()),
+        **execution_options(),
+    )
+
+
+class JudgeWorker:
+    """Takes jobs for `languages` off the queues and runs up to `slots` of them at once."""
+
+    def __init__(self, languages, slots: int, worker_id: Optional[str] = None):
+        self.languages = list(languages)
+        self.slots = slots
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._next = 0   # language queue tried first, round robin
+
+    def run(self, stop: threading.Event):
+        r = get_redis()
+        self.heartbeat(r)
+        # Beats go on past `stop` until the claimed jobs finish: reap() must not requeue them meanwhile
+        drained = threading.Event()
+        beat = threading.Thread(target=self._beat, args=(drained,), daemon=True)
+        beat.start()
+        logger.info(f"Judge worker {self.id} serving {', '.join(self.languages)} with {self.slots} slots")
+        with ThreadPoolExecutor(self.slots) as pool:
+            while not stop.is_set():
+                with self._lock:
+                    free = self.busy < self.slots
+                try:
+                    raw = self.claim(r) if free else None
+                except redis.RedisError as exc:
+                    logger.warning(f"Judge worker {self.id} cannot reach the queues: {exc}")
+                    stop.wait(settings.JUDGE_FLEET_HEARTBEAT_S)
+                    continue
+                if raw is None:
+                    stop.wait(POLL_S)
+                    continue
+                with self._lock:
+                    self.busy += 1
+                pool.submit(self.process, r, raw)
+        # Every claimed job has finished: nothing to requeue
+        drained.set()
+        beat.join()
+        r.delete(_alive_key(self.id))
+        r.hdel(WORKERS_KEY, self.id)
+
+    def claim(self, r) -> Optional[bytes]:
+        for i in range(len(self.languages)):
+            language = self.languages[(self._next + i) % len(self.languages)]
+            raw = r.lmove(_queue_key(language), _claimed_key(self.id), "RIGHT", "LEFT")
+            if raw is not None:
+                self._next = (self._next + i + 1) % len(self.languages)
+                return raw
+        return None
+
+    def process(self, r, raw: bytes):
+        job = json.loads(raw)
+        try:
+            result = {"results": [dataclasses.asdict(res) for res in execute_job(job)]}
+        except ValueError as exc:
+            result = {"error": str(exc)}
+        except Exception as exc:
+            logger.exception(f"Judge job {job['id']} crashed")
+            result = {"error": f"The judge failed on this run: {exc}"}
+        try:
+            _push_result(r, job["id"], result)
+            r.lrem(_claimed_key(self.id), 1, raw)
+        except redis.RedisError:
+            logger.exception(f"Could not deliver the results of judge job {job['id']}")
+        finally:
+            with self._lock:
+                self.busy -= 1
+
+    def heartbeat(self, r):
+        info = {
+            "languages": self.languages,
+            "slots": self.slots,
+            "busy": self.busy,
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "beat_at": time.time(),
+        }
+        with r.pipeline() as pipe:
+            pipe.set(_alive_key(self.id), 1, ex=settings.JUDGE_FLEET_WORKER_TTL_S)
+            pipe.hset(WORKERS_KEY, self.id, json.dumps(info))
+            pipe.execute()
+
+    def _beat(self, stop: threading.Event):
+        r = get_redis()
+        while not stop.wait(settings.JUDGE_FLEET_HEARTBEAT_S):
+            try:
+                self.heartbeat(r)
+                reap(r)
+            except redis.RedisError as exc:
+                logger.warning(f"Judge worker {self.id} heartbeat failed: {exc}")
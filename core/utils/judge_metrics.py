@@ -0,0 +1,73 @@
+"""
+Histograms of the time judged runs spend in each phase (see executor.PHASES),
+kept in Redis so every worker process adds to the same series, and exported
+in the Prometheus text format by the metrics view.
+"""
+import redis
+
+from core.execution.executor import PHASES
+from core.utils.redis_client import get_redis, mark_redis_down, redis_down
+
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_KEY_PREFIX = "judge:metrics:phase_ms:"   # one hash per (phase, language): bucket counts, count, sum
+_SERIES_KEY = "judge:metrics:series"      # the (phase, language) pairs seen so far
+
+_RUN_PHASES = ("setup", "compile")        # once per run, shared by all its test cases
+
+
+def record_phases(language: str, results):
+    """Add the phase timings of one run's results to the histograms."""
+    if redis_down():
+        return
+    observations = []
+    for i, r in enumerate(results):
+        for phase, ms in (r.phases or {}).items():
+            if ms is not None and (i == 0 or phase not in _RUN_PHASES):
+                observations.append((phase, ms))
+    if not observations:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for phase, ms in observations:
+            key = f"{_KEY_PREFIX}{phase}:{language}"
+            pipe.sadd(_SERIES_KEY, f"{phase}:{language}")
+            pipe.hincrby(key, _bucket(ms), 1)
+            pipe.hincrby(key, "count", 1)
+            pipe.hincrbyfloat(key, "sum", ms)
+        pipe.execute()
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "dropping judge timing metrics")
+
+
+def render() -> str:
+    """All histograms in the Prometheus text exposition format. Raises redis.RedisError."""
+    client = get_redis()
+    rank = {p: i for i, p in enumerate(PHASES)}
+    series = sorted(
+        (s.decode() for s in client.smembers(_SERIES_KEY)),
+        key=lambda s: (rank.get(s.split(":")[0], len(rank)), s),
+    )
+    pipe = client.pipeline(transaction=False)
+    for s in series:
+        pipe.hgetall(f"{_KEY_PREFIX}{s}")
+
+    lines = [
+        "# HELP judge_phase_ms Time judged runs spend in each phase, in milliseconds.",
+        "# TYPE judge_phase_ms histogram",
+    ]
+    for s, fields in zip(series, pipe.execute()):
+        phase, language = s.split(":", 1)
+        fields = {k.decode(): v.decode() for k, v in fields.items()}
+        labels = f'phase="{phase}",language="{language}"'
+        cumulative = 0
+        for le in [str(b) for b in BUCKETS_MS] + ["+Inf"]:
+            cumulative += int(fields.get(le, 0))
+            lines.append(f'judge_phase_ms_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"judge_phase_ms_sum{{{labels}}} {float(fields.get('sum', 0))}")
+        lines.append(f"judge_phase_ms_count{{{labels}}} {int(fields.get('count', 0))}")
+    return "\n".join(lines) + "\n"
+
+
+def _bucket(ms: float) -> str:
+    return next((str(b) for b in BUCKETS_MS if ms <= b), "+Inf")
@@ -0,0 +1,105 @@
+"""
+Performance-graded code challenges: part of the score comes from runtime.
+
+A challenge with a performance_weight above 0 gives that share of its points
+for runtime against its reference solution. A submission that passes every
+test case is timed (see core.execution.timing): every test case runs
+JUDGE_PERF_RUNS times on the CPUs of JUDGE_PERF_CPUS, and its time is the
+trimmed mean of the runs, with their noise. A reference run times the
+reference solution the same way (see core.utils.reference).
+
+The runtime ratio is the submission's total time over the reference's, so the
+test cases that take longest (the large inputs, where complexity shows) weigh
+most. Noise is to the student's benefit: the ratio is divided by 1 + the noise
+of both sides before it is scored. A ratio of 1 or less earns every runtime
+point, performance_max_ratio or more earns none, and in between the credit
+falls with the logarithm of the ratio: each doubling costs the same.
+
+Runtime is not graded (the test cases earn every point) until the reference
+solution has been timed on every test case.
+
+Timed runs stay on the host grading the submission, not on the judge fleet:
+the submission and the reference are only comparable when timed alike.
+"""
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from django.conf import settings
+
+from core.execution.timing import Timing, time_code
+
+
+@dataclass
+class Performance:
+    ratio:     float   # submission time / reference time
+    noise_pct: float   # of both measurements together
+    credit:    float   # share of the runtime points earned, 0..1
+
+
+def graded_on_runtime(config) -> bool:
+    return config.performance_weight > 0
+
+
+def perf_cpus() -> set:
+    return {int(cpu) for cpu in settings.JUDGE_PERF_CPUS.split(",") if cpu.strip()}
+
+
+def measure(code: str, language: str, test_cases, config, time_limit_s: Optional[int] = None,
+            checker=None) -> dict:
+    """Timed runs of `code` on the test cases: test case id -> Timing (None when not accepted every time)."""
+    from core.utils.grading import execution_options, output_checker
+
+    return time_code(
+        code,
+        language,
+        test_cases,
+        runs=settings.JUDGE_PERF_RUNS,
+        trim=settings.JUDGE_PERF_TRIM,
+        cpus=perf_cpus(),
+        time_limit_s=time_limit_s or config.time_limit_seconds,
+        memory_mb=config.memory_limit_mb,
+        harness=config.execution_mode == "harness",
+        sql_schema=config.sql_schema,
+        checker=checker or output_checker(config),
+        **execution_options(),
+    )
+
+
+def stored_timing(time_ms, noise_pct) -> Optional[Timing]:
+    """A Timing stored on a result or test case (its runs are not kept)."""
+    return None if time_ms is None else Timing(time_ms, noise_pct or 0.0, [])
+
+
+def runtime_performance(config, test_cases, timings: dict) -> Optional[Performance]:
+    """
+    How the submission's `timings` (test case id -> Timing) compare with the
+    reference solution's. None when runtime is not graded: the challenge is
+    not performance-graded, or either side was not timed on every test case.
+    """
+    if not graded_on_runtime(config) or not test_cases:
+        return None
+    mine = [timings.get(tc.id) for tc in test_cases]
+    reference = [stored_timing(tc.reference_perf_ms, tc.reference_perf_noise_pct) for tc in test_cases]
+    if None in mine or None in reference:
+        return None
+    total, reference_total = sum(t.time_ms for t in mine), sum(t.time_ms for t in reference)
+    if reference_total <= 0:
+        return None
+
+    ratio = total / reference_total
+    noise = _noise(mine) + _noise(reference)
+    adjusted = ratio / (1 + noise / 100)
+    if adjusted <= 1:
+        credit = 1.0
+    elif config.performance_max_ratio <= 1:
+        credit = 0.0
+    else:
+        credit = max(0.0, 1 - math.log(adjusted) / math.log(config.performance_max_ratio))
+    return Performance(round(ratio, 3), round(noise, 2), round(credit, 4))
+
+
+def _noise(timings) -> float:
+    """Noise of a total time: the noise of its test cases, weighted by their time."""
+    total = sum(t.time_ms for t in timings)
+    return sum(t.time_ms * t.noise_pct for t in timings) / total if total > 0 else 0.0
@@ -0,0 +1,61 @@
+import asyncio, logging, threading, time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_RETRY_AFTER_S = 5  # after a failure, Redis is not tried again for this long
+
+_clients = {}
+_lock = threading.Lock()
+_down_until = 0.0
+
+
+def get_redis() -> redis.Redis:
+    """
+    Process-wide client for settings.REDIS_URL, with short timeouts.
+
+    The judge only uses Redis for coordination and caching, so callers fail
+    open: they check redis_down() first and call mark_redis_down() when a
+    command fails.
+    """
+    url = settings.REDIS_URL
+    with _lock:
+        client = _clients.get(url)
+        if client is None:
+            client = _clients[url] = redis.Redis.from_url(
+                url, socket_connect_timeout=0.5, socket_timeout=2,
+            )
+        return client
+
+
+def redis_down() -> bool:
+    return time.monotonic() < _down_until
+
+
+def mark_redis_down(exc: Exception, what: str):
+    global _down_until
+    logger.warning(f"Redis unavailable, {what}: {exc}")
+    _down_until = time.monotonic() + _RETRY_AFTER_S
+
+
+def wait_steps(steps):
+    """
+    Drive a polling generator, which yields the seconds to wait before its
+    next attempt, and return what it returns. Sleeps the thread.
+    """
+    try:
+        while True:
+            time.sleep(next(steps))
+    except StopIteration as done:
+        return done.value
+
+
+async def wait_steps_async(steps):
+    """wait_steps() without blocking the event loop (each attempt itself is one short Redis round trip)."""
+    try:
+        while True:
+            await asyncio.sleep(next(steps))
+    except StopIteration as done:
+        return done.value
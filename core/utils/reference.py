@@ -0,0 +1,160 @@
+"""
+Runs of a challenge's hidden reference solution (CodeChallengeConfig.solution_hidden).
+
+Every test case is run once, in parallel like a graded submission, with a
+generous time limit (JUDGE_REFERENCE_TIME_LIMIT_S) and the challenge's memory
+limit. A run either fills in the expected outputs from the reference output
+("fill") or checks the stored ones with the challenge's checker ("check").
+Either way the reference wall time and peak memory of every case are stored
+on the test case, and the time limit suggested for the challenge is
+JUDGE_REFERENCE_TIME_FACTOR times the slowest case, rounded up to seconds.
+
+On a performance-graded challenge (see core.utils.performance) a reference
+solution that ran every case to completion is then timed, and the latest
+submissions are scored again against the new reference times.
+
+Everything a run changes is stored in one transaction. Expected outputs that
+"fill" changed lose the results judged against them, and the latest
+submissions are re-judged on those test cases (every test case when the time
+limit was set to a new value).
+"""
+import math
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.execution.executor import run_code_challenge
+from core.models.code_challenge import CodeSubmissionResult
+from core.utils.grading import execution_options, output_checker
+from core.utils.performance import graded_on_runtime, measure
+from core.utils.rejudge import latest_submissions, queue_rejudge
+from core.utils.test_data import localize, test_case_fields
+
+
+def _accept_all(tc, stdout):
+    """Checker of "fill" runs: the reference output is the expected one."""
+    return None
+
+
+def run_reference(reference_run):
+    """
+    Run the reference solution of `reference_run.config` and store the outcome
+    on the ReferenceRun and its test cases. Raises ValueError when there is
+    nothing to run.
+    """
+    config = reference_run.config
+    if not config.solution_hidden.strip():
+        raise ValueError("This challenge has no reference solution.")
+    test_cases = localize(list(config.test_cases.all()))
+    if not test_cases:
+        raise ValueError("This challenge has no test cases.")
+
+    options = execution_options()
+    fill = reference_run.mode == "fill"
+    if fill:
+        # The whole output becomes the expected output: keep all of it
+        options["stored_output_chars"] = options["output_limit_bytes"]
+    results = run_code_challenge(
+        config.solution_hidden,
+        config.language,
+        test_cases,
+        time_limit_s=max(config.time_limit_seconds, settings.JUDGE_REFERENCE_TIME_LIMIT_S),
+        memory_mb=config.memory_limit_mb,
+        harness=config.execution_mode == "harness",
+        sql_schema=config.sql_schema,
+        checker=_accept_all if fill else output_checker(config),
+        **options,
+    )
+
+    if results and all(r.status == "compilation_error" for r in results):
+        fail_reference(reference_run, f"The reference solution does not compile:\n{results[0].stderr}")
+        return reference_run
+
+    # Only a reference solution that ran every case to completion suggests a limit, or is timed
+    times = [r.time_ms for r in results if r.status in ("accepted", "wrong_answer")]
+    complete = len(times) == len(results)
+    timed = graded_on_runtime(config) and complete
+    timings = measure(config.solution_hidden, config.language, test_cases, config,
+                      time_limit_s=max(config.time_limit_seconds, settings.JUDGE_REFERENCE_TIME_LIMIT_S),
+                      checker=_accept_all) if timed else {}
+
+    by_id = {tc.id: tc for tc in test_cases}
+    with transaction.atomic():
+        entries, refilled = _store_results(results, by_id, timings if timed else None, fill)
+
+        if refilled:
+            # Verdicts against the old expected outputs go: the re-judge runs those cases again
+            CodeSubmissionResult.objects.filter(test_case_id__in=refilled).delete()
+            # Cached dry-run results (see core.utils.run_cache) were for the old expected outputs
+            config.test_cases_version = F("test_cases_version") + 1
+            config.save(update_fields=["test_cases_version"])
+            config.refresh_from_db(fields=["test_cases_version"])
+
+        limit_changed = False
+        if complete:
+            suggested = max(1, math.ceil(max(times) * settings.JUDGE_REFERENCE_TIME_FACTOR / 1000))
+            reference_run.suggested_time_limit_seconds = suggested
+            if reference_run.set_time_limit and config.time_limit_seconds != suggested:
+                config.time_limit_seconds = suggested
+                config.save(update_fields=["time_limit_seconds"])
+                limit_changed = True
+
+        reference_run.status = "done"
+        reference_run.results = entries
+        reference_run.finished_at = timezone.now()
+        reference_run.save(update_fields=["status", "results", "suggested_time_limit_seconds", "finished_at"])
+
+        # Runtime points are scored against the reference times just measured; a new
+        # time limit changes every verdict (see core.utils.rejudge)
+        if (refilled or timed or limit_changed) and latest_submissions(config).exists():
+            queue_rejudge(config, full=limit_changed)
+    return reference_run
+
+
+def _store_results(results, by_id, timings, fill):
+    """
+    Store the reference times (and, filling, outputs) of each result on its
+    test case. `timings` are the timed runs, or None when not timed. Returns
+    the ReferenceRun entries and the ids of the test cases whose expected
+    output changed.
+    """
+    entries, refilled = [], []
+    for r in results:
+        tc = by_id[r.test_case_id]
+        ran = r.status in ("accepted", "wrong_answer")
+        tc.reference_time_ms = r.time_ms if ran else None
+        tc.reference_memory_mb = r.memory_mb if ran else None
+        update = ["reference_time_ms", "reference_memory_mb"]
+        if timings is not None:
+            timing = timings.get(tc.id)
+            tc.reference_perf_ms = timing.time_ms if timing else None
+            tc.reference_perf_noise_pct = timing.noise_pct if timing else None
+            update += ["reference_perf_ms", "reference_perf_noise_pct"]
+        if fill and ran:
+            fields = test_case_fields("", r.stdout)
+            if (fields["expected_stdout"], fields["expected_digest"]) != (tc.expected_stdout, tc.expected_digest):
+                tc.expected_stdout, tc.expected_digest = fields["expected_stdout"], fields["expected_digest"]
+                update += ["expected_stdout", "expected_digest"]
+                refilled.append(tc.id)
+        tc.save(update_fields=update)
+        entries.append({
+            "test_case_id": tc.id,
+            "status": r.status,
+            "time_ms": r.time_ms,
+            "cpu_ms": r.cpu_ms,
+            "memory_mb": r.memory_mb,
+            "message": r.message or (r.stderr[-500:] or None if not ran else None),
+            **({"perf_time_ms": tc.reference_perf_ms, "perf_noise_pct": tc.reference_perf_noise_pct}
+               if timings is not None else {}),
+        })
+    return entries, refilled
+
+
+def fail_reference(reference_run, reason: str):
+    """Mark a reference run that could not be executed at all."""
+    reference_run.status = "failed"
+    reference_run.detail = reason
+    reference_run.finished_at = timezone.now()
+    reference_run.save(update_fields=["status", "detail", "finished_at"])
@@ -0,0 +1,224 @@
+"""
+Re-judging submissions after a challenge's test cases change.
+
+The update view replaces test cases by difference (replace_test_cases): test
+cases whose data did not change keep their rows, and with them the results
+every submission already has for them. A re-judge then only runs, for each
+latest graded submission, the test cases it has no result for (added or
+edited ones) or was never run on (skipped after an earlier failure), and
+scores it again from old and new results together. When the limits or the
+checker changed, every test case runs again (Rejudge.full).
+
+On a performance-graded challenge (see core.utils.performance) a submission
+that passes every test case but was not timed on all of them (it passes only
+now, or test cases were added) is timed again; the others are scored from
+their stored timings against the reference's current ones.
+
+The submissions are split into chunks of JUDGE_REJUDGE_CHUNK_SIZE, each one a
+task of its own on the judge queue, so several judge workers share a large
+re-judge and every chunk writes its results in one short transaction. Within
+a chunk up to JUDGE_REJUDGE_PARALLEL submissions run at once. Students whose
+submission passes now get their certificate checked, and LTI grades are sent
+for the certificates that changed, per chunk.
+"""
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from core.constants import SENTINEL_ANSWERS
+from core.models.code_challenge import CodeSubmissionResult, CodeTestCase, Rejudge
+from core.models.submission_model import Submission
+from core.utils.completion import check_and_issue_certificate
+from core.utils.grading import (
+    RESULT_BATCH_SIZE, result_rows, run_tests, score_code_submission, trigger_grade_passbacks,
+)
+from core.utils.performance import graded_on_runtime, measure, stored_timing
+from core.utils.test_data import localize, test_case_fields
+
+logger = logging.getLogger(__name__)
+
+
+def judging_settings(config) -> tuple:
+    """What a verdict depends on besides the test cases: a change re-runs every test case."""
+    return (config.language, config.time_limit_seconds, config.memory_limit_mb, config.execution_mode,
+            config.sql_schema, config.checker, config.float_epsilon, config.checker_program)
+
+
+def replace_test_cases(config, test_cases) -> bool:
+    """
+    Make `test_cases` (dicts with stdin, expected_stdout and is_public) the
+    test cases of `config`. Existing test cases with the same data are kept.
+    Returns whether any test case was added or removed.
+    """
+    existing = {}
+    for tc in config.test_cases.all():
+        existing.setdefault(_data(tc.__dict__), []).append(tc)
+
+    new, kept = [], set()
+    for item in test_cases:
+        fields = test_case_fields(item.get("stdin", ""), item.get("expected_stdout", ""))
+        is_public = item.get("is_public", False)
+        same = existing.get(_data(fields))
+        if same:
+            tc = same.pop(0)
+            kept.add(tc.id)
+            if tc.is_public != is_public:
+                tc.is_public = is_public
+                tc.save(update_fields=["is_public"])
+        else:
+            new.append(CodeTestCase(config=config, is_public=is_public, **fields))
+
+    removed = config.test_cases.exclude(id__in=kept)
+    changed = bool(new) or removed.exists()
+    removed.delete()
+    CodeTestCase.objects.bulk_create(new)
+    return changed
+
+
+def _data(fields) -> tuple:
+    return fields["stdin"], fields["stdin_digest"], fields["expected_stdout"], fields["expected_digest"]
+
+
+def latest_submissions(config):
+    """The latest graded code submission of every student to the challenge."""
+    real = Submission.objects.filter(challenge_id=config.challenge_id, solution_revealed=False) \
+                             .exclude(answer_text__in=SENTINEL_ANSWERS)
+    latest = real.filter(user=OuterRef("user")).order_by("-attempt_no").values("id")[:1]
+    return real.filter(status__in=("passed", "failed"), id=Subquery(latest))
+
+
+def queue_rejudge(config, full: bool = False) -> Rejudge:
+    """Start a re-judge of the challenge's latest submissions once the current transaction commits."""
+    from core.tasks import rejudge_challenge
+
+    rejudge = Rejudge.objects.create(config=config, full=full)
+    transaction.on_commit(lambda: rejudge_challenge.delay(rejudge.id))
+    return rejudge
+
+
+def plan(rejudge):
+    """Chunks of submission ids to re-judge; records their number as the re-judge's total."""
+    ids = list(latest_submissions(rejudge.config).order_by("id").values_list("id", flat=True))
+    size = settings.JUDGE_REJUDGE_CHUNK_SIZE
+    rejudge.total, rejudge.status = len(ids), "running"
+    rejudge.save(update_fields=["total", "status"])
+    if not ids:
+        finish(rejudge.id)
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def rejudge_chunk(rejudge, submission_ids):
+    """Re-judge some submissions of a re-judge and count them as processed."""
+    config = rejudge.config
+    counts = Counter()
+    try:
+        counts = _rejudge(rejudge, config, submission_ids)
+    except Exception:
+        logger.exception(f"Re-judge {rejudge.id}: chunk of {len(submission_ids)} submissions failed")
+        counts["errors"] = len(submission_ids)
+    Rejudge.objects.filter(id=rejudge.id).update(
+        processed=F("processed") + len(submission_ids),
+        changed=F("changed") + counts["changed"],
+        errors=F("errors") + counts["errors"],
+    )
+    finish(rejudge.id)
+
+
+def finish(rejudge_id: int):
+    # Only the chunk that completes the count finds the re-judge still running
+    Rejudge.objects.filter(id=rejudge_id, status="running", processed__gte=F("total")) \
+                   .update(status="done", finished_at=timezone.now())
+
+
+def _rejudge(rejudge, config, submission_ids) -> Counter:
+    challenge = config.challenge
+    test_cases = localize(list(config.test_cases.all()))
+    submissions = list(Submission.objects.filter(id__in=submission_ids, status__in=("passed", "failed"))
+                       .select_related("user"))
+    statuses = {s.id: {} for s in submissions}   # submission id -> test case id -> status
+    timings = {s.id: {} for s in submissions}    # submission id -> test case id -> Timing
+    if not rejudge.full:
+        for sid, tc_id, status, perf_ms, perf_noise in CodeSubmissionResult.objects \
+                .filter(submission_id__in=submission_ids) \
+                .values_list("submission_id", "test_case_id", "status", "perf_time_ms", "perf_noise_pct"):
+            statuses[sid][tc_id] = status
+            timings[sid][tc_id] = stored_timing(perf_ms, perf_noise)
+
+    fail_fast = config.fail_fast and not config.partial_credit
+    timed = graded_on_runtime(config)
+
+    def run(submission):
+        known, language = statuses[submission.id], submission.language or config.language
+        if fail_fast and any(s not in ("accepted", "skipped") for s in known.values()):
+            return submission, [], False   # failed a test case that did not change: still failed
+        missing = [tc for tc in test_cases if known.get(tc.id) in (None, "skipped")]
+        results = run_tests(submission.answer_text, language, missing, config, fail_fast=fail_fast) \
+            if missing else []
+        now = {**known, **{r.test_case_id: r.status for r in results}}
+        if timed and all(now.get(tc.id) == "accepted" for tc in test_cases) \
+                and any(timings[submission.id].get(tc.id) is None for tc in test_cases):
+            timings[submission.id] = measure(submission.answer_text, language, test_cases, config)
+            return submission, results, True
+        return submission, results, False
+
+    counts, rows, updated, ran, measured, newly_passed = Counter(), [], [], [], {}, []
+    with ThreadPoolExecutor(settings.JUDGE_REJUDGE_PARALLEL) as pool:
+        for submission, results, was_timed in pool.map(_guarded(run), submissions):
+            if results is None:
+                counts["errors"] += 1
+                continue
+            if results:
+                ran.append(submission)
+            if was_timed:
+                measured[submission.id] = timings[submission.id]
+            statuses[submission.id].update((r.test_case_id, r.status) for r in results)
+            rows += result_rows(submission, results, measured.get(submission.id))
+            was = submission.status
+            score_code_submission(submission, config, test_cases, statuses[submission.id], timings[submission.id])
+            updated.append(submission)
+            if submission.status != was:
+                counts["changed"] += 1
+                if submission.status == "passed":
+                    newly_passed.append(submission.user)
+
+    with transaction.atomic():
+        # Results replaced: all of them, or the test cases skipped before
+        stale = CodeSubmissionResult.objects.filter(submission__in=ran)
+        if not rejudge.full:
+            stale = stale.filter(status="skipped")
+        stale.delete()
+        CodeSubmissionResult.objects.bulk_create(rows, batch_size=RESULT_BATCH_SIZE)
+        # Timed now: the results kept get their timings too
+        kept = list(CodeSubmissionResult.objects.filter(submission_id__in=measured)
+                    .only("id", "submission_id", "test_case_id"))
+        for row in kept:
+            timing = measured[row.submission_id].get(row.test_case_id)
+            row.perf_time_ms, row.perf_noise_pct = (timing.time_ms, timing.noise_pct) if timing else (None, None)
+        CodeSubmissionResult.objects.bulk_update(kept, ["perf_time_ms", "perf_noise_pct"],
+                                                 batch_size=RESULT_BATCH_SIZE)
+        Submission.objects.bulk_update(updated, ["status", "score", "feedback", "graded_at"],
+                                      batch_size=RESULT_BATCH_SIZE)
+
+    course = challenge.topic.course
+    passbacks = {}
+    for user in newly_passed:
+        cert, score_changed = check_and_issue_certificate(user, course)
+        if cert and score_changed:
+            passbacks[user] = cert.score_pct / 100
+    trigger_grade_passbacks(course, passbacks)
+    return counts
+
+
+def _guarded(run):
+    def guarded(submission):
+        try:
+            return run(submission)
+        except Exception:
+            logger.exception(f"Re-judging submission {submission.id} failed")
+            return submission, None, False
+    return guarded
@@ -0,0 +1,75 @@
+import dataclasses, hashlib, json, time
+from typing import List, Optional
+
+import redis
+from django.conf import settings
+
+from core.execution.executor import TestResult
+from core.utils.redis_client import get_redis, mark_redis_down, redis_down
+
+_KEY_PREFIX = "judge:runs:"
+_LRU_KEY    = "judge:runs:lru"   # sorted set of cached keys, scored by last use (ms)
+
+
+def run_key(code: str, language: str, config, scope: str = "public") -> str:
+    """
+    Identifies a run of `code` against the config's "public" or "all" test
+    cases: the code and everything its results depend on. The config's
+    test_cases_version is bumped whenever its test cases are replaced, so
+    results for old test cases are never served.
+    """
+    parts = [
+        code, language, scope, config.id, config.test_cases_version,
+        config.time_limit_seconds, config.memory_limit_mb, config.execution_mode,
+        config.partial_credit, config.fail_fast, config.sql_schema,
+        config.checker, config.float_epsilon, config.checker_program,
+    ]
+    digest = hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+    return f"{_KEY_PREFIX}{digest}"
+
+
+def get_results(key: str) -> Optional[List[TestResult]]:
+    """Cached results of a dry run, or None (also when Redis is unavailable)."""
+    if not settings.JUDGE_RUN_CACHE_TTL_S or redis_down():
+        return None
+    try:
+        client = get_redis()
+        cached = client.get(key)
+        if cached is None:
+            return None
+        client.zadd(_LRU_KEY, {key: _now_ms()})
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "running without the result cache")
+        return None
+    return [TestResult(**r) for r in json.loads(cached)]
+
+
+def store_results(key: str, results: List[TestResult]):
+    """
+    Cache the results of a dry run, for JUDGE_RUN_CACHE_TTL_S and evicting the
+    least recently used runs beyond JUDGE_RUN_CACHE_MAX_ENTRIES. Time limits
+    depend on the load of the host, so runs with one are not cached.
+    """
+    if not settings.JUDGE_RUN_CACHE_TTL_S or redis_down():
+        return
+    if any(r.status == "time_limit" for r in results):
+        return
+    try:
+        client = get_redis()
+        pipe = client.pipeline()
+        pipe.set(key, json.dumps([dataclasses.asdict(r) for r in results]), ex=settings.JUDGE_RUN_CACHE_TTL_S)
+        pipe.zadd(_LRU_KEY, {key: _now_ms()})
+        # Entries unused for longer than the TTL have expired on their own
+        pipe.zremrangebyscore(_LRU_KEY, "-inf", _now_ms() - settings.JUDGE_RUN_CACHE_TTL_S * 1000)
+        pipe.zcard(_LRU_KEY)
+        excess = pipe.execute()[-1] - settings.JUDGE_RUN_CACHE_MAX_ENTRIES
+        if excess > 0:
+            evicted = [k for k, _ in client.zpopmin(_LRU_KEY, excess)]
+            if evicted:
+                client.delete(*evicted)
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "running without the result cache")
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
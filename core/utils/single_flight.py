@@ -0,0 +1,165 @@
+import asyncio, dataclasses, json, threading, time, uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Awaitable, Callable, List
+
+import redis
+from django.conf import settings
+
+from core.execution.executor import TestResult
+from core.utils.redis_client import get_redis, mark_redis_down, redis_down, wait_steps, wait_steps_async
+
+_RESULT_TTL_S = 10   # long enough for the waiting requests to pick the result up
+_POLL_S       = 0.05
+
+# Deletes the lock only if this execution still holds it
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_release_script = None
+
+
+def run_once(key: str, execute: Callable[[], List[TestResult]]) -> List[TestResult]:
+    """
+    Run `execute()` once for concurrent callers with the same `key` and hand
+    every one of them its results.
+
+    Within a process, callers wait on the first caller's execution. Across
+    processes, the first one takes a Redis lock and publishes its results for
+    the others, which poll for them; if it dies without publishing, a waiter
+    takes over. Without Redis only the in-process sharing applies.
+    """
+    future, leader = _join(key)
+    if not leader:
+        return future.result()
+    with _leading(key, future):
+        results = _run_across_processes(key, execute)
+        future.set_result(results)
+        return results
+
+
+async def run_once_async(key: str, execute: Callable[[], Awaitable[List[TestResult]]]) -> List[TestResult]:
+    """run_once() for a coroutine function, sharing executions with threaded callers too."""
+    future, leader = _join(key)
+    if not leader:
+        return await asyncio.wrap_future(future)
+    with _leading(key, future):
+        results = await _run_across_processes_async(key, execute)
+        future.set_result(results)
+        return results
+
+
+def _join(key: str):
+    """The future of the execution in flight for `key`, and whether the caller is to run it."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+
+@contextmanager
+def _leading(key: str, future: Future):
+    try:
+        yield
+    except BaseException as exc:
+        future.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+def _run_across_processes(key: str, execute) -> List[TestResult]:
+    if redis_down():
+        return execute()
+    lock_key, result_key = f"{key}:lock", f"{key}:result"
+    token = uuid.uuid4().hex
+    try:
+        client = get_redis()
+        outcome, results = wait_steps(_claim_steps(client, lock_key, result_key, token))
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "running without cross-process deduplication")
+        return execute()
+    if outcome == "shared":
+        return results
+    if outcome == "timeout":
+        return execute()  # the holder is stuck; do not wait on it any longer
+
+    try:
+        results = execute()
+        # Published before the lock is released: a waiter finding neither runs it again
+        _publish(client, result_key, results)
+        return results
+    finally:
+        _release(client, lock_key, token)
+
+
+async def _run_across_processes_async(key: str, execute) -> List[TestResult]:
+    if redis_down():
+        return await execute()
+    lock_key, result_key = f"{key}:lock", f"{key}:result"
+    token = uuid.uuid4().hex
+    try:
+        client = get_redis()
+        outcome, results = await wait_steps_async(_claim_steps(client, lock_key, result_key, token))
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "running without cross-process deduplication")
+        return await execute()
+    if outcome == "shared":
+        return results
+    if outcome == "timeout":
+        return await execute()
+
+    try:
+        results = await execute()
+        _publish(client, result_key, results)
+        return results
+    finally:
+        _release(client, lock_key, token)
+
+
+def _claim_steps(client, lock_key: str, result_key: str, token: str):
+    """
+    Take the lock, or wait for the holder's results; yields the seconds between
+    polls (see wait_steps). Returns ("lead", None), ("shared", results) or
+    ("timeout", None).
+    """
+    deadline = time.monotonic() + settings.JUDGE_SINGLE_FLIGHT_WAIT_S
+    waiting = False
+    while True:
+        # Only a result published since this call found the lock held is shared
+        cached = client.get(result_key) if waiting else None
+        if cached is not None:
+            return "shared", [TestResult(**r) for r in json.loads(cached)]
+        if client.set(lock_key, token, nx=True, ex=settings.JUDGE_SINGLE_FLIGHT_WAIT_S):
+            client.delete(result_key)  # left by an earlier execution
+            return "lead", None
+        waiting = True
+        if time.monotonic() >= deadline:
+            return "timeout", None
+        yield _POLL_S
+
+
+def _publish(client, result_key: str, results: List[TestResult]):
+    try:
+        client.set(result_key, json.dumps([dataclasses.asdict(r) for r in results]), ex=_RESULT_TTL_S)
+    except redis.RedisError as exc:
+        mark_redis_down(exc, "could not share a run's results")
+
+
+def _release(client, lock_key: str, token: str):
+    global _release_script
+    try:
+        if _release_script is None:
+            _release_script = client.register_script(_RELEASE)
+        _release_script(keys=[lock_key], args=[token], client=client)
+    except redis.RedisError:
+        pass  # the lock expires on its own
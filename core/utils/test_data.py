@@ -0,0 +1,202 @@
+"""
+Large test case data kept out of the database.
+
+Inputs and expected outputs longer than JUDGE_TEST_DATA_INLINE_KB are stored
+as content-addressed files (named by their sha256) in the "judge_data"
+storage (see STORAGES: local disk by default, or any Django storage backend
+such as an object store); the test case keeps only their digests. Judge
+hosts copy every file they use into JUDGE_TEST_DATA_CACHE_DIR, dropping the
+least recently used beyond JUDGE_TEST_DATA_CACHE_MAX_MB, and the executor
+hands the cached file to the program as its stdin (see executor.stdin_path):
+the data never goes through a Python string in the judge.
+
+The files of a suite are pinned while its test cases are in use: localize()
+takes a shared lock on each of them, released with the test cases, and
+eviction skips locked files. A cache smaller than the suites running
+therefore goes over its size for as long as they run.
+"""
+import fcntl, glob, hashlib, os, uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+
+STORAGE_ALIAS = "judge_data"
+_CHUNK = 1024 * 1024
+
+
+def test_case_fields(stdin: str, expected_stdout: str) -> dict:
+    """CodeTestCase fields for this data: inline, or stored as files when large."""
+    fields = {"stdin": stdin, "expected_stdout": expected_stdout, "stdin_digest": "", "expected_digest": ""}
+    limit = settings.JUDGE_TEST_DATA_INLINE_KB * 1024
+    if not limit:
+        return fields
+    for text_field, digest_field in (("stdin", "stdin_digest"), ("expected_stdout", "expected_digest")):
+        data = fields[text_field].encode()
+        if len(data) > limit:
+            fields[digest_field] = store(data)
+            fields[text_field] = ""
+    return fields
+
+
+def store(data: bytes) -> str:
+    """Save `data` in the judge_data storage (once per content). Returns its digest."""
+    digest = hashlib.sha256(data).hexdigest()
+    storage, name = storages[STORAGE_ALIAS], _name(digest)
+    if not storage.exists(name):
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:
+            storage.delete(saved)  # stored concurrently under the same name; keep that copy
+    return digest
+
+
+def localize(test_cases):
+    """
+    Point the file-backed test cases at local copies of their data: sets
+    `stdin_path` and `expected_path` (None for inline data) on every test case.
+    The copies are pinned in the cache until the test cases are released.
+    """
+    for tc in test_cases:
+        pins = _Pins()
+        tc.stdin_path = _pinned(tc.stdin_digest, pins) if tc.stdin_digest else None
+        tc.expected_path = _pinned(tc.expected_digest, pins) if tc.expected_digest else None
+        tc.test_data_pins = pins
+    return test_cases
+
+
+class _Pins:
+    """Open descriptors holding shared locks on cached files; closed with the test case holding them."""
+
+    def __init__(self):
+        self.fds = []
+
+    def __del__(self):
+        for fd in self.fds:
+            os.close(fd)
+
+
+def _pinned(digest: str, pins: _Pins, attempts: int = 3) -> str:
+    """cached_path(), with the file locked against eviction (see _evict)."""
+    path = _cache_path(digest)
+    for _ in range(attempts):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            pins.fds.append(_fetch(digest, path))  # locked before eviction can see it
+            return path
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            linked = os.stat(path).st_ino == os.fstat(fd).st_ino
+            os.utime(path)  # most recently used: evicted last
+        except FileNotFoundError:
+            linked = False
+        if linked:
+            pins.fds.append(fd)
+            return path
+        os.close(fd)  # removed while being locked: fetch it again
+    raise FileNotFoundError(f"Test data {digest} was evicted from the cache every time it was about to be pinned")
+
+
+def cached_path(digest: str) -> str:
+    """The path of the host's copy of a stored file, fetched from the storage on a miss."""
+    path = _cache_path(digest)
+    try:
+        os.utime(path)  # most recently used: evicted last
+    except FileNotFoundError:
+        os.close(_fetch(digest, path))
+    return path
+
+
+def _fetch(digest: str, path: str) -> int:
+    """
+    Copy a stored file to `path`, then evict. Returns a descriptor of the copy
+    holding a shared lock, taken before the file was in place: eviction never
+    removes a file on its way to the run that fetched it.
+    """
+    root = settings.JUDGE_TEST_DATA_CACHE_DIR
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    staging = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    fd = None
+    try:
+        h = hashlib.sha256()
+        with storages[STORAGE_ALIAS].open(_name(digest), "rb") as src, open(staging, "wb") as dst:
+            for chunk in iter(lambda: src.read(_CHUNK), b""):
+                h.update(chunk)
+                dst.write(chunk)
+        if h.hexdigest() != digest:
+            raise ValueError(f"Test data {digest} is corrupt in storage")
+        fd = os.open(staging, os.O_RDONLY)
+        fcntl.flock(fd, fcntl.LOCK_SH)  # the lock stays with the file through the rename
+        os.replace(staging, path)  # atomic: readers never see a partial file
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        raise
+    finally:
+        if os.path.exists(staging):
+            os.remove(staging)
+    _evict(root, settings.JUDGE_TEST_DATA_CACHE_MAX_MB * 1024 * 1024)
+    return fd
+
+
+def preview(tc, field: str, chars: int = 1024) -> str:
+    """The start of a test case's stdin or expected_stdout, for showing to students."""
+    path = getattr(tc, "stdin_path" if field == "stdin" else "expected_path", None)
+    if not path:
+        return getattr(tc, field)
+    with open(path, "rb") as f:
+        head = f.read(chars + 1).decode(errors="replace")
+    return head if len(head) <= chars else head[:chars] + "…"
+
+
+def _cache_path(digest: str) -> str:
+    return os.path.join(settings.JUDGE_TEST_DATA_CACHE_DIR, digest[:2], digest)
+
+
+def _name(digest: str) -> str:
+    return f"testdata/{digest[:2]}/{digest}"
+
+
+def _evict(root: str, max_bytes: int):
+    """Drop least recently used files until the cache fits in max_bytes."""
+    with open(os.path.join(root, ".evict.lock"), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return  # another process is already evicting
+
+        files, total = [], 0
+        for path in glob.glob(os.path.join(root, "??", "*")):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        # A run that already opened an evicted file keeps reading it
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            if _remove_unpinned(path):
+                total -= size
+
+
+def _remove_unpinned(path: str) -> bool:
+    """Remove a cached file unless a suite has it pinned (see localize). Returns whether it is gone."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return True
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return True
+    finally:
+        os.close(fd)
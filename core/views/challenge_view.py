@@ -9,10 +9,13 @@ from core.serializers.challenge_serializer import (
 )
 from core.models.topic_model import Topic
 from core.models.challenge_model import Challenge
-from core.models.code_challenge import CodeChallengeConfig, CodeTestCase
+from core.execution import sql_engine
+from core.models.code_challenge import CodeChallengeConfig
 from core.models.submission_model import Submission
 from core.permissions import IsTeacherUser, IsEmailVerified
 from core.utils.access import user_can_access_course
+from core.utils.rejudge import judging_settings, queue_rejudge, replace_test_cases
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 import json
 
@@ -178,11 +181,61 @@ class ChallengeCreateView(generics.CreateAPIView):
                     type=openapi.TYPE_OBJECT,
                     required=["language", "test_cases"],
                     properties={
-                        "language":           openapi.Schema(type=openapi.TYPE_STRING, enum=["python", "javascript", "java", "cpp"]),
+                        "language":           openapi.Schema(type=openapi.TYPE_STRING, enum=["python", "javascript", "java", "cpp", "sql"]),
                         "solution_template":  openapi.Schema(type=openapi.TYPE_STRING, description="Starter code shown to student in editor"),
                         "solution_hidden":    openapi.Schema(type=openapi.TYPE_STRING, description="Reference solution — never sent to client"),
                         "time_limit_seconds": openapi.Schema(type=openapi.TYPE_INTEGER, description="Per-test-case CPU time limit. Default: 5"),
                         "memory_limit_mb":    openapi.Schema(type=openapi.TYPE_INTEGER, description="Memory limit in MB. Default: 128"),
+                        "execution_mode":     openapi.Schema(
+                            type=openapi.TYPE_STRING, enum=["isolated", "harness"],
+                            description="'harness' runs all test cases in one process (python/javascript, "
+                                        "pure-function challenges only). Default: 'isolated'",
+                        ),
+                        "partial_credit":     openapi.Schema(
+                            type=openapi.TYPE_BOOLEAN,
+                            description="Score by the weight of the passed test cases; otherwise full points "
+                                        "only when all pass. Default: true",
+                        ),
+                        "fail_fast":          openapi.Schema(
+                            type=openapi.TYPE_BOOLEAN,
+                            description="Without partial credit: run the cheapest test cases first and stop at "
+                                        "the first failure; the rest are reported as 'skipped'. Default: false",
+                        ),
+                        "sql_schema":         openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="sql only: CREATE TABLE / INSERT statements every query runs on. For sql, "
+                                        "a test case's stdin is extra SQL loading its data and expected_stdout "
+                                        "the result rows, one per line, values separated by '|' (NULL for null)",
+                        ),
+                        "checker":            openapi.Schema(
+                            type=openapi.TYPE_STRING, enum=["tokens", "exact", "program"],
+                            description="How outputs are judged. 'tokens': whitespace-separated tokens, stopping at "
+                                        "the first mismatch; 'exact': the whole trimmed outputs; 'program': "
+                                        "checker_program decides. Default: 'tokens'",
+                        ),
+                        "float_epsilon":      openapi.Schema(
+                            type=openapi.TYPE_NUMBER, nullable=True,
+                            description="'tokens' checker: numbers within this absolute or relative difference "
+                                        "are equal. Default: null (compared as text)",
+                        ),
+                        "checker_program":    openapi.Schema(
+                            type=openapi.TYPE_STRING,
+                            description="'program' checker: Python 3 run as `checker.py <input> <expected> <output>` "
+                                        "(file paths) in the sandbox. Exit status 42 accepts, 43 rejects; the "
+                                        "first line printed is shown to the student",
+                        ),
+                        "performance_weight": openapi.Schema(
+                            type=openapi.TYPE_NUMBER,
+                            description="Share (0..1) of the points earned by runtime against the reference "
+                                        "solution, once it has been timed by a reference run. Submissions that "
+                                        "pass every test case are run JUDGE_PERF_RUNS times and compared by "
+                                        "the trimmed mean of their runs. Default: 0 (not graded on runtime)",
+                        ),
+                        "performance_max_ratio": openapi.Schema(
+                            type=openapi.TYPE_NUMBER,
+                            description="Runtime this many times the reference's earns no runtime points; "
+                                        "the credit falls with the logarithm of the ratio. Default: 10",
+                        ),
                         "test_cases": openapi.Schema(
                             type=openapi.TYPE_ARRAY,
                             items=openapi.Schema(
@@ -303,6 +356,8 @@ class ChallengeUpdateAPIView(APIView):
             raise PermissionDenied("You do not own this challenge.")
 
         data = request.data
+        points_before = challenge.points
+        rejudge = None
 
         if "title" in data:
             challenge.title = data["title"]
@@ -324,10 +379,66 @@ class ChallengeUpdateAPIView(APIView):
         if challenge.challenge_type == "code":
             # Update code config fields
             config, _ = CodeChallengeConfig.objects.get_or_create(challenge=challenge)
+            judging_before = judging_settings(config)
+            scoring_before = (points_before, config.partial_credit, config.fail_fast,
+                              config.performance_weight, config.performance_max_ratio)
             if "code_language" in data:
                 config.language = data["code_language"]
             if "code_template" in data:
                 config.solution_template = data["code_template"]
+            if "code_solution_hidden" in data:
+                config.solution_hidden = data["code_solution_hidden"]
+            if "code_execution_mode" in data:
+                if data["code_execution_mode"] not in dict(CodeChallengeConfig.EXECUTION_MODE_CHOICES):
+                    return Response({"code_execution_mode": "Must be 'isolated' or 'harness'."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                config.execution_mode = data["code_execution_mode"]
+            for field in ("partial_credit", "fail_fast"):
+                if f"code_{field}" in data:
+                    setattr(config, field, str(data[f"code_{field}"]).lower() in ("true", "1"))
+            if "code_sql_schema" in data:
+                config.sql_schema = data["code_sql_schema"]
+            if "code_checker" in data:
+                if data["code_checker"] not in dict(CodeChallengeConfig.CHECKER_CHOICES):
+                    return Response({"code_checker": "Must be 'tokens', 'exact' or 'program'."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                config.checker = data["code_checker"]
+            if "code_checker_program" in data:
+                config.checker_program = data["code_checker_program"]
+            if "code_float_epsilon" in data:
+                try:
+                    epsilon = data["code_float_epsilon"]
+                    config.float_epsilon = None if epsilon in (None, "") else float(epsilon)
+                except (TypeError, ValueError):
+                    return Response({"code_float_epsilon": "Must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+                if config.float_epsilon is not None and config.float_epsilon < 0:
+                    return Response({"code_float_epsilon": "Must not be negative."}, status=status.HTTP_400_BAD_REQUEST)
+            if "code_performance_weight" in data:
+                try:
+                    config.performance_weight = float(data["code_performance_weight"])
+                except (TypeError, ValueError):
+                    return Response({"code_performance_weight": "Must be a number."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if not 0 <= config.performance_weight <= 1:
+                    return Response({"code_performance_weight": "Must be between 0 and 1."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            if "code_performance_max_ratio" in data:
+                try:
+                    config.performance_max_ratio = float(data["code_performance_max_ratio"])
+                except (TypeError, ValueError):
+                    return Response({"code_performance_max_ratio": "Must be a number."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+                if config.performance_max_ratio <= 1:
+                    return Response({"code_performance_max_ratio": "Must be greater than 1."},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            if config.checker == "program" and not config.checker_program.strip():
+                return Response({"code_checker_program": "Required when the checker is 'program'."},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if config.language == "sql":
+                try:
+                    sql_engine.template(config.sql_schema)
+                except ValueError as exc:
+                    return Response({"code_sql_schema": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
             config.save()
 
             # Replace test cases if provided (JSON string or list)
@@ -341,14 +452,19 @@ class ChallengeUpdateAPIView(APIView):
                 else:
                     test_cases = raw
 
-                config.test_cases.all().delete()
-                for tc in test_cases:
-                    CodeTestCase.objects.create(
-                        config=config,
-                        stdin=tc.get("stdin", ""),
-                        expected_stdout=tc.get("expected_stdout", ""),
-                        is_public=tc.get("is_public", False),
-                    )
+                test_cases_changed = replace_test_cases(config, test_cases)
+                # Cached dry-run results (see core.utils.run_cache) were for the old test cases
+                config.test_cases_version = F("test_cases_version") + 1
+                config.save(update_fields=["test_cases_version"])
+            else:
+                test_cases_changed = False
+
+            # Scores of the latest submissions are stale: judge again what changed
+            full = judging_settings(config) != judging_before
+            if full or test_cases_changed or \
+                    (challenge.points, config.partial_credit, config.fail_fast,
+                     config.performance_weight, config.performance_max_ratio) != scoring_before:
+                rejudge = queue_rejudge(config, full=full)
 
         else:
             # Update correct answer (quiz / text only)
@@ -376,7 +492,9 @@ class ChallengeUpdateAPIView(APIView):
                              .get(pk=challenge.pk),
             context={"request": request}
         )
-        return Response(serializer.data)
+        if rejudge is None:
+            return Response(serializer.data)
+        return Response({**serializer.data, "rejudge_id": rejudge.id})
 
 
 class ChallengeDeleteAPIView(generics.DestroyAPIView):
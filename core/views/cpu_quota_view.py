@@ -0,0 +1,160 @@
+# core/views/cpu_quota_view.py
+from datetime import timedelta
+
+import redis
+from django.conf import settings
+from django.db.models import Sum
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import parsers, status
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authentication.models import User
+from core.models.course_model import Course
+from core.models.usage_model import CpuQuota, CpuUsage
+from core.utils.cpu_usage import window_usage
+
+
+def _get_course_for_owner(slug, request_user):
+    course = get_object_or_404(Course, slug=slug)
+    if course.owner != request_user and not request_user.is_staff:
+        raise PermissionDenied("Only the course owner can manage CPU quotas.")
+    return course
+
+
+def _describe(course, days):
+    quotas = [
+        {"scope": q.scope, "user_id": q.user_id, "username": q.user.username if q.user else None,
+         "cpu_seconds": q.cpu_seconds, "updated_at": q.updated_at}
+        for q in CpuQuota.objects.filter(course=course).select_related("user").order_by("scope", "user_id")
+    ]
+    try:
+        window_s = window_usage(course_id=course.id, scope="course")
+    except redis.RedisError:
+        window_s = None
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    per_user = (
+        CpuUsage.objects.filter(course=course, day__gte=since)
+        .values("user_id", "user__username", "kind")
+        .annotate(cpu_ms=Sum("cpu_ms"), runs=Sum("runs"))
+        .order_by("user_id", "kind")
+    )
+    users = {}
+    for row in per_user:
+        entry = users.setdefault(row["user_id"], {
+            "user_id": row["user_id"], "username": row["user__username"], "cpu_seconds": 0.0, "runs": 0,
+        })
+        entry["cpu_seconds"] = round(entry["cpu_seconds"] + row["cpu_ms"] / 1000, 3)
+        entry["runs"] += row["runs"]
+        entry[f"{row['kind']}_cpu_seconds"] = round(row["cpu_ms"] / 1000, 3)
+    return {
+        "window_s": settings.JUDGE_USAGE_WINDOW_S,
+        "quotas": quotas,
+        "usage": {
+            "window_cpu_seconds": window_s,
+            "days": days,
+            "users": sorted(users.values(), key=lambda u: -u["cpu_seconds"]),
+        },
+    }
+
+
+class CourseCpuQuotaView(APIView):
+    """GET / PUT /platform/courses/<slug>/cpu-quota/ — the CPU quotas of a course and its students' usage."""
+    permission_classes = [IsAuthenticated]
+    parser_classes = [parsers.JSONParser]
+
+    @swagger_auto_schema(
+        tags=["Course"],
+        operation_summary="Get the CPU quotas of a course and its students' CPU usage",
+        operation_description=(
+            "Quotas are CPU seconds of judging (/run/ and /submit/) allowed per rolling `window_s`: "
+            "`user` quotas per student (one student with `user_id`, every student without), a `course` "
+            "quota for every student together. Near a quota runs are slowed; past it /run/ answers `429` "
+            "and submissions are judged once the window has room again.\n\n"
+            "`usage.window_cpu_seconds` is the course's usage in the current window (`null` when it is "
+            "not known), `usage.users` each student's CPU time over the last `days` days."
+        ),
+        manual_parameters=[
+            openapi.Parameter("days", openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=7,
+                              description="Days of per-student usage (1-90)"),
+        ],
+        responses={
+            200: openapi.Response(description="Quotas and usage", examples={"application/json": {
+                "window_s": 3600,
+                "quotas": [{"scope": "user", "user_id": None, "username": None, "cpu_seconds": 120,
+                            "updated_at": "2026-10-18T09:00:00Z"}],
+                "usage": {"window_cpu_seconds": 42.5, "days": 7, "users": [
+                    {"user_id": 7, "username": "ada", "cpu_seconds": 31.2, "runs": 95,
+                     "run_cpu_seconds": 25.0, "submit_cpu_seconds": 6.2},
+                ]},
+            }}),
+            403: openapi.Response(description="Not the owner of the course"),
+            404: openapi.Response(description="Course not found"),
+        },
+    )
+    def get(self, request, slug):
+        course = _get_course_for_owner(slug, request.user)
+        try:
+            days = int(request.query_params.get("days", 7))
+        except ValueError:
+            raise ValidationError({"days": "Must be an integer."})
+        if not 1 <= days <= 90:
+            raise ValidationError({"days": "Must be between 1 and 90."})
+        return Response(_describe(course, days))
+
+    @swagger_auto_schema(
+        tags=["Course"],
+        operation_summary="Set or remove a CPU quota of a course",
+        operation_description=(
+            "Sets the quota of `scope` (`user` with or without `user_id`, or `course`) to `cpu_seconds` "
+            "per window; `cpu_seconds: null` removes it (the site-wide quota applies again)."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=["scope", "cpu_seconds"],
+            properties={
+                "scope": openapi.Schema(type=openapi.TYPE_STRING, enum=["user", "course"]),
+                "user_id": openapi.Schema(type=openapi.TYPE_INTEGER, nullable=True,
+                                          description="[user only] One student; omit for every student"),
+                "cpu_seconds": openapi.Schema(type=openapi.TYPE_INTEGER, nullable=True),
+            },
+            example={"scope": "user", "cpu_seconds": 120},
+        ),
+        responses={
+            200: openapi.Response(description="Quotas and usage, as GET returns them"),
+            400: openapi.Response(description="Invalid scope, user or CPU seconds"),
+            403: openapi.Response(description="Not the owner of the course"),
+            404: openapi.Response(description="Course not found"),
+        },
+    )
+    def put(self, request, slug):
+        course = _get_course_for_owner(slug, request.user)
+        scope = request.data.get("scope")
+        if scope not in dict(CpuQuota.SCOPE_CHOICES):
+            raise ValidationError({"scope": "Must be 'user' or 'course'."})
+
+        user = None
+        if request.data.get("user_id") is not None:
+            if scope != "user":
+                raise ValidationError({"user_id": "Only 'user' quotas are set per student."})
+            user = User.objects.filter(id=request.data["user_id"]).first()
+            if user is None:
+                raise ValidationError({"user_id": "No user with this id."})
+
+        cpu_seconds = request.data.get("cpu_seconds")
+        if cpu_seconds is None:
+            CpuQuota.objects.filter(course=course, user=user, scope=scope).delete()
+        else:
+            if not isinstance(cpu_seconds, int) or isinstance(cpu_seconds, bool) or cpu_seconds < 1:
+                raise ValidationError({"cpu_seconds": "Must be a positive integer, or null to remove the quota."})
+            CpuQuota.objects.update_or_create(
+                course=course, user=user, scope=scope,
+                defaults={"cpu_seconds": cpu_seconds, "updated_by": request.user},
+            )
+        return Response(_describe(course, 7), status=status.HTTP_200_OK)
@@ -0,0 +1,76 @@
+# core/views/metrics_view.py
+import redis
+from django.http import HttpResponse
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from core.utils import judge_fleet
+from core.utils.judge_metrics import render
+
+
+class JudgeMetricsView(APIView):
+    """
+    GET /platform/judge/metrics/ — judge phase timings as Prometheus histograms.
+    Staff only.
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        tags=["Judge"],
+        operation_summary="Judge phase timing histograms (Prometheus text format)",
+        operation_description=(
+            "Histograms of the time judged runs spend in each phase — `setup` (temp dir), "
+            "`compile`, `spawn`, `user` and `sys` CPU, `wall` and output `compare` — per language, "
+            "in milliseconds. Tells judge overhead apart from time spent in student code."
+        ),
+        responses={
+            200: openapi.Response(description="Metrics in the Prometheus text exposition format"),
+            403: openapi.Response(description="Not a staff user"),
+            503: openapi.Response(description="Metrics store (Redis) unavailable"),
+        },
+    )
+    def get(self, request):
+        try:
+            body = render()
+        except redis.RedisError:
+            return HttpResponse("metrics store unavailable\n", status=503, content_type="text/plain")
+        return HttpResponse(body, content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+
+class JudgeFleetView(APIView):
+    """
+    GET /platform/judge/fleet/ — the live judge workers and what they advertise.
+    Staff only.
+    """
+    permission_classes = [IsAdminUser]
+
+    @swagger_auto_schema(
+        tags=["Judge"],
+        operation_summary="Live judge workers of the fleet",
+        operation_description=(
+            "Every worker that sent a heartbeat within `JUDGE_FLEET_WORKER_TTL_S`: the languages it "
+            "serves, its slots (jobs run at once) and how many are busy, and the jobs waiting per language."
+        ),
+        responses={
+            200: openapi.Response(description="Workers by id, and queued jobs per language"),
+            403: openapi.Response(description="Not a staff user"),
+            503: openapi.Response(description="Fleet queues (Redis) unavailable"),
+        },
+    )
+    def get(self, request):
+        try:
+            workers = judge_fleet.workers()
+            languages = sorted({lang for info in workers.values() for lang in info["languages"]})
+            queued = judge_fleet.queue_lengths(languages)
+        except redis.RedisError:
+            return Response({"detail": "Fleet queues unavailable."}, status=503)
+        return Response({
+            "workers": workers,
+            "slots": sum(info["slots"] for info in workers.values()),
+            "busy": sum(info["busy"] for info in workers.values()),
+            "queued": queued,
+        })
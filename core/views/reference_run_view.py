@@ -0,0 +1,152 @@
+# core/views/reference_run_view.py
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import parsers, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models.challenge_model import Challenge
+from core.models.code_challenge import ReferenceRun
+from core.permissions import IsEmailVerified, IsTeacherUser
+from core.tasks import run_reference_solution
+
+
+_reference_run_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        "reference_run_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+        "status": openapi.Schema(type=openapi.TYPE_STRING, enum=["pending", "running", "done", "failed"]),
+        "mode":   openapi.Schema(type=openapi.TYPE_STRING, enum=["fill", "check"]),
+        "detail": openapi.Schema(type=openapi.TYPE_STRING, description="Why the run failed", nullable=True),
+        "suggested_time_limit_seconds": openapi.Schema(
+            type=openapi.TYPE_INTEGER, nullable=True,
+            description="JUDGE_REFERENCE_TIME_FACTOR times the slowest case, when every case ran",
+        ),
+        "time_limit_seconds": openapi.Schema(type=openapi.TYPE_INTEGER,
+                                             description="The challenge's current time limit"),
+        "results": openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    "test_case_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+                    "status":    openapi.Schema(type=openapi.TYPE_STRING,
+                                                description="'accepted' when the reference output is (now) "
+                                                            "the expected one"),
+                    "time_ms":   openapi.Schema(type=openapi.TYPE_NUMBER),
+                    "cpu_ms":    openapi.Schema(type=openapi.TYPE_NUMBER, nullable=True),
+                    "memory_mb": openapi.Schema(type=openapi.TYPE_NUMBER, nullable=True),
+                    "message":   openapi.Schema(type=openapi.TYPE_STRING, nullable=True,
+                                                description="The checker's note, or the end of stderr"),
+                },
+            ),
+        ),
+    },
+)
+
+
+def _describe(reference_run):
+    return {
+        "reference_run_id": reference_run.id,
+        "status": reference_run.status,
+        "mode": reference_run.mode,
+        "detail": reference_run.detail or None,
+        "suggested_time_limit_seconds": reference_run.suggested_time_limit_seconds,
+        "time_limit_seconds": reference_run.config.time_limit_seconds,
+        "results": reference_run.results,
+    }
+
+
+class ReferenceRunCreateView(APIView):
+    """POST /platform/challenges/<slug>/reference-run/ — run the reference solution over all test cases."""
+    permission_classes = [IsAuthenticated, IsTeacherUser, IsEmailVerified]
+    parser_classes = [parsers.JSONParser]
+
+    @swagger_auto_schema(
+        tags=["Challenge"],
+        operation_summary="Run the hidden reference solution against every test case",
+        operation_description=(
+            "Queues a run of the challenge's `solution_hidden` over all of its test cases on the judge "
+            "workers, in parallel. `mode`:\n\n"
+            "- `fill` — every case the reference solution runs to completion gets its output as "
+            "`expected_stdout`\n"
+            "- `check` (default) — stored expected outputs are checked with the challenge's checker; "
+            "`wrong_answer` cases are those where they disagree\n\n"
+            "The reference wall time and peak memory are stored on every test case. With "
+            "`set_time_limit`, the challenge's time limit becomes the suggested one "
+            "(JUDGE_REFERENCE_TIME_FACTOR times the slowest case, in whole seconds) when every case ran.\n\n"
+            "Answers `202` at once; poll `GET /reference-runs/<id>/`. Only the challenge owner can run it."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                "mode": openapi.Schema(type=openapi.TYPE_STRING, enum=["fill", "check"], default="check"),
+                "set_time_limit": openapi.Schema(type=openapi.TYPE_BOOLEAN, default=False),
+            },
+        ),
+        responses={
+            202: openapi.Response(description="Queued", examples={
+                "application/json": {"reference_run_id": 7, "status": "pending"},
+            }),
+            400: openapi.Response(description="Not a code challenge, no reference solution or no test cases"),
+            403: openapi.Response(description="Not the owner of the challenge"),
+            404: openapi.Response(description="Challenge not found"),
+        },
+    )
+    def post(self, request, slug):
+        challenge = get_object_or_404(
+            Challenge.objects.select_related("topic__owner", "code_config"), slug=slug,
+        )
+        if challenge.topic.owner != request.user:
+            raise PermissionDenied("You do not own this challenge.")
+
+        config = getattr(challenge, "code_config", None) if challenge.challenge_type == "code" else None
+        if config is None:
+            return Response({"detail": "Code config not set for this challenge."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not config.solution_hidden.strip():
+            return Response({"detail": "This challenge has no reference solution."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not config.test_cases.exists():
+            return Response({"detail": "No test cases configured for this challenge."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        mode = request.data.get("mode", "check")
+        if mode not in dict(ReferenceRun.MODE_CHOICES):
+            return Response({"mode": "Must be 'fill' or 'check'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        reference_run = ReferenceRun.objects.create(
+            config=config,
+            created_by=request.user,
+            mode=mode,
+            set_time_limit=str(request.data.get("set_time_limit", False)).lower() in ("true", "1"),
+        )
+        transaction.on_commit(lambda: run_reference_solution.delay(reference_run.id))
+
+        return Response({"reference_run_id": reference_run.id, "status": "pending"},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class ReferenceRunStatusView(APIView):
+    """GET /platform/reference-runs/<id>/ — the state and per-test-case results of a reference run."""
+    permission_classes = [IsAuthenticated, IsTeacherUser, IsEmailVerified]
+
+    @swagger_auto_schema(
+        tags=["Challenge"],
+        operation_summary="Get a reference solution run",
+        responses={
+            200: openapi.Response(description="Current state of the run", schema=_reference_run_schema),
+            404: openapi.Response(description="Not found, or not a run of your challenge"),
+        },
+    )
+    def get(self, request, reference_run_id):
+        reference_run = get_object_or_404(
+            ReferenceRun.objects.select_related("config"),
+            id=reference_run_id,
+            config__challenge__topic__owner=request.user,
+        )
+        return Response(_describe(reference_run))
@@ -0,0 +1,108 @@
+# core/views/rejudge_view.py
+from django.shortcuts import get_object_or_404
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import parsers, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.models.challenge_model import Challenge
+from core.models.code_challenge import Rejudge
+from core.permissions import IsEmailVerified, IsTeacherUser
+from core.utils.rejudge import queue_rejudge
+
+
+_rejudge_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        "rejudge_id": openapi.Schema(type=openapi.TYPE_INTEGER),
+        "status":     openapi.Schema(type=openapi.TYPE_STRING, enum=["pending", "running", "done"]),
+        "full":       openapi.Schema(type=openapi.TYPE_BOOLEAN,
+                                     description="Every test case runs again, not only the changed ones"),
+        "total":      openapi.Schema(type=openapi.TYPE_INTEGER, description="Submissions to re-judge"),
+        "processed":  openapi.Schema(type=openapi.TYPE_INTEGER, description="Submissions re-judged so far"),
+        "changed":    openapi.Schema(type=openapi.TYPE_INTEGER,
+                                     description="Submissions that now pass or now fail"),
+        "errors":     openapi.Schema(type=openapi.TYPE_INTEGER,
+                                     description="Submissions that could not be re-judged (left as they were)"),
+        "finished_at": openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME, nullable=True),
+    },
+)
+
+
+def _describe(rejudge):
+    return {
+        "rejudge_id": rejudge.id,
+        "status": rejudge.status,
+        "full": rejudge.full,
+        "total": rejudge.total,
+        "processed": rejudge.processed,
+        "changed": rejudge.changed,
+        "errors": rejudge.errors,
+        "finished_at": rejudge.finished_at,
+    }
+
+
+class RejudgeCreateView(APIView):
+    """POST /platform/challenges/<slug>/rejudge/ — re-judge the latest submissions to a code challenge."""
+    permission_classes = [IsAuthenticated, IsTeacherUser, IsEmailVerified]
+    parser_classes = [parsers.JSONParser]
+
+    @swagger_auto_schema(
+        tags=["Challenge"],
+        operation_summary="Re-judge the latest submissions to a code challenge",
+        operation_description=(
+            "Every student's latest graded submission is judged again in the background and its score, "
+            "certificate and LTI grade updated. Without `full`, only the test cases a submission has no "
+            "result for run (those added or edited since it was graded). Editing test cases, limits or "
+            "the checker through the update endpoint starts a re-judge on its own; its id is returned "
+            "there as `rejudge_id`.\n\nPoll `GET /rejudges/<id>/` for the progress."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={"full": openapi.Schema(type=openapi.TYPE_BOOLEAN, default=False)},
+        ),
+        responses={
+            202: openapi.Response(description="Queued", examples={
+                "application/json": {"rejudge_id": 3, "status": "pending"},
+            }),
+            400: openapi.Response(description="Not a code challenge"),
+            403: openapi.Response(description="Not the owner of the challenge"),
+            404: openapi.Response(description="Challenge not found"),
+        },
+    )
+    def post(self, request, slug):
+        challenge = get_object_or_404(
+            Challenge.objects.select_related("topic__owner", "code_config"), slug=slug,
+        )
+        if challenge.topic.owner != request.user:
+            raise PermissionDenied("You do not own this challenge.")
+        config = getattr(challenge, "code_config", None) if challenge.challenge_type == "code" else None
+        if config is None:
+            return Response({"detail": "Code config not set for this challenge."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        full = str(request.data.get("full", False)).lower() in ("true", "1")
+        rejudge = queue_rejudge(config, full=full)
+        return Response({"rejudge_id": rejudge.id, "status": "pending"}, status=status.HTTP_202_ACCEPTED)
+
+
+class RejudgeStatusView(APIView):
+    """GET /platform/rejudges/<id>/ — the progress of a re-judge."""
+    permission_classes = [IsAuthenticated, IsTeacherUser, IsEmailVerified]
+
+    @swagger_auto_schema(
+        tags=["Challenge"],
+        operation_summary="Get the progress of a re-judge",
+        responses={
+            200: openapi.Response(description="Progress of the re-judge", schema=_rejudge_schema),
+            404: openapi.Response(description="Not found, or not a re-judge of your challenge"),
+        },
+    )
+    def get(self, request, rejudge_id):
+        rejudge = get_object_or_404(
+            Rejudge.objects.all(), id=rejudge_id, config__challenge__topic__owner=request.user,
+        )
+        return Response(_describe(rejudge))
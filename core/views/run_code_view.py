@@ -1,4 +1,12 @@
 # core/views/run_code_view.py
+from dataclasses import dataclass
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, parsers
@@ -8,8 +16,16 @@ from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from core.execution.executor import run_code_challenge
+from core.execution.async_executor import run_code_challenge_async
 from core.models.challenge_model import Challenge
+from core.models.code_challenge import CodeChallengeConfig
+from core.utils import cpu_usage
+from core.utils.admission import admit_run, admit_run_async
+from core.utils.grading import execution_options, output_checker, run_tests
+from core.utils.judge_metrics import record_phases
+from core.utils.run_cache import get_results, run_key, store_results
+from core.utils.single_flight import run_once, run_once_async
+from core.utils.test_data import localize, preview
 
 
 class RunCodeView(APIView):
@@ -81,6 +97,10 @@ class RunCodeView(APIView):
                             type=openapi.TYPE_BOOLEAN,
                             description="Always true — indicates this was a dry-run, not a graded submission",
                         ),
+                        "cached":  openapi.Schema(
+                            type=openapi.TYPE_BOOLEAN,
+                            description="True when the same code was already run against the same tests and the results were reused",
+                        ),
                         "passed":  openapi.Schema(type=openapi.TYPE_INTEGER, description="Number of public tests passed"),
                         "total":   openapi.Schema(type=openapi.TYPE_INTEGER, description="Total number of public tests"),
                         "results": openapi.Schema(
@@ -94,16 +114,21 @@ class RunCodeView(APIView):
                                     "got":          openapi.Schema(type=openapi.TYPE_STRING, description="Your program's actual output"),
                                     "status":       openapi.Schema(
                                         type=openapi.TYPE_STRING,
-                                        enum=["accepted", "wrong_answer", "time_limit", "memory_limit", "runtime_error", "compilation_error"],
+                                        enum=["accepted", "wrong_answer", "time_limit", "memory_limit", "output_limit", "runtime_error", "compilation_error"],
                                     ),
                                     "time_ms": openapi.Schema(type=openapi.TYPE_NUMBER),
+                                    "cpu_ms":  openapi.Schema(type=openapi.TYPE_NUMBER, nullable=True, description="CPU time in milliseconds"),
+                                    "memory_mb": openapi.Schema(type=openapi.TYPE_NUMBER, nullable=True, description="Peak memory in MB"),
                                     "stderr":  openapi.Schema(type=openapi.TYPE_STRING, nullable=True),
+                                    "message": openapi.Schema(type=openapi.TYPE_STRING, nullable=True,
+                                                              description="Where a wrong answer first differs from the expected output"),
                                 },
                             ),
                         ),
                     },
                     example={
                         "run_only": True,
+                        "cached": False,
                         "passed": 1,
                         "total": 1,
                         "results": [
@@ -114,7 +139,10 @@ class RunCodeView(APIView):
                                 "got": "8",
                                 "status": "accepted",
                                 "time_ms": 31.2,
+                                "cpu_ms": 24.8,
+                                "memory_mb": 9.4,
                                 "stderr": "",
+                                "message": None,
                             }
                         ],
                     },
@@ -124,11 +152,33 @@ class RunCodeView(APIView):
             401: openapi.Response(description="Not authenticated"),
             403: openapi.Response(description="Email not verified"),
             404: openapi.Response(description="Challenge not found or no public test cases configured"),
+            429: openapi.Response(description="Code runners are busy, or your CPU quota is used up; retry after "
+                                              "the `Retry-After` header's seconds"),
         },
     )
     def post(self, request, slug):
+        run = self.prepare(request, slug)
+        if isinstance(run, Response):
+            return run
+        if not run.cached:
+            # Past a CPU quota: refused, or behind other users' runs (see core.utils.cpu_usage)
+            rounds_behind = cpu_usage.admission_rounds(request.user.id, run.course_id)
+
+            def execute():
+                with admit_run(request.user.id, rounds_behind):
+                    results = run_tests(run.code, run.language, run.test_cases, run.config)
+                record_phases(run.language, results)
+                cpu_usage.record(request.user.id, run.course_id, "run", cpu_usage.cpu_ms(results))
+                return results
+
+            # Identical runs already going (double clicks, retries) share one execution
+            run.results = run_once(run.cache_key, execute)
+        return self.respond(run)
+
+    def prepare(self, request, slug):
+        """The DryRun asked for, with its results when cached, or an error Response."""
         challenge = get_object_or_404(
-            Challenge.objects.select_related("code_config"),
+            Challenge.objects.select_related("code_config", "topic"),
             slug=slug,
         )
 
@@ -153,7 +203,7 @@ class RunCodeView(APIView):
             )
 
         # Only public test cases — student can see all input/output details
-        public_test_cases = list(config.test_cases.filter(is_public=True))
+        public_test_cases = localize(list(config.test_cases.filter(is_public=True)))
         if not public_test_cases:
             return Response(
                 {"detail": "No public test cases configured for this challenge."},
@@ -162,18 +212,25 @@ class RunCodeView(APIView):
 
         language = request.data.get("language", config.language)
 
-        results = run_code_challenge(
-            code,
-            language,
-            public_test_cases,
-            time_limit_s=config.time_limit_seconds,
-            memory_mb=config.memory_limit_mb,
-        )
+        # Pressing Run again on unchanged code: answer from the cache, no execution
+        cache_key = run_key(code, language, config)
+        results = get_results(cache_key)
+        if results is not None and [r.test_case_id for r in results] != [tc.id for tc in public_test_cases]:
+            results = None  # test cases changed without going through the update view
+        return DryRun(config, challenge.topic.course_id, code, language, public_test_cases, cache_key,
+                      results, results is not None)
 
+    def respond(self, run):
+        if not run.cached:
+            store_results(run.cache_key, run.results)
+
+        results = run.results
+        public_test_cases = run.test_cases
         passed = sum(1 for r in results if r.status == "accepted")
 
         return Response({
             "run_only": True,
+            "cached": run.cached,
             "passed": passed,
             "total": len(results),
             "results": [
@@ -182,16 +239,90 @@ class RunCodeView(APIView):
                         tc.description for tc in public_test_cases if tc.id == r.test_case_id
                     ),
                     "stdin":    next(
-                        tc.stdin for tc in public_test_cases if tc.id == r.test_case_id
+                        preview(tc, "stdin") for tc in public_test_cases if tc.id == r.test_case_id
                     ),
                     "expected": next(
-                        tc.expected_stdout for tc in public_test_cases if tc.id == r.test_case_id
+                        preview(tc, "expected_stdout") for tc in public_test_cases if tc.id == r.test_case_id
                     ),
                     "got":      r.stdout,
                     "status":   r.status,
                     "time_ms":  r.time_ms,
+                    "cpu_ms":   r.cpu_ms,
+                    "memory_mb": r.memory_mb,
                     "stderr":   r.stderr or None,
+                    "message":  r.message,
                 }
                 for r in results
             ],
         }, status=status.HTTP_200_OK)
+
+
+@dataclass
+class DryRun:
+    """One /run/ request: what to run and, once run (or found cached), its results."""
+    config:     CodeChallengeConfig
+    course_id:  int
+    code:       str
+    language:   str
+    test_cases: list
+    cache_key:  str
+    results:    Optional[list]
+    cached:     bool
+
+    def options(self) -> dict:
+        return {
+            "time_limit_s": self.config.time_limit_seconds,
+            "memory_mb": self.config.memory_limit_mb,
+            "harness": self.config.execution_mode == "harness",
+            "sql_schema": self.config.sql_schema,
+            "checker": output_checker(self.config),
+            **execution_options(),
+        }
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class RunCodeAsyncView(View):
+    """
+    The /run/ endpoint as an async view, for ASGI servers (see JUDGE_ASYNC_RUNS).
+
+    Authentication, validation, the result cache and the response are
+    RunCodeView's, run in a thread (they use the ORM); the run itself is
+    awaited on the event loop (see async_executor), so a worker holds many
+    concurrent runs without a thread each.
+    """
+    async def post(self, request, slug):
+        view = RunCodeView(args=(), kwargs={"slug": slug})
+        drf_request = view.request = view.initialize_request(request, slug=slug)
+        view.headers = view.default_response_headers
+        try:
+            run = await sync_to_async(self.prepare)(view, drf_request, slug)
+            if isinstance(run, Response):
+                response = run
+            else:
+                if not run.cached:
+                    run.results = await run_once_async(run.cache_key, lambda: self.execute(drf_request, run))
+                response = await sync_to_async(view.respond)(run)
+        except Exception as exc:
+            response = view.handle_exception(exc)
+        response = view.finalize_response(drf_request, response, slug=slug)
+        return response.render()
+
+    @staticmethod
+    def prepare(view, request, slug):
+        view.initial(request, slug=slug)  # authentication and permissions
+        return view.prepare(request, slug)
+
+    @staticmethod
+    async def execute(request, run):
+        options = await sync_to_async(run.options)()
+        rounds_behind = await sync_to_async(cpu_usage.admission_rounds)(request.user.id, run.course_id)
+        async with admit_run_async(request.user.id, rounds_behind):
+            if settings.JUDGE_FLEET_ENABLED:
+                # Waiting on the fleet is a blocking Redis call: off the event loop
+                results = await sync_to_async(run_tests, thread_sensitive=False)(
+                    run.code, run.language, run.test_cases, run.config)
+            else:
+                results = await run_code_challenge_async(run.code, run.language, run.test_cases, **options)
+        await sync_to_async(record_phases)(run.language, results)
+        await sync_to_async(cpu_usage.record)(request.user.id, run.course_id, "run", cpu_usage.cpu_ms(results))
+        return results
@@ -11,7 +11,7 @@ _test_result_schema = openapi.Schema(
     properties={
         "status": openapi.Schema(
             type=openapi.TYPE_STRING,
-            enum=["accepted", "wrong_answer", "time_limit", "memory_limit", "runtime_error", "compilation_error"],
+            enum=["accepted", "wrong_answer", "time_limit", "memory_limit", "output_limit", "runtime_error", "compilation_error"],
             description="Result of this test case",
         ),
         "time_ms": openapi.Schema(type=openapi.TYPE_NUMBER, description="Execution time in milliseconds"),
@@ -1,20 +1,28 @@
 # core/views/submission_view.py
+from datetime import timedelta
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, parsers
+from rest_framework.exceptions import Throttled
 from rest_framework.permissions import IsAuthenticated
 from core.permissions import IsEmailVerified
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.db import transaction
 from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
-from core.execution.executor import run_code_challenge
+from core.execution.executor import LANGUAGE_CONFIG
+from core.models.certificate_model import Certificate
 from core.models.challenge_model import Challenge
 from core.models.challenge_option import ChallengeOption
-from core.models.code_challenge import CodeSubmissionResult
 from core.models.submission_model import Submission
+from core.tasks import judge_submission
+from core.utils import cpu_usage
 from core.utils.completion import check_and_issue_certificate
+from core.utils.grading import trigger_grade_passback
 
 
 def _ensure_enrolled(user, course):
@@ -24,20 +32,6 @@ def _ensure_enrolled(user, course):
         CourseEnrollment.objects.get_or_create(course=course, student=user)
 
 
-def _trigger_grade_passback(user, course, score_0_to_1: float):
-    """Fire LTI grade passback if the user has an active LTI session for this course."""
-    try:
-        from lti.models import LTISession
-        from lti.tasks import send_grade_to_platform
-        session = LTISession.objects.filter(
-            user=user,
-            resource_mapping__course=course,
-        ).order_by("-created_at").first()
-        if session:
-            send_grade_to_platform.delay(str(session.id), score_0_to_1)
-    except Exception:
-        pass  # never let grade passback break the submission response
-
 # ── Reusable response schemas ────────────────────────────────────────────────
 
 _quiz_text_response = openapi.Schema(
@@ -54,12 +48,23 @@ _test_result_schema = openapi.Schema(
     properties={
         "status":   openapi.Schema(
             type=openapi.TYPE_STRING,
-            enum=["accepted", "wrong_answer", "time_limit", "memory_limit", "runtime_error", "compilation_error"],
-            description="Result of this test case",
+            enum=["accepted", "wrong_answer", "time_limit", "memory_limit", "output_limit", "runtime_error",
+                  "compilation_error", "skipped"],
+            description="Result of this test case. 'skipped': not run, an earlier test case failed (fail_fast)",
         ),
         "time_ms":  openapi.Schema(type=openapi.TYPE_NUMBER,  description="Execution time in milliseconds"),
+        "cpu_ms":   openapi.Schema(type=openapi.TYPE_NUMBER,  description="CPU time in milliseconds", nullable=True),
+        "memory_mb": openapi.Schema(type=openapi.TYPE_NUMBER, description="Peak memory in MB", nullable=True),
         "stdout":   openapi.Schema(type=openapi.TYPE_STRING,  description="Program output (null for hidden test cases)", nullable=True),
         "stderr":   openapi.Schema(type=openapi.TYPE_STRING,  description="Error output (null for hidden test cases)", nullable=True),
+        "message":  openapi.Schema(type=openapi.TYPE_STRING,
+                                   description="Where a wrong answer first differs from the expected output "
+                                               "(null for hidden test cases)", nullable=True),
+        "perf_time_ms":   openapi.Schema(type=openapi.TYPE_NUMBER, nullable=True,
+                                         description="Performance-graded challenges: trimmed mean of the timed "
+                                                     "runs, in ms (null when not timed)"),
+        "perf_noise_pct": openapi.Schema(type=openapi.TYPE_NUMBER, nullable=True,
+                                         description="Spread of the timed runs, % of their median"),
     },
     required=["status", "time_ms"],
 )
@@ -70,12 +75,15 @@ _code_response = openapi.Schema(
         "submission_id": openapi.Schema(type=openapi.TYPE_INTEGER, description="ID of the saved submission"),
         "status":        openapi.Schema(
             type=openapi.TYPE_STRING,
-            enum=["accepted", "wrong_answer"],
-            description="'accepted' only when ALL test cases pass",
+            enum=["pending", "accepted", "wrong_answer", "rejected"],
+            description="'pending' while the judge is running; 'accepted' only when ALL test cases pass",
         ),
         "score":   openapi.Schema(type=openapi.TYPE_INTEGER, description="Points earned based on passed test weights"),
         "passed":  openapi.Schema(type=openapi.TYPE_INTEGER, description="Number of test cases passed"),
         "total":   openapi.Schema(type=openapi.TYPE_INTEGER, description="Total number of test cases"),
+        "feedback": openapi.Schema(type=openapi.TYPE_STRING,
+                                   description="Summary of the grading, with the runtime points on "
+                                               "performance-graded challenges"),
         "results": openapi.Schema(
             type=openapi.TYPE_ARRAY,
             items=_test_result_schema,
@@ -100,8 +108,9 @@ class SubmitChallengeView(APIView):
     { "answer": "photosynthesis" }
     ```
 
-    **code** — student submits source code. The server runs it against every
-    test case in a sandboxed process and returns per-test results:
+    **code** — student submits source code. The submission is queued for the
+    judge workers and its id is returned at once; poll
+    `/submissions/<id>/` for the per-test results:
     ```json
     { "code": "def solution(n):\\n    return n * 2", "language": "python" }
     ```
@@ -121,9 +130,13 @@ class SubmitChallengeView(APIView):
             "The `language` field is optional for code challenges — it defaults to the "
             "language configured on the challenge. Supported values: "
             "`python`, `javascript`, `java`, `cpp`.\n\n"
-            "For code challenges the server executes the code against every test case "
-            "in an isolated sandbox. Public test cases show their stdout/stderr in the "
-            "response; hidden test cases return `null` for those fields."
+            "For code challenges the submission is queued for the judge workers, which "
+            "execute the code against every test case in an isolated sandbox. The endpoint "
+            "answers `202` with the `pending` submission id at once; poll "
+            "`GET /submissions/<submission_id>/` for the result. Public test cases show their "
+            "stdout/stderr there; hidden test cases return `null` for those fields.\n\n"
+            "Near or past a CPU quota the submission is judged later: `judged_in_s` says when. "
+            "Past it, a second submission while one is pending answers `429`."
         ),
         manual_parameters=[
             openapi.Parameter(
@@ -178,36 +191,25 @@ class SubmitChallengeView(APIView):
         ),
         responses={
             200: openapi.Response(
-                description=(
-                    "**quiz / text:** `{ correct, score }`\n\n"
-                    "**code:** `{ submission_id, status, score, passed, total, results[] }`"
-                ),
-                schema=openapi.Schema(
-                    type=openapi.TYPE_OBJECT,
-                    description="Shape depends on challenge_type (see above)",
-                ),
+                description="**quiz / text:** `{ correct, score }`",
+                schema=_quiz_text_response,
                 examples={
                     "application/json (quiz/text)": {
                         "correct": True,
                         "score": 10,
                     },
-                    "application/json (code)": {
-                        "submission_id": 42,
-                        "status": "accepted",
-                        "score": 30,
-                        "passed": 3,
-                        "total": 3,
-                        "results": [
-                            {"status": "accepted",     "time_ms": 12.4, "stdout": "4",  "stderr": ""},
-                            {"status": "accepted",     "time_ms": 9.1,  "stdout": None, "stderr": None},
-                            {"status": "wrong_answer", "time_ms": 8.7,  "stdout": None, "stderr": None},
-                        ],
-                    },
+                },
+            ),
+            202: openapi.Response(
+                description="**code:** `{ submission_id, status: \"pending\" }` — grading was queued",
+                examples={
+                    "application/json": {"submission_id": 42, "status": "pending"},
                 },
             ),
             400: openapi.Response(description="Missing required field for the challenge type"),
             401: openapi.Response(description="Not authenticated"),
             404: openapi.Response(description="Challenge / option / correct answer not found"),
+            429: openapi.Response(description="**code:** CPU quota used up and a submission is still pending"),
         },
     )
     def post(self, request, slug):
@@ -297,7 +299,7 @@ class SubmitChallengeView(APIView):
         )
         cert, score_changed = check_and_issue_certificate(request.user, challenge.topic.course) if is_correct else (None, False)
         if cert and score_changed:
-            _trigger_grade_passback(request.user, challenge.topic.course, cert.score_pct / 100)
+            trigger_grade_passback(request.user, challenge.topic.course, cert.score_pct / 100)
         return Response({"correct": is_correct, "score": earned, "certificate_issued": cert is not None})
 
     # ── Text match ──────────────────────────────────────────────────────────
@@ -339,7 +341,7 @@ class SubmitChallengeView(APIView):
         )
         cert, score_changed = check_and_issue_certificate(request.user, challenge.topic.course) if is_correct else (None, False)
         if cert and score_changed:
-            _trigger_grade_passback(request.user, challenge.topic.course, cert.score_pct / 100)
+            trigger_grade_passback(request.user, challenge.topic.course, cert.score_pct / 100)
         return Response({"correct": is_correct, "score": earned, "certificate_issued": cert is not None})
 
     # ── Code execution ──────────────────────────────────────────────────────
@@ -367,70 +369,119 @@ class SubmitChallengeView(APIView):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        if language not in LANGUAGE_CONFIG:
+            return Response(
+                {"detail": f"Unsupported language: {language}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        # Past a CPU quota submissions are judged later, one waiting at a time (see core.utils.cpu_usage).
+        # One pending for longer than a window is stuck rather than waiting, and does not count
+        verdict = cpu_usage.check(request.user.id, challenge.topic.course_id)
+        if verdict.state == "over" and Submission.objects.filter(
+            user=request.user, challenge__code_config__isnull=False, status="pending",
+            created_at__gte=timezone.now() - timedelta(seconds=settings.JUDGE_USAGE_WINDOW_S),
+        ).exists():
+            raise Throttled(wait=verdict.retry_after_s,
+                            detail="CPU quota used up: wait for your pending submission to be judged.")
+        delay = cpu_usage.judge_delay(verdict)
+
         submission = Submission.objects.create(
             user=request.user,
             challenge=challenge,
             attempt_no=self._next_attempt_no(request.user, challenge),
             answer_text=code,
+            language=language,
             status="pending",
+            hint_used=bool(request.data.get("hint_used", False)),
         )
 
-        results = run_code_challenge(
-            code,
-            language,
-            test_cases,
-            time_limit_s=config.time_limit_seconds,
-            memory_mb=config.memory_limit_mb,
+        # Grading happens on the judge queue; enqueue only once the row is visible to workers
+        transaction.on_commit(
+            lambda: judge_submission.apply_async((submission.id, language), countdown=delay or None)
         )
 
-        total_weight = sum(tc.weight for tc in test_cases)
-        earned_weight = 0
-        passed = 0
-
-        for r in results:
-            CodeSubmissionResult.objects.create(
-                submission=submission,
-                test_case_id=r.test_case_id,
-                status=r.status,
-                stdout=r.stdout,
-                stderr=r.stderr,
-                execution_time_ms=r.time_ms,
-            )
-            if r.status == "accepted":
-                passed += 1
-                tc = next(tc for tc in test_cases if tc.id == r.test_case_id)
-                earned_weight += tc.weight
+        data = {"submission_id": submission.id, "status": "pending"}
+        if delay:
+            data["judged_in_s"] = delay
+        return Response(data, status=status.HTTP_202_ACCEPTED)
 
-        hint_used = bool(request.data.get("hint_used", False))
-        all_passed = passed == len(results)
-        score = round((earned_weight / total_weight) * challenge.points) if total_weight else 0
-        if hint_used and all_passed:
-            score = round(score * 0.5)
-
-        submission.status = "passed" if all_passed else "failed"
-        submission.score = score
-        submission.hint_used = hint_used
-        submission.feedback = f"{passed}/{len(results)} test cases passed."
-        submission.graded_at = timezone.now()
-        submission.save()
-
-        cert, score_changed = check_and_issue_certificate(request.user, challenge.topic.course) if all_passed else (None, False)
-        if cert and score_changed:
-            _trigger_grade_passback(request.user, challenge.topic.course, cert.score_pct / 100)
+
+class SubmissionStatusView(APIView):
+    """
+    Poll the grading state of a code submission.
+    Returns only `pending` while the judge is still running; once graded, the
+    full per-test-case breakdown is included.
+    """
+    permission_classes = [IsAuthenticated, IsEmailVerified]
+
+    @swagger_auto_schema(
+        tags=["Challenge"],
+        operation_summary="Get the grading status of a code submission",
+        operation_description=(
+            "Code submissions are graded asynchronously. After `POST /challenges/<slug>/submit/` "
+            "returns `202` with a `submission_id`, poll this endpoint until `status` is no longer "
+            "`pending`.\n\n"
+            "Only the author of the submission can read it."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                "submission_id", openapi.IN_PATH,
+                type=openapi.TYPE_INTEGER,
+                description="Submission ID returned by the submit endpoint",
+                required=True,
+            ),
+        ],
+        responses={
+            200: openapi.Response(description="Current grading state", schema=_code_response),
+            401: openapi.Response(description="Not authenticated"),
+            404: openapi.Response(description="Submission not found"),
+        },
+    )
+    def get(self, request, submission_id):
+        submission = get_object_or_404(
+            Submission.objects.select_related("challenge__topic__course"),
+            id=submission_id,
+            user=request.user,
+        )
+
+        if submission.status == "pending":
+            return Response({"submission_id": submission.id, "status": "pending"})
+
+        if submission.status == "rejected":
+            return Response({
+                "submission_id": submission.id,
+                "status": "rejected",
+                "detail": submission.feedback,
+            })
+
+        results = list(
+            submission.test_results.select_related("test_case").order_by("test_case_id")
+        )
+        passed = sum(1 for r in results if r.status == "accepted")
+        all_passed = submission.status == "passed"
 
         return Response({
             "submission_id": submission.id,
             "status": "accepted" if all_passed else "wrong_answer",
-            "score": score,
+            "score": submission.score,
             "passed": passed,
             "total": len(results),
-            "certificate_issued": cert is not None,
+            "feedback": submission.feedback,
+            "certificate_issued": all_passed and Certificate.objects.filter(
+                user=request.user, course=submission.challenge.topic.course,
+            ).exists(),
             "results": [
                 {
                     "status": r.status,
-                    "time_ms": r.time_ms,
-                    "stdout": r.stdout if r.is_public else None,
-                    "stderr": r.stderr if r.is_public else None,
+                    "time_ms": r.execution_time_ms,
+                    "cpu_ms": r.cpu_time_ms,
+                    "memory_mb": r.memory_used_mb,
+                    "stdout": r.stdout if r.test_case.is_public else None,
+                    "stderr": r.stderr if r.test_case.is_public else None,
+                    "message": (r.message or None) if r.test_case.is_public else None,
+                    "perf_time_ms": r.perf_time_ms,
+                    "perf_noise_pct": r.perf_noise_pct,
                 }
                 for r in results
             ],
@@ -8,6 +8,7 @@ from core.models.topic_model import Topic
 from core.models.challenge_model import Challenge
 from core.models.challenge_correct_answer import ChallengeCorrectAnswer
 from core.models.challenge_option import ChallengeOption
+from core.models.code_challenge import CodeChallengeConfig, CodeTestCase
 from core.models.submission_model import Submission
 
 
@@ -228,3 +229,37 @@ def challenge_with_solution(topic):
         case_sensitive=False,
     )
     return ch
+
+
+@pytest.fixture
+def code_challenge(topic):
+    ch = Challenge.objects.create(
+        topic=topic,
+        title="Code Challenge",
+        body="Read n from stdin and print n * 2",
+        points=30,
+        challenge_type="code",
+        difficulty="easy",
+    )
+    config = CodeChallengeConfig.objects.create(
+        challenge=ch,
+        language="python",
+        time_limit_seconds=2,
+        memory_limit_mb=256,
+    )
+    CodeTestCase.objects.create(config=config, stdin="2", expected_stdout="4", is_public=True)
+    CodeTestCase.objects.create(config=config, stdin="10", expected_stdout="20", is_public=False)
+    CodeTestCase.objects.create(config=config, stdin="-3", expected_stdout="-6", is_public=False)
+    return ch
+
+
+# ── Celery ────────────────────────────────────────────────────────────────────
+
+@pytest.fixture
+def celery_eager():
+    """Run Celery tasks inline instead of sending them to the broker."""
+    from config.celery import app
+    # Namespaced key: it shadows the plain `task_always_eager` setting
+    app.conf.CELERY_TASK_ALWAYS_EAGER = True
+    yield
+    app.conf.CELERY_TASK_ALWAYS_EAGER = False
@@ -0,0 +1,1326 @@
+"""Tests for code challenge execution: submission queue and grading."""
+import asyncio
+import dataclasses
+import io
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+import redis
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.execution.checkers import get_checker
+from core.execution.compile_cache import CompileCache
+from core.execution import executor, timing
+from core.execution.async_executor import run_code_challenge_async
+from core.execution.executor import run_code_challenge
+from core.execution.sandbox import CgroupSandbox, RlimitSandbox, get_sandbox
+from core.models.certificate_model import Certificate
+from core.models.code_challenge import CodeSubmissionResult, CodeTestCase, ReferenceRun, Rejudge
+from core.models.usage_model import CpuQuota, CpuUsage
+from core.utils import (admission, cpu_usage, grading, judge_fleet, judge_metrics, redis_client, run_cache,
+                        single_flight, test_data)
+from core.models.submission_model import Submission
+from core.views.run_code_view import RunCodeAsyncView
+
+
+CORRECT_CODE = "import sys\nprint(int(sys.stdin.read().strip()) * 2)"
+WRONG_CODE = "import sys\nprint(int(sys.stdin.read().strip()) + 2)"
+
+
+@pytest.mark.django_db
+class TestSubmitCode:
+    def url(self, slug):
+        return f"/api/platform/challenges/{slug}/submit/"
+
+    def status_url(self, submission_id):
+        return f"/api/platform/submissions/{submission_id}/"
+
+    def submit(self, client, challenge, code, capture, **extra):
+        with capture(execute=True):
+            return client.post(self.url(challenge.slug), {
+                "code": code, **extra,
+            }, format="json")
+
+    def test_submit_returns_pending_submission(
+        self, student_client, code_challenge, django_capture_on_commit_callbacks
+    ):
+        # Without an eager broker the task is only enqueued, never run
+        with django_capture_on_commit_callbacks(execute=False):
+            res = student_client.post(self.url(code_challenge.slug), {
+                "code": CORRECT_CODE,
+            }, format="json")
+        assert res.status_code == 202
+        assert res.data["status"] == "pending"
+        submission = Submission.objects.get(id=res.data["submission_id"])
+        assert submission.status == "pending"
+
+    def test_correct_code_is_graded(
+        self, student_client, code_challenge, celery_eager, django_capture_on_commit_callbacks
+    ):
+        res = self.submit(student_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        assert res.status_code == 202
+
+        res = student_client.get(self.status_url(res.data["submission_id"]))
+        assert res.status_code == 200
+        assert res.data["status"] == "accepted"
+        assert res.data["score"] == code_challenge.points
+        assert res.data["passed"] == res.data["total"] == 3
+        assert all(r["memory_mb"] > 0 for r in res.data["results"])
+        timings = CodeSubmissionResult.objects.first().phase_timings
+        assert set(timings) == set(executor.PHASES)
+        assert timings["wall"] > 0 and timings["spawn"] is not None
+
+    def test_hidden_output_is_not_exposed(
+        self, student_client, code_challenge, celery_eager, django_capture_on_commit_callbacks
+    ):
+        res = self.submit(student_client, code_challenge, WRONG_CODE, django_capture_on_commit_callbacks)
+        res = student_client.get(self.status_url(res.data["submission_id"]))
+        assert res.data["status"] == "wrong_answer"
+        assert res.data["results"][0]["stdout"] == "4"
+        assert all(r["stdout"] is None for r in res.data["results"][1:])
+        assert CodeSubmissionResult.objects.filter(status="wrong_answer").count() == 2
+
+    def test_fail_fast_skips_cases_after_first_failure(
+        self, student_client, code_challenge, celery_eager, django_capture_on_commit_callbacks, settings
+    ):
+        settings.JUDGE_PARALLEL_TESTS, settings.JUDGE_MAX_PARALLEL_TESTS = True, 4
+        config = code_challenge.code_config
+        config.partial_credit, config.fail_fast = False, True
+        config.save()
+        res = self.submit(student_client, code_challenge, WRONG_CODE, django_capture_on_commit_callbacks)
+        res = student_client.get(self.status_url(res.data["submission_id"]))
+        assert [r["status"] for r in res.data["results"]] == ["accepted", "wrong_answer", "skipped"]
+        assert res.data["score"] == 0
+
+    def test_judge_failure_rejects_the_submission(
+        self, student_client, code_challenge, celery_eager, django_capture_on_commit_callbacks, monkeypatch,
+    ):
+        def broken(*args, **kwargs):
+            raise OSError("sandbox unavailable")
+
+        monkeypatch.setattr(grading, "run_code_challenge", broken)
+        res = self.submit(student_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        res = student_client.get(self.status_url(res.data["submission_id"]))
+        assert res.data["status"] == "rejected"
+
+    def test_unsupported_language_returns_400(self, student_client, code_challenge):
+        res = student_client.post(self.url(code_challenge.slug), {
+            "code": CORRECT_CODE, "language": "cobol",
+        }, format="json")
+        assert res.status_code == 400
+        assert not Submission.objects.exists()
+
+    def test_status_hidden_from_other_users(
+        self, student_client, student2_client, code_challenge,
+        celery_eager, django_capture_on_commit_callbacks,
+    ):
+        res = self.submit(student_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        res = student2_client.get(self.status_url(res.data["submission_id"]))
+        assert res.status_code == 404
+
+
+def _redis_available():
+    try:
+        return redis.Redis.from_url(settings.REDIS_URL, socket_connect_timeout=0.2).ping()
+    except redis.RedisError:
+        return False
+
+
+@pytest.fixture
+def admission_settings(settings, monkeypatch):
+    """Admission control on keys of its own, Redis not marked down, no result cache."""
+    monkeypatch.setattr(redis_client, "_down_until", 0.0)
+    settings.JUDGE_NODE_NAME = f"test-{uuid.uuid4().hex}"
+    settings.JUDGE_ADMISSION_NODE_CAP = 1
+    settings.JUDGE_ADMISSION_MAX_WAIT_S = 0.3
+    settings.JUDGE_RUN_CACHE_TTL_S = 0
+    return settings
+
+
+def _clear_run_cache():
+    client = redis_client.get_redis()
+    keys = list(client.scan_iter(match=f"{run_cache._KEY_PREFIX}*"))
+    if keys:
+        client.delete(*keys)
+
+
+@pytest.fixture
+def run_cache_settings(admission_settings):
+    """
+    Result cache on and empty: the database reuses config ids across tests,
+    so entries left by an earlier test (for any test cases version) could be hits.
+    """
+    admission_settings.JUDGE_RUN_CACHE_TTL_S = 60
+    _clear_run_cache()
+    yield admission_settings
+    _clear_run_cache()
+
+
+@pytest.mark.django_db
+class TestRunCode:
+    def url(self, slug):
+        return f"/api/platform/challenges/{slug}/run/"
+
+    def run(self, client, challenge):
+        return client.post(self.url(challenge.slug), {"code": CORRECT_CODE}, format="json")
+
+    def test_runs_are_admitted_without_redis(self, student_client, code_challenge, admission_settings):
+        admission_settings.REDIS_URL = "redis://127.0.0.1:1/0"
+        res = self.run(student_client, code_challenge)
+        assert res.status_code == 200
+        assert res.data["passed"] == res.data["total"] == 1
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_busy_node_returns_429(self, student_client, code_challenge, admission_settings):
+        with admission.admit_run("someone-else"):
+            res = self.run(student_client, code_challenge)
+        assert res.status_code == 429
+        assert int(res["Retry-After"]) >= 1
+        assert self.run(student_client, code_challenge).status_code == 200
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_full_queue_returns_429(self, student_client, code_challenge, admission_settings):
+        admission_settings.JUDGE_ADMISSION_QUEUE_MAX = 0
+        res = self.run(student_client, code_challenge)
+        assert res.status_code == 429
+        assert "Retry-After" in res
+
+    def enqueue(self, client, members, rounds_behind=0):
+        running, queue = admission._keys()
+        for member in members:
+            user = member.split(":")[0]
+            admission._script("enqueue", client)(
+                keys=[running, queue],
+                args=[user, member, admission._now_ms(), 10, 60000, admission.ROUND, rounds_behind],
+                client=client,
+            )
+        return queue
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_queue_is_fair_across_users(self, admission_settings):
+        client = redis_client.get_redis()
+        queue = self.enqueue(client, ("a:1", "a:2", "b:1"))
+        try:
+            # b's first run goes before a's second one
+            assert client.zrange(queue, 0, -1) == [b"a:1", b"b:1", b"a:2"]
+        finally:
+            client.delete(*admission._keys())
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_slowed_user_queues_behind_others(self, admission_settings):
+        client = redis_client.get_redis()
+        self.enqueue(client, ("slow:1",), rounds_behind=2)
+        queue = self.enqueue(client, ("a:1", "a:2", "b:1"))
+        try:
+            # Two rounds behind: after everyone's first and second runs, though queued first
+            assert client.zrange(queue, 0, -1) == [b"a:1", b"b:1", b"a:2", b"slow:1"]
+        finally:
+            client.delete(*admission._keys())
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_repeat_run_is_served_from_cache(self, student_client, code_challenge, run_cache_settings, monkeypatch):
+        first = self.run(student_client, code_challenge)
+        monkeypatch.setattr("core.views.run_code_view.run_tests", None)  # must not run again
+        second = self.run(student_client, code_challenge)
+        assert (first.data["cached"], second.data["cached"]) == (False, True)
+        assert second.data["results"] == first.data["results"]
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_changing_test_cases_invalidates_cache(
+        self, student_client, teacher_client, code_challenge, run_cache_settings,
+    ):
+        self.run(student_client, code_challenge)
+        res = teacher_client.patch(f"/api/platform/challenges/{code_challenge.slug}/update/", {
+            "test_cases": [{"stdin": "5", "expected_stdout": "10", "is_public": True}],
+        }, format="json")
+        assert res.status_code == 200
+        res = self.run(student_client, code_challenge)
+        assert res.data["cached"] is False
+        assert res.data["results"][0]["stdin"] == "5"
+
+    def test_sql_challenge(self, student_client, teacher_client, code_challenge, admission_settings):
+        admission_settings.REDIS_URL = "redis://127.0.0.1:1/0"
+        url = f"/api/platform/challenges/{code_challenge.slug}/update/"
+        res = teacher_client.patch(url, {"code_language": "sql", "code_sql_schema": "CREATE TABLE t ("}, format="json")
+        assert res.status_code == 400
+        res = teacher_client.patch(url, {
+            "code_language": "sql", "code_sql_schema": "CREATE TABLE t (x INTEGER); INSERT INTO t VALUES (2);",
+            "test_cases": [{"stdin": "", "expected_stdout": "4", "is_public": True}],
+        }, format="json")
+        assert res.status_code == 200
+        res = student_client.post(self.url(code_challenge.slug), {"code": "SELECT x * 2 FROM t"}, format="json")
+        assert res.data["passed"] == res.data["total"] == 1
+
+    def test_async_view_matches_sync_view(self, student, student_client, code_challenge, admission_settings):
+        admission_settings.REDIS_URL = "redis://127.0.0.1:1/0"
+        request = APIRequestFactory().post(self.url(code_challenge.slug), {"code": CORRECT_CODE}, format="json")
+        force_authenticate(request, user=student)
+        res = async_to_sync(RunCodeAsyncView.as_view())(request, slug=code_challenge.slug)
+        assert res.status_code == 200
+        body = json.loads(res.content)
+        expected = self.run(student_client, code_challenge).data
+        assert body["passed"] == body["total"] == expected["total"]
+        assert [r["status"] for r in body["results"]] == [r["status"] for r in expected["results"]]
+
+    def test_async_view_checks_authentication(self, code_challenge):
+        request = APIRequestFactory().post(self.url(code_challenge.slug), {"code": CORRECT_CODE}, format="json")
+        res = async_to_sync(RunCodeAsyncView.as_view())(request, slug=code_challenge.slug)
+        assert res.status_code == 401
+
+
+@pytest.mark.django_db
+class TestRejudge:
+    CASES = [{"stdin": "2", "expected_stdout": "4", "is_public": True},
+             {"stdin": "10", "expected_stdout": "20"}, {"stdin": "-3", "expected_stdout": "-6"}]
+
+    def submit(self, client, challenge, code, capture):
+        with capture(execute=True):
+            res = client.post(f"/api/platform/challenges/{challenge.slug}/submit/", {"code": code}, format="json")
+        return Submission.objects.get(id=res.data["submission_id"])
+
+    def update(self, client, challenge, capture, **data):
+        with capture(execute=True):
+            res = client.patch(f"/api/platform/challenges/{challenge.slug}/update/", data, format="json")
+        assert res.status_code == 200
+        return Rejudge.objects.get(id=res.data["rejudge_id"])
+
+    def test_only_added_test_cases_run(
+        self, student_client, teacher_client, code_challenge, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        submission = self.submit(student_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        kept = set(submission.test_results.values_list("id", flat=True))
+        rejudge = self.update(teacher_client, code_challenge, django_capture_on_commit_callbacks,
+                              test_cases=self.CASES + [{"stdin": "7", "expected_stdout": "14"}])
+        assert (rejudge.status, rejudge.total, rejudge.processed, rejudge.changed) == ("done", 1, 1, 0)
+        results = submission.test_results.all()
+        assert len(results) == 4 and kept < {r.id for r in results}   # old results kept, one run
+        submission.refresh_from_db()
+        assert (submission.status, submission.feedback) == ("passed", "4/4 test cases passed.")
+
+    def test_edited_test_case_changes_the_score(
+        self, student_client, teacher_client, code_challenge, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        self.submit(student_client, code_challenge, WRONG_CODE, django_capture_on_commit_callbacks)
+        latest = self.submit(student_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        cases = self.CASES[:2] + [{"stdin": "-3", "expected_stdout": "-7"}]
+        rejudge = self.update(teacher_client, code_challenge, django_capture_on_commit_callbacks, test_cases=cases)
+        assert (rejudge.total, rejudge.changed) == (1, 1)   # the latest submission only
+        latest.refresh_from_db()
+        assert (latest.status, latest.score) == ("failed", 20)
+        assert latest.test_results.get(test_case__stdin="-3").status == "wrong_answer"
+
+    def test_newly_passing_submission_gets_its_certificate(
+        self, student_client, teacher_client, code_challenge, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        submission = self.submit(student_client, code_challenge, WRONG_CODE, django_capture_on_commit_callbacks)
+        assert not Certificate.objects.exists()
+        self.update(teacher_client, code_challenge, django_capture_on_commit_callbacks,
+                    test_cases=self.CASES[:1])   # 2 + 2 == 2 * 2
+        submission.refresh_from_db()
+        assert submission.status == "passed"
+        assert Certificate.objects.filter(user=submission.user).exists()
+
+    def test_changed_limits_rejudge_every_test_case(
+        self, student_client, teacher_client, code_challenge, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        submission = self.submit(student_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        kept = set(submission.test_results.values_list("id", flat=True))
+        rejudge = self.update(teacher_client, code_challenge, django_capture_on_commit_callbacks,
+                              code_checker="exact")
+        assert rejudge.full and rejudge.status == "done"
+        assert not kept & set(submission.test_results.values_list("id", flat=True))
+
+    def test_chunks_share_the_progress(
+        self, student_client, student2_client, teacher_client, code_challenge, settings,
+        celery_eager, django_capture_on_commit_callbacks,
+    ):
+        settings.JUDGE_REJUDGE_CHUNK_SIZE = 1
+        for client in (student_client, student2_client):
+            self.submit(client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        rejudge = self.update(teacher_client, code_challenge, django_capture_on_commit_callbacks,
+                              test_cases=self.CASES[1:])
+        assert (rejudge.status, rejudge.total, rejudge.processed, rejudge.errors) == ("done", 2, 2, 0)
+
+    def test_progress_is_readable_by_the_owner_only(self, teacher_client, teacher2_client, code_challenge):
+        rejudge = Rejudge.objects.create(config=code_challenge.code_config, total=10, processed=4)
+        assert teacher_client.get(f"/api/platform/rejudges/{rejudge.id}/").data["processed"] == 4
+        assert teacher2_client.get(f"/api/platform/rejudges/{rejudge.id}/").status_code == 404
+
+
+@pytest.mark.django_db
+class TestReferenceRun:
+    def start(self, client, challenge, capture, **data):
+        with capture(execute=True):
+            res = client.post(f"/api/platform/challenges/{challenge.slug}/reference-run/", data, format="json")
+        assert res.status_code == 202
+        return client.get(f"/api/platform/reference-runs/{res.data['reference_run_id']}/")
+
+    @pytest.fixture
+    def config(self, code_challenge):
+        config = code_challenge.code_config
+        config.solution_hidden = CORRECT_CODE
+        config.save()
+        return config
+
+    def test_fill_sets_expected_outputs_and_time_limit(
+        self, teacher_client, code_challenge, config, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        config.test_cases.update(expected_stdout="?")
+        res = self.start(teacher_client, code_challenge, django_capture_on_commit_callbacks,
+                         mode="fill", set_time_limit=True)
+        assert res.data["status"] == "done"
+        assert [r["status"] for r in res.data["results"]] == ["accepted"] * 3
+        assert list(config.test_cases.values_list("expected_stdout", flat=True)) == ["4", "20", "-6"]
+        assert all(tc.reference_time_ms > 0 and tc.reference_memory_mb for tc in config.test_cases.all())
+        config.refresh_from_db()
+        assert config.test_cases_version == 1
+        assert config.time_limit_seconds == res.data["suggested_time_limit_seconds"] >= 1
+
+    def test_filled_outputs_rejudge_submissions(
+        self, student_client, teacher_client, code_challenge, config, celery_eager,
+        django_capture_on_commit_callbacks,
+    ):
+        config.test_cases.filter(stdin="10").update(expected_stdout="21")
+        with django_capture_on_commit_callbacks(execute=True):
+            res = student_client.post(f"/api/platform/challenges/{code_challenge.slug}/submit/",
+                                      {"code": CORRECT_CODE}, format="json")
+        submission = Submission.objects.get(id=res.data["submission_id"])
+        assert submission.status == "failed"
+
+        self.start(teacher_client, code_challenge, django_capture_on_commit_callbacks, mode="fill")
+        submission.refresh_from_db()
+        assert submission.status == "passed"
+        assert set(submission.test_results.values_list("status", flat=True)) == {"accepted"}
+        assert Rejudge.objects.get().full is False   # only the refilled test case ran again
+
+    def test_check_reports_wrong_expected_outputs(
+        self, teacher_client, code_challenge, config, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        config.test_cases.filter(stdin="10").update(expected_stdout="21")
+        res = self.start(teacher_client, code_challenge, django_capture_on_commit_callbacks)
+        assert [r["status"] for r in res.data["results"]] == ["accepted", "wrong_answer", "accepted"]
+        assert res.data["results"][1]["message"] == "Token 1 (line 1): expected '21', got '20'"
+        assert config.test_cases.get(stdin="10").expected_stdout == "21"   # checked, not changed
+        config.refresh_from_db()
+        assert config.time_limit_seconds == 2   # not asked to set it
+
+    def test_failing_reference_solution_changes_nothing(
+        self, teacher_client, code_challenge, config, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        config.solution_hidden = "raise SystemExit(3)"
+        config.save()
+        res = self.start(teacher_client, code_challenge, django_capture_on_commit_callbacks,
+                         mode="fill", set_time_limit=True)
+        assert res.data["status"] == "done"
+        assert {r["status"] for r in res.data["results"]} == {"runtime_error"}
+        assert res.data["suggested_time_limit_seconds"] is None
+        assert set(config.test_cases.values_list("expected_stdout", flat=True)) == {"4", "20", "-6"}
+
+    def test_judge_failure_fails_the_run(
+        self, teacher_client, code_challenge, config, celery_eager, django_capture_on_commit_callbacks, monkeypatch,
+    ):
+        def broken(*args, **kwargs):
+            raise OSError("sandbox unavailable")
+
+        monkeypatch.setattr("core.utils.reference.run_code_challenge", broken)
+        res = self.start(teacher_client, code_challenge, django_capture_on_commit_callbacks, mode="fill")
+        assert res.data["status"] == "failed"
+
+    def test_only_the_owner_runs_and_reads_it(self, teacher2_client, teacher_client, code_challenge, config):
+        res = teacher2_client.post(f"/api/platform/challenges/{code_challenge.slug}/reference-run/", {},
+                                   format="json")
+        assert res.status_code == 403
+        run = ReferenceRun.objects.create(config=config)
+        assert teacher2_client.get(f"/api/platform/reference-runs/{run.id}/").status_code == 404
+        assert teacher_client.get(f"/api/platform/reference-runs/{run.id}/").data["status"] == "pending"
+
+    def test_no_reference_solution_returns_400(self, teacher_client, code_challenge):
+        res = teacher_client.post(f"/api/platform/challenges/{code_challenge.slug}/reference-run/", {},
+                                  format="json")
+        assert res.status_code == 400
+        assert not ReferenceRun.objects.exists()
+
+
+@pytest.mark.django_db
+class TestPerformanceGrading:
+    SLOW_CODE = "import sys, time\nt = time.process_time()\nwhile time.process_time() - t < 0.15: pass\n" \
+                "print(int(sys.stdin.read()) * 2)"
+
+    @pytest.fixture
+    def config(self, code_challenge, settings):
+        settings.JUDGE_PERF_RUNS = 3
+        config = code_challenge.code_config
+        config.solution_hidden = CORRECT_CODE
+        config.performance_weight = 0.5
+        config.performance_max_ratio = 3
+        config.save()
+        return config
+
+    def submit(self, client, challenge, code, capture):
+        with capture(execute=True):
+            res = client.post(f"/api/platform/challenges/{challenge.slug}/submit/", {"code": code}, format="json")
+        return client.get(f"/api/platform/submissions/{res.data['submission_id']}/")
+
+    def test_statistics(self):
+        assert timing.trimmed_mean([100, 1, 10, 11, 12], 0.2) == 11
+        assert timing.trimmed_mean([5, 7], 0.5) == 6   # never trims everything
+        assert timing.noise_pct([10, 10, 11, 9, 30]) == 10
+
+    def test_timed_runs_are_pinned(self):
+        cpu = min(os.sched_getaffinity(0))
+        code = "import os\nprint(sorted(os.sched_getaffinity(0)))"
+        timings = timing.time_code(code, "python", [make_case(1, "", f"[{cpu}]")], runs=3, cpus={cpu},
+                                   time_limit_s=2, warm_pool_size=2)
+        assert timings[1].time_ms > 0 and len(timings[1].samples) == 3
+
+    def test_runtime_earns_its_share_of_the_points(
+        self, student_client, student2_client, teacher_client, code_challenge, config,
+        celery_eager, django_capture_on_commit_callbacks,
+    ):
+        slow = self.submit(student_client, code_challenge, self.SLOW_CODE, django_capture_on_commit_callbacks)
+        assert slow.data["score"] == 30   # the reference is not timed yet: test cases only
+        assert all(r["perf_time_ms"] > 100 for r in slow.data["results"])
+
+        with django_capture_on_commit_callbacks(execute=True):
+            teacher_client.post(f"/api/platform/challenges/{code_challenge.slug}/reference-run/", {},
+                                format="json")
+        assert all(tc.reference_perf_ms < 100 for tc in config.test_cases.all())
+        slow = student_client.get(f"/api/platform/submissions/{slow.data['submission_id']}/")
+        assert slow.data["score"] == 15   # re-scored: no runtime points
+        assert "0/15 runtime points" in slow.data["feedback"]
+
+        fast = self.submit(student2_client, code_challenge, CORRECT_CODE, django_capture_on_commit_callbacks)
+        assert fast.data["score"] > 25
+
+    def test_failing_submission_is_not_timed(
+        self, student_client, code_challenge, config, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        res = self.submit(student_client, code_challenge, WRONG_CODE, django_capture_on_commit_callbacks)
+        assert res.data["score"] == 10   # one test case of three, no runtime points
+        assert all(r["perf_time_ms"] is None for r in res.data["results"])
+
+
+@pytest.mark.django_db
+class TestCpuUsage:
+    @pytest.fixture
+    def usage_settings(self, admission_settings, student, code_challenge):
+        """No usage left in Redis by earlier tests for the same ids."""
+        course_id = code_challenge.topic.course_id
+        keys = [*cpu_usage._windows(student.id, course_id).values(), cpu_usage.PENDING_KEY]
+        redis_client.get_redis().delete(*keys)
+        yield admission_settings
+        redis_client.get_redis().delete(*keys)
+
+    def test_most_specific_quota_applies(self, student, student2, published_course, settings):
+        settings.JUDGE_USAGE_USER_QUOTA_S, settings.JUDGE_USAGE_COURSE_QUOTA_S = 600, 0
+        CpuQuota.objects.create(course=published_course, scope="user", cpu_seconds=60)
+        CpuQuota.objects.create(course=published_course, user=student, scope="user", cpu_seconds=30)
+        CpuQuota.objects.create(course=None, scope="course", cpu_seconds=3600)
+        assert cpu_usage.quotas(student.id, published_course.id) == {
+            "user_course": 30, "user": 600, "course": 3600,
+        }
+        assert cpu_usage.quotas(student2.id, published_course.id)["user_course"] == 60
+
+    def test_quotas_are_not_enforced_without_redis(self, student_client, code_challenge, admission_settings):
+        admission_settings.REDIS_URL = "redis://127.0.0.1:1/0"
+        CpuQuota.objects.create(course=code_challenge.topic.course, scope="course", cpu_seconds=1)
+        res = student_client.post(f"/api/platform/challenges/{code_challenge.slug}/run/",
+                                  {"code": CORRECT_CODE}, format="json")
+        assert res.status_code == 200
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_usage_is_flushed_per_day(self, student, code_challenge, usage_settings):
+        course_id = code_challenge.topic.course_id
+        cpu_usage.record(student.id, course_id, "run", 120.0)
+        cpu_usage.record(student.id, course_id, "run", 80.0)
+        assert cpu_usage.window_usage(student.id, course_id) == 0.2
+        assert cpu_usage.flush() == 1
+        usage = CpuUsage.objects.get(user=student, course_id=course_id, kind="run")
+        assert (usage.cpu_ms, usage.runs) == (200.0, 2)
+        assert cpu_usage.flush() == 0
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_over_quota_runs_are_refused_and_submissions_deferred(
+        self, student, student_client, code_challenge, usage_settings, django_capture_on_commit_callbacks,
+    ):
+        course_id = code_challenge.topic.course_id
+        CpuQuota.objects.create(course_id=course_id, scope="user", cpu_seconds=1)
+        cpu_usage.record(student.id, course_id, "run", 1500.0)
+
+        res = student_client.post(f"/api/platform/challenges/{code_challenge.slug}/run/",
+                                  {"code": CORRECT_CODE}, format="json")
+        assert res.status_code == 429
+        assert 0 < int(res["Retry-After"]) <= usage_settings.JUDGE_USAGE_WINDOW_S
+
+        url = f"/api/platform/challenges/{code_challenge.slug}/submit/"
+        with django_capture_on_commit_callbacks(execute=False):
+            res = student_client.post(url, {"code": CORRECT_CODE}, format="json")
+        assert res.status_code == 202 and 0 < res.data["judged_in_s"] <= cpu_usage.max_judge_delay_s()
+        assert student_client.post(url, {"code": CORRECT_CODE}, format="json").status_code == 429
+
+        # A submission stuck pending for longer than a window does not hold the next one back
+        Submission.objects.filter(status="pending").update(
+            created_at=timezone.now() - timedelta(seconds=usage_settings.JUDGE_USAGE_WINDOW_S + 1))
+        with django_capture_on_commit_callbacks(execute=False):
+            assert student_client.post(url, {"code": CORRECT_CODE}, format="json").status_code == 202
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_shared_executions_are_charged_once(self, student, code_challenge, usage_settings, monkeypatch):
+        course_id = code_challenge.topic.course_id
+        leader = grading.run_tests(CORRECT_CODE, "python", list(code_challenge.code_config.test_cases.all()),
+                                   code_challenge.code_config)
+        monkeypatch.setattr(grading, "run_once", lambda key, execute: leader)   # another submission ran it
+        submission = Submission.objects.create(user=student, challenge=code_challenge, answer_text=CORRECT_CODE,
+                                               language="python", status="pending")
+        grading.grade_code_submission(submission, "python")
+        submission.refresh_from_db()
+        assert submission.status == "passed" and cpu_usage.window_usage(student.id, course_id) == 0
+
+    def test_countdowns_stay_below_the_visibility_timeout(self, settings):
+        settings.JUDGE_USAGE_WINDOW_S, settings.JUDGE_USAGE_MAX_DELAY_S = 7200, 3600
+        settings.CELERY_BROKER_TRANSPORT_OPTIONS = {"visibility_timeout": 1800}
+        verdict = cpu_usage.Verdict("over", retry_after_s=7000)
+        assert cpu_usage.judge_delay(verdict) == cpu_usage.max_judge_delay_s() == 900
+        assert cpu_usage.max_deferrals() == 8
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_quota_is_checked_again_when_the_submission_comes_up(
+        self, student, student_client, code_challenge, usage_settings, monkeypatch,
+    ):
+        from core.tasks import judge_submission
+
+        course_id = code_challenge.topic.course_id
+        CpuQuota.objects.create(course_id=course_id, scope="user", cpu_seconds=1)
+        cpu_usage.record(student.id, course_id, "run", 1500.0)
+        submission = Submission.objects.create(user=student, challenge=code_challenge, answer_text=CORRECT_CODE,
+                                               language="python", status="pending")
+        queued = []
+        monkeypatch.setattr(judge_submission, "apply_async", lambda args, countdown: queued.append((args, countdown)))
+
+        judge_submission(submission.id, "python")
+        submission.refresh_from_db()
+        assert submission.status == "pending"
+        [(args, countdown)] = queued
+        assert args == (submission.id, "python", 1) and 0 < countdown <= cpu_usage.max_judge_delay_s()
+
+        judge_submission(submission.id, "python", cpu_usage.max_deferrals())   # held back long enough
+        submission.refresh_from_db()
+        assert submission.status == "passed"
+
+    def test_course_owner_manages_quotas(self, teacher_client, teacher2_client, student, published_course):
+        url = f"/api/platform/courses/{published_course.slug}/cpu-quota/"
+        assert teacher2_client.get(url).status_code == 403
+
+        res = teacher_client.put(url, {"scope": "course", "user_id": student.id, "cpu_seconds": 30}, format="json")
+        assert res.status_code == 400   # course quotas are not per student
+        res = teacher_client.put(url, {"scope": "course", "cpu_seconds": 600}, format="json")
+        assert res.status_code == 200
+        assert [(q["scope"], q["cpu_seconds"]) for q in res.data["quotas"]] == [("course", 600)]
+
+        CpuUsage.objects.create(user=student, course=published_course, kind="run",
+                                day=timezone.localdate(), cpu_ms=1500, runs=3)
+        res = teacher_client.get(url)
+        assert res.data["usage"]["users"] == [{
+            "user_id": student.id, "username": student.username, "cpu_seconds": 1.5, "runs": 3,
+            "run_cpu_seconds": 1.5,
+        }]
+
+        res = teacher_client.put(url, {"scope": "course", "cpu_seconds": None}, format="json")
+        assert res.data["quotas"] == []
+
+
+@pytest.fixture
+def test_data_settings(settings, tmp_path):
+    """Test data above 1 KB stored as files, in a storage and host cache of their own."""
+    settings.STORAGES = {**settings.STORAGES, test_data.STORAGE_ALIAS: {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+        "OPTIONS": {"location": str(tmp_path / "storage")},
+    }}
+    settings.JUDGE_TEST_DATA_INLINE_KB = 1
+    settings.JUDGE_TEST_DATA_CACHE_DIR = str(tmp_path / "cache")
+    return settings
+
+
+@pytest.mark.django_db
+class TestFileBackedTestData:
+    CODE = "import sys\nprint(sum(int(x) for x in sys.stdin.read().split()))"
+
+    def test_large_data_is_stored_as_files_and_run_from_them(
+        self, student_client, teacher_client, code_challenge, test_data_settings, admission_settings,
+    ):
+        admission_settings.REDIS_URL = "redis://127.0.0.1:1/0"
+        numbers = " ".join(str(i) for i in range(5000))
+        res = teacher_client.patch(f"/api/platform/challenges/{code_challenge.slug}/update/", {
+            "test_cases": [{"stdin": numbers, "expected_stdout": str(sum(range(5000))), "is_public": True}],
+        }, format="json")
+        assert res.status_code == 200
+        tc = CodeTestCase.objects.get(config__challenge=code_challenge)
+        assert tc.stdin == "" and len(tc.stdin_digest) == 64
+        assert tc.expected_stdout == str(sum(range(5000))) and tc.expected_digest == ""  # small: inline
+
+        res = student_client.post(f"/api/platform/challenges/{code_challenge.slug}/run/", {"code": self.CODE},
+                                  format="json")
+        assert res.data["passed"] == 1
+        assert res.data["results"][0]["stdin"].startswith("0 1 2 3") and res.data["results"][0]["stdin"].endswith("…")
+        assert os.path.exists(os.path.join(test_data_settings.JUDGE_TEST_DATA_CACHE_DIR,
+                                           tc.stdin_digest[:2], tc.stdin_digest))
+
+    def test_suite_files_are_pinned_in_a_cache_smaller_than_the_suite(self, test_data_settings):
+        test_data_settings.JUDGE_TEST_DATA_CACHE_MAX_MB = 0   # every fetch evicts all it can
+        cases = []
+        for i in range(3):
+            numbers = range(i, 2000 + i)
+            digest = test_data.store(" ".join(map(str, numbers)).encode())
+            cases.append(SimpleNamespace(id=i, stdin="", stdin_digest=digest, expected_stdout=str(sum(numbers)),
+                                         expected_digest="", is_public=True))
+        test_data.localize(cases)
+        results = run_code_challenge(self.CODE, "python", cases, time_limit_s=2)
+        assert [r.status for r in results] == ["accepted"] * 3
+
+        paths = [tc.stdin_path for tc in cases]
+        del cases   # released: evictable again
+        test_data._evict(test_data_settings.JUDGE_TEST_DATA_CACHE_DIR, 0)
+        assert not any(os.path.exists(path) for path in paths)
+
+    def test_expected_output_is_read_from_its_file(self, tmp_path):
+        (tmp_path / "in").write_text("1 2 3\n")
+        (tmp_path / "out").write_text("7\n")
+        case = SimpleNamespace(id=1, stdin="", expected_stdout="", is_public=True,
+                               stdin_path=str(tmp_path / "in"), expected_path=str(tmp_path / "out"))
+        result = run_code_challenge(self.CODE, "python", [case], time_limit_s=2, warm_pool_size=2)[0]
+        assert result.status == "wrong_answer"
+        assert result.message == "Token 1 (line 1): expected '7', got '6'"
+
+
+class TestSingleFlight:
+    def test_concurrent_identical_runs_share_one_execution(self, monkeypatch):
+        monkeypatch.setattr(redis_client, "_down_until", float("inf"))  # in-process only
+        calls = []
+        release = threading.Event()
+
+        def execute():
+            calls.append(1)
+            release.wait(5)
+            return [executor.TestResult(1, "accepted", "4", "", 12.0, True)]
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(single_flight.run_once, "key", execute) for _ in range(3)]
+            time.sleep(0.2)
+            release.set()
+            results = [f.result() for f in futures]
+        assert len(calls) == 1
+        assert all(r[0].status == "accepted" for r in results)
+
+    def test_failure_reaches_every_waiter(self, monkeypatch):
+        monkeypatch.setattr(redis_client, "_down_until", float("inf"))
+
+        def execute():
+            time.sleep(0.2)
+            raise ValueError("Unsupported language: cobol")
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            futures = [pool.submit(single_flight.run_once, "failing", execute) for _ in range(2)]
+            for f in futures:
+                with pytest.raises(ValueError):
+                    f.result()
+
+    def test_async_runs_share_with_each_other(self, monkeypatch):
+        monkeypatch.setattr(redis_client, "_down_until", float("inf"))
+        calls = []
+
+        async def execute():
+            calls.append(1)
+            await asyncio.sleep(0.2)
+            return [executor.TestResult(1, "accepted", "4", "", 12.0, True)]
+
+        async def main():
+            return await asyncio.gather(*(single_flight.run_once_async("async-key", execute) for _ in range(3)))
+
+        results = asyncio.run(main())
+        assert len(calls) == 1
+        assert all(r[0].status == "accepted" for r in results)
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_waits_for_another_process(self, monkeypatch):
+        monkeypatch.setattr(redis_client, "_down_until", 0.0)
+        client = redis_client.get_redis()
+        key = f"judge:runs:test-{uuid.uuid4().hex}"
+        client.set(f"{key}:lock", "other-process", ex=10)
+
+        def finish_elsewhere():
+            time.sleep(0.2)
+            client.set(f"{key}:result", json.dumps([dataclasses.asdict(
+                executor.TestResult(1, "wrong_answer", "5", "", 10.0, True)
+            )]), ex=10)
+            client.delete(f"{key}:lock")
+
+        threading.Thread(target=finish_elsewhere).start()
+        try:
+            results = single_flight.run_once(key, lambda: pytest.fail("ran a second time"))
+        finally:
+            client.delete(f"{key}:lock", f"{key}:result")
+        assert results[0].status == "wrong_answer"
+
+
+@pytest.mark.django_db
+class TestJudgeMetrics:
+    URL = "/api/platform/judge/metrics/"
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_phases_are_exported_as_histograms(self, monkeypatch, api_client, student):
+        monkeypatch.setattr(redis_client, "_down_until", 0.0)
+        language = f"test-{uuid.uuid4().hex}"
+        results = run_code_challenge(CORRECT_CODE, "python", [make_case(1, "2", "4"), make_case(2, "3", "6")])
+        judge_metrics.record_phases(language, results)
+
+        student.is_staff = True
+        student.save()
+        api_client.force_authenticate(user=student)
+        res = api_client.get(self.URL)
+        assert res.status_code == 200
+        body = res.content.decode()
+        assert f'judge_phase_ms_count{{phase="wall",language="{language}"}} 2' in body
+        assert f'judge_phase_ms_count{{phase="setup",language="{language}"}} 1' in body
+        assert f'judge_phase_ms_bucket{{phase="wall",language="{language}",le="+Inf"}} 2' in body
+
+    def test_requires_staff(self, student_client):
+        assert student_client.get(self.URL).status_code == 403
+
+
+@pytest.fixture
+def fleet_settings(admission_settings):
+    """The fleet on, with heartbeats fast enough for a test to see a worker die."""
+    admission_settings.JUDGE_FLEET_ENABLED = True
+    admission_settings.JUDGE_FLEET_HEARTBEAT_S = 0.1
+    admission_settings.JUDGE_FLEET_WORKER_TTL_S = 1
+    admission_settings.JUDGE_FLEET_WAIT_S = 10
+    return admission_settings
+
+
+@pytest.mark.django_db
+class TestJudgeFleet:
+    @pytest.fixture
+    def worker(self, fleet_settings):
+        stop = threading.Event()
+        worker = judge_fleet.JudgeWorker(["python"], slots=2)
+        thread = threading.Thread(target=worker.run, args=(stop,))
+        thread.start()
+        yield worker
+        stop.set()
+        thread.join()
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_worker_runs_submissions(
+        self, worker, student_client, code_challenge, celery_eager, django_capture_on_commit_callbacks,
+    ):
+        assert judge_fleet.workers()[worker.id]["slots"] == 2
+        with django_capture_on_commit_callbacks(execute=True):
+            res = student_client.post(f"/api/platform/challenges/{code_challenge.slug}/submit/",
+                                      {"code": WRONG_CODE}, format="json")
+        res = student_client.get(f"/api/platform/submissions/{res.data['submission_id']}/")
+        assert [r["status"] for r in res.data["results"]] == ["accepted", "wrong_answer", "wrong_answer"]
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_dead_workers_jobs_are_requeued(self, fleet_settings):
+        client, dead = redis_client.get_redis(), f"test-{uuid.uuid4().hex}"
+        queue = f"judge:fleet:queue:test-{uuid.uuid4().hex}"
+        job = {"id": "job", "language": queue.rsplit(":", 1)[1], "attempts": 0}
+        client.hset(judge_fleet.WORKERS_KEY, dead, json.dumps({"languages": [job["language"]]}))
+        client.rpush(f"judge:fleet:claimed:{dead}", json.dumps(job))
+        try:
+            judge_fleet.reap(client)
+            assert [json.loads(raw)["attempts"] for raw in client.lrange(queue, 0, -1)] == [1]
+            assert not client.hexists(judge_fleet.WORKERS_KEY, dead)
+        finally:
+            client.delete(queue)
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_stopping_worker_beats_until_its_jobs_finish(self, fleet_settings, code_challenge):
+        stop, worker = threading.Event(), judge_fleet.JudgeWorker(["python"], slots=1)
+        thread = threading.Thread(target=worker.run, args=(stop,))
+        thread.start()
+        config = code_challenge.code_config
+        config.time_limit_seconds = 5
+        results = []
+        remote = threading.Thread(target=lambda: results.extend(judge_fleet.run_remote(
+            "import time\ntime.sleep(2)", "python", list(config.test_cases.all())[:1], config)))
+        remote.start()
+        while not worker.busy:
+            time.sleep(0.05)
+        stop.set()
+        time.sleep(fleet_settings.JUDGE_FLEET_WORKER_TTL_S * 1.5)
+        assert redis_client.get_redis().exists(f"judge:fleet:alive:{worker.id}")   # not reaped mid-job
+        remote.join()
+        thread.join()
+        assert [r.status for r in results] == ["wrong_answer"]
+
+    @pytest.mark.skipif(not _redis_available(), reason="Redis not reachable")
+    def test_only_unclaimed_jobs_are_withdrawn(self, fleet_settings):
+        client, queue = redis_client.get_redis(), f"judge:fleet:queue:test-{uuid.uuid4().hex}"
+        job = {"id": "job", "language": queue.rsplit(":", 1)[1], "attempts": 0}
+        try:
+            client.rpush(queue, json.dumps({**job, "attempts": 1}))  # requeued after its worker died
+            assert judge_fleet._withdraw(client, job)
+            assert not client.exists(queue)
+            assert not judge_fleet._withdraw(client, job)  # a worker has it: wait for its answer
+        finally:
+            client.delete(queue)
+
+    def test_runs_here_when_the_fleet_is_unreachable(self, fleet_settings, code_challenge):
+        fleet_settings.REDIS_URL = "redis://127.0.0.1:1/0"
+        config = code_challenge.code_config
+        results = grading.run_tests(CORRECT_CODE, "python", list(config.test_cases.all()), config)
+        assert [r.status for r in results] == ["accepted"] * 3
+
+
+class TestBenchmark:
+    def test_writes_comparable_json_results(self, tmp_path):
+        out = tmp_path / "bench.json"
+        args = ["--languages", "python", "--workloads", "trivial,io", "--concurrency", "1,2",
+                "--submissions", "2", "--output", str(out)]
+        call_command("bench_executor", *args, stdout=io.StringIO())
+        report = json.loads(out.read_text())
+        assert [(r["workload"], r["concurrency"]) for r in report["results"]] == [
+            ("trivial", 1), ("trivial", 2), ("io", 1), ("io", 2),
+        ]
+        row = report["results"][0]
+        assert row["failed"] == 0 and row["throughput"] > 0 and row["peak_memory_mb"] > 0
+        assert row["latency_ms"]["p50"] <= row["latency_ms"]["p95"] <= row["latency_ms"]["p99"]
+
+        stdout = io.StringIO()
+        call_command("bench_executor", *args[:-2], "--compare", str(out), stdout=stdout)
+        assert "throughput" in stdout.getvalue().splitlines()[0]
+
+
+@pytest.mark.django_db
+def test_grading_benchmark_compares_write_paths(tmp_path):
+    out = tmp_path / "bench.json"
+    call_command("bench_grading", "--cases", "120", "--repeat", "2", "--output", str(out), stdout=io.StringIO())
+    per_row, bulk = json.loads(out.read_text())["results"]
+    assert (per_row["path"], bulk["path"], bulk["cases"]) == ("per_row", "bulk", 120)
+    assert bulk["queries"] < 10 < per_row["queries"]
+    assert not Submission.objects.exists()   # rolled back
+
+def make_case(case_id, stdin, expected, is_public=True):
+    return SimpleNamespace(id=case_id, stdin=stdin, expected_stdout=expected, is_public=is_public)
+
+
+class TestExecutor:
+    def test_parallel_keeps_test_case_order(self):
+        # Earlier cases sleep longer, so they finish last
+        code = "import sys, time\nn = int(sys.stdin.read())\ntime.sleep(n / 20)\nprint(n)"
+        cases = [make_case(i, str(n), str(n)) for i, n in enumerate([6, 4, 2, 0])]
+        results = run_code_challenge(code, "python", cases, time_limit_s=2, parallel=True, max_workers=4)
+        assert [r.test_case_id for r in results] == [0, 1, 2, 3]
+        assert all(r.status == "accepted" for r in results)
+
+    def test_parallel_enforces_time_limit_per_case(self):
+        code = "import sys\nif sys.stdin.read().strip() == 'loop':\n    while True: pass\nprint('ok')"
+        cases = [make_case(1, "loop", "ok"), make_case(2, "x", "ok")]
+        results = run_code_challenge(code, "python", cases, time_limit_s=1, parallel=True)
+        assert [r.status for r in results] == ["time_limit", "accepted"]
+
+    def test_fail_fast_runs_cheap_cases_first(self):
+        code = "import sys\nprint(len(sys.stdin.read()))"
+        cases = [make_case(1, "x" * 50, "50"), make_case(2, "xx", "3"), make_case(3, "x", "1")]
+        results = run_code_challenge(code, "python", cases, time_limit_s=2, fail_fast=True)
+        assert [r.status for r in results] == ["skipped", "wrong_answer", "accepted"]
+
+    def test_fail_fast_runs_one_case_at_a_time(self):
+        # With room for every case at once, only the first timeout may burn its limit
+        cases = [make_case(i, "", "") for i in range(4)]
+        results = run_code_challenge("while True: pass", "python", cases, time_limit_s=1,
+                                     parallel=True, max_workers=4, fail_fast=True)
+        assert [r.status for r in results] == ["time_limit", "skipped", "skipped", "skipped"]
+
+    def test_results_carry_phase_timings(self):
+        results = run_code_challenge(CORRECT_CODE, "python", [make_case(1, "2", "4")], time_limit_s=2)
+        phases = results[0].phases
+        assert phases["compile"] is None  # nothing to compile
+        assert all(phases[p] is not None for p in ("setup", "spawn", "user", "sys", "wall", "compare"))
+
+    def test_warm_pool_matches_cold_run_semantics(self):
+        code = (
+            "import sys\n"
+            "n = int(sys.stdin.read())\n"
+            "print(n * 2)\n"
+            "print('dbg', file=sys.stderr)\n"
+            "sys.exit(0 if n >= 0 else 3)"
+        )
+        cases = [make_case(1, "21", "42"), make_case(2, "-1", "-2"), make_case(3, "5", "11")]
+        cold = run_code_challenge(code, "python", cases, time_limit_s=2)
+        warm = run_code_challenge(code, "python", cases, time_limit_s=2, warm_pool_size=2)
+        assert [r.status for r in warm] == [r.status for r in cold] == [
+            "accepted", "runtime_error", "wrong_answer",
+        ]
+        assert [(r.stdout, r.stderr) for r in warm] == [(r.stdout, r.stderr) for r in cold]
+
+    def test_node_spare_usage_is_measured_by_the_judge(self):
+        # The program cannot report its own usage: it has no exit listener or report fd to use
+        code = (
+            "process.removeAllListeners('exit');\n"
+            "for (const fd of [3, 4, 5]) { try { require('fs').writeSync(fd, '1 0'); } catch (e) {} }\n"
+            "const t = Date.now(); while (Date.now() - t < 200) {}\n"
+            "console.log('ok');"
+        )
+        cases = [make_case(i, "", "ok") for i in range(3)]
+        results = run_code_challenge(code, "javascript", cases, time_limit_s=2, memory_mb=4096,
+                                     warm_pool_size=2)
+        assert all(r.status == "accepted" and r.cpu_ms >= 100 and r.memory_mb for r in results)
+
+    def test_warm_pool_enforces_time_limit(self):
+        results = run_code_challenge(
+            "while True: pass", "python", [make_case(1, "", "")], time_limit_s=1, warm_pool_size=2,
+        )
+        assert results[0].status == "time_limit"
+
+
+class TestAsyncExecutor:
+    def test_verdicts_match_threaded_executor(self):
+        code = (
+            "import sys\n"
+            "s = sys.stdin.read().strip()\n"
+            "if s == 'loop':\n    while True: pass\n"
+            "if s == 'crash':\n    raise SystemExit(3)\n"
+            "print(int(s) * 2)"
+        )
+        cases = [make_case(1, "2", "4"), make_case(2, "3", "7"), make_case(3, "crash", ""),
+                 make_case(4, "loop", "")]
+        results = asyncio.run(run_code_challenge_async(code, "python", cases, time_limit_s=1, parallel=True))
+        assert [r.test_case_id for r in results] == [1, 2, 3, 4]
+        assert [r.status for r in results] == ["accepted", "wrong_answer", "runtime_error", "time_limit"]
+        assert results[0].phases["spawn"] is not None
+
+    def test_one_loop_holds_concurrent_runs(self):
+        code = "import time\ntime.sleep(0.5)\nprint(4)"
+
+        async def main():
+            runs = (run_code_challenge_async(code, "python", [make_case(1, "", "4")], time_limit_s=3)
+                    for _ in range(8))
+            return await asyncio.gather(*runs)
+
+        t0 = time.perf_counter()
+        results = asyncio.run(main())
+        assert all(r[0].status == "accepted" for r in results)
+        assert time.perf_counter() - t0 < 8 * 0.5  # the runs overlapped
+
+    @pytest.mark.skipif(shutil.which("g++") is None, reason="g++ not installed")
+    def test_compilation_error(self):
+        results = asyncio.run(run_code_challenge_async("int main( {", "cpp", [make_case(1, "", "")]))
+        assert results[0].status == "compilation_error" and results[0].stderr
+
+
+class TestCheckers:
+    def test_tokens_ignore_whitespace_and_report_first_mismatch(self):
+        check = get_checker("tokens")
+        assert check(make_case(1, "", "1 2\n3"), b"1\n2   3\n\n") is None
+        assert check(make_case(1, "", "1 2\n3 4"), b"1 2\n5 4") == "Token 3 (line 2): expected '3', got '5'"
+        assert check(make_case(1, "", "1 2"), b"1") == "Output ends at token 2: expected '2'"
+        assert check(make_case(1, "", "1"), b"1 2").startswith("Extra output at token 2")
+
+    def test_float_epsilon(self):
+        case = make_case(1, "", "3.14159 2")
+        assert get_checker("tokens")(case, b"3.1416 2") is not None
+        assert get_checker("tokens", float_epsilon=1e-4)(case, b"3.1416 2.0") is None
+        assert get_checker("tokens", float_epsilon=1e-4)(case, b"3.15 2") is not None
+
+    def test_program_checker_runs_in_the_sandbox(self):
+        program = (
+            "import sys\n"
+            "inp, exp, out = (open(p).read().split() for p in sys.argv[1:])\n"
+            "if sorted(out) == sorted(exp):\n    sys.exit(42)\n"
+            "print('not a permutation of', ' '.join(exp))\n"
+            "sys.exit(43)"
+        )
+        code = "import sys\nprint(*reversed(sys.stdin.read().split()))"
+        cases = [make_case(1, "1 2 3", "1 2 3"), make_case(2, "1 2", "1 3")]
+        results = run_code_challenge(code, "python", cases, time_limit_s=2,
+                                     checker=get_checker("program", program=program))
+        assert [r.status for r in results] == ["accepted", "wrong_answer"]
+        assert results[1].message == "not a permutation of 1 3"
+
+        broken = get_checker("program", program="raise RuntimeError('bad checker')")
+        message = broken(make_case(1, "", "1"), b"1")
+        assert message.startswith("Checker failed") and "bad checker" in message
+
+
+class TestSql:
+    SCHEMA = (
+        "CREATE TABLE emp (id INTEGER PRIMARY KEY, name TEXT, dept TEXT, salary REAL);"
+        "INSERT INTO emp VALUES (1, 'ann', 'eng', 100), (2, 'bob', 'eng', 150), (3, 'cid', 'ops', 90);"
+    )
+
+    def run(self, query, cases, **kwargs):
+        return run_code_challenge(query, "sql", cases, sql_schema=self.SCHEMA, time_limit_s=1, **kwargs)
+
+    def test_rows_compare_in_canonical_form(self):
+        expected = "ops|1|90\neng|2|125"  # AVG() comes back as REAL 125.0
+        results = self.run("SELECT dept, COUNT(*), AVG(salary) FROM emp GROUP BY dept",
+                           [make_case(1, "", expected)])
+        assert results[0].status == "accepted"
+        assert self.run("SELECT dept, COUNT(*), AVG(salary) FROM emp GROUP BY dept ORDER BY dept",
+                        [make_case(1, "", expected)])[0].status == "wrong_answer"
+
+    def test_every_case_runs_on_its_own_copy(self):
+        cases = [make_case(1, "DELETE FROM emp WHERE dept = 'ops';", "2"), make_case(2, "", "3")]
+        results = self.run("SELECT COUNT(*) FROM emp", cases, parallel=True)
+        assert [r.status for r in results] == ["accepted", "accepted"]
+
+    def test_budgets_and_denied_statements(self):
+        endless = "WITH RECURSIVE r(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM r) SELECT COUNT(*) FROM r"
+        assert self.run(endless, [make_case(1, "", "")])[0].status == "time_limit"
+        attach = self.run("ATTACH DATABASE '/tmp/other.db' AS other", [make_case(1, "", "")])[0]
+        assert attach.status == "runtime_error" and "not authorized" in attach.stderr
+        rows = run_code_challenge("SELECT * FROM emp", "sql", [make_case(1, "", "")], sql_schema=self.SCHEMA,
+                                  output_limit_bytes=10)
+        assert rows[0].status == "output_limit"
+
+    def test_large_results_stop_at_the_memory_limit(self):
+        blobs = "WITH RECURSIVE r(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM r WHERE i < 400) " \
+                "SELECT randomblob(900000) FROM r"
+        result = self.run(blobs, [make_case(1, "", "")], memory_mb=16, output_limit_bytes=None)[0]
+        assert result.status == "memory_limit"
+
+    def test_invalid_schema_is_rejected(self):
+        with pytest.raises(ValueError, match="Invalid SQL schema"):
+            run_code_challenge("SELECT 1", "sql", [make_case(1, "", "1")], sql_schema="CREATE TABLE (")
+
+
+class TestHarness:
+    CODE = (
+        "import sys\n"
+        "n = int(input())\n"
+        "if n < 0:\n"
+        "    sys.exit(3)\n"
+        "if n == 99:\n"
+        "    while True: pass\n"
+        "print(n * 2)\n"
+        "print('dbg', file=sys.stderr)"
+    )
+
+    def test_harness_matches_isolated_runs(self):
+        cases = [make_case(1, "21", "42"), make_case(2, "-1", ""), make_case(3, "5", "11")]
+        isolated = run_code_challenge(self.CODE, "python", cases, time_limit_s=2)
+        batched  = run_code_challenge(self.CODE, "python", cases, time_limit_s=2, harness=True)
+        assert [r.status for r in batched] == ["accepted", "runtime_error", "wrong_answer"]
+        assert [(r.stdout, r.stderr) for r in batched] == [(r.stdout, r.stderr) for r in isolated]
+
+    def test_cases_after_a_timeout_run_in_isolation(self):
+        cases = [make_case(1, "1", "2"), make_case(2, "99", ""), make_case(3, "4", "8")]
+        results = run_code_challenge(self.CODE, "python", cases, time_limit_s=1, harness=True)
+        assert [r.status for r in results] == ["accepted", "time_limit", "accepted"]
+
+    def test_node_harness_feeds_each_case_its_own_stdin(self):
+        code = "const n = parseInt(require('fs').readFileSync('/dev/stdin', 'utf8')); console.log(n * 2);"
+        cases = [make_case(i, str(i), str(i * 2)) for i in range(5)]
+        results = run_code_challenge(code, "javascript", cases, memory_mb=4096, harness=True)
+        assert all(r.status == "accepted" for r in results)
+
+
+class TestOutputLimit:
+    FLOOD = "import sys\nif input() == 'flood':\n    while True: print(1)\nprint(2)"
+
+    @pytest.mark.parametrize("options", [{}, {"warm_pool_size": 2}, {"harness": True}])
+    def test_flooding_program_is_stopped(self, options):
+        cases = [make_case(1, "flood", "1"), make_case(2, "ok", "2")]
+        results = run_code_challenge(
+            self.FLOOD, "python", cases, output_limit_bytes=64 * 1024, stored_output_chars=100, **options,
+        )
+        assert [r.status for r in results] == ["output_limit", "accepted"]
+        assert "characters truncated" in results[0].stdout
+        assert len(results[0].stdout) < 200
+
+    def test_long_output_within_limit_is_judged_in_full(self):
+        code = "print('a' * 100000)"
+        result = run_code_challenge(code, "python", [make_case(1, "", "a" * 100000)], stored_output_chars=100)[0]
+        assert result.status == "accepted"
+        assert len(result.stdout) < 200
+
+
+class TestMemory:
+    HOG = "x = bytearray(512 * 1024 * 1024)\nprint(len(x))"
+
+    @pytest.mark.parametrize("options", [{}, {"warm_pool_size": 2}, {"harness": True}])
+    def test_allocation_failure_is_a_memory_limit(self, options):
+        result = run_code_challenge(self.HOG, "python", [make_case(1, "", "")], memory_mb=128, **options)[0]
+        assert result.status == "memory_limit"
+
+    def test_peak_memory_is_measured(self):
+        small, large = (
+            run_code_challenge(f"x = bytearray({mb} * 1024 * 1024)", "python", [make_case(1, "", "")],
+                               memory_mb=256)[0]
+            for mb in (1, 64)
+        )
+        assert small.status == large.status == "accepted"
+        assert large.memory_mb - small.memory_mb >= 60
+
+    def test_other_crashes_stay_runtime_errors(self):
+        result = run_code_challenge("raise ValueError('boom')", "python", [make_case(1, "", "")])[0]
+        assert result.status == "runtime_error"
+
+
+def _cgroup_root():
+    """A fresh directory in a writable cgroup v2 hierarchy, or None."""
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1] for line in f if line.split()[2] == "cgroup2"]
+    except OSError:
+        return None
+    for mount in mounts:
+        path = os.path.join(mount, f"judge-test-{uuid.uuid4().hex}")
+        try:
+            os.mkdir(path)
+        except OSError:
+            continue
+        return path
+    return None
+
+
+@pytest.fixture
+def cgroup_sandbox():
+    root = _cgroup_root()
+    if root is None:
+        pytest.skip("no writable cgroup v2 hierarchy")
+    yield CgroupSandbox(root)
+    os.rmdir(root)
+
+
+class TestSandbox:
+    BUSY = "import time\nt = time.process_time()\nwhile time.process_time() - t < 0.3:\n    pass"
+    SLEEP = "import time\ntime.sleep(1.5)\nprint('done')"
+
+    @pytest.mark.parametrize("options", [{}, {"warm_pool_size": 2}, {"harness": True}])
+    def test_cpu_time_is_reported(self, options):
+        busy, idle = (
+            run_code_challenge(code, "python", [make_case(1, "", "")], **options)[0]
+            for code in (self.BUSY, "import time\ntime.sleep(0.3)")
+        )
+        assert busy.cpu_ms >= 250
+        assert idle.time_ms >= 300 and idle.cpu_ms < 150
+
+    def test_cgroup_falls_back_to_rlimits(self):
+        sandbox = get_sandbox("cgroup", "/nonexistent/judge")
+        assert isinstance(sandbox, RlimitSandbox)
+
+    @pytest.mark.parametrize("options", [{}, {"warm_pool_size": 2}, {"harness": True}])
+    def test_cgroup_time_limit_is_on_cpu_time(self, cgroup_sandbox, options):
+        busy, idle = (
+            run_code_challenge(code, "python", [make_case(1, "", "done")], time_limit_s=1,
+                               sandbox=cgroup_sandbox, **options)[0]
+            for code in ("while True:\n    pass", self.SLEEP)
+        )
+        assert busy.status == "time_limit"
+        # Over the limit in wall time, but hardly any CPU time
+        assert idle.status == "accepted"
+        assert idle.time_ms > 1000 and idle.cpu_ms < 500
+        assert not any(name.startswith("run-") for name in os.listdir(cgroup_sandbox.root))
+
+    def test_cgroup_bounds_the_process_tree(self, cgroup_sandbox):
+        code = (
+            "import subprocess, sys\n"
+            "subprocess.run([sys.executable, '-c', 'while True: pass'])\n"
+        )
+        result = run_code_challenge(code, "python", [make_case(1, "", "")], time_limit_s=1,
+                                    sandbox=cgroup_sandbox)[0]
+        assert result.status == "time_limit"
+        assert not any(name.startswith("run-") for name in os.listdir(cgroup_sandbox.root))
+
+
+class TestCompileCache:
+    CODE = "#include <iostream>\nint main() { int n; std::cin >> n; std::cout << n * 2; }"
+
+    def test_identical_source_is_compiled_once(self, tmp_path, monkeypatch):
+        cache = CompileCache(str(tmp_path), 64 * 1024 * 1024)
+        cases = [make_case(1, "3", "6")]
+        assert run_code_challenge(self.CODE, "cpp", cases, compile_cache=cache)[0].status == "accepted"
+
+        # A second run must not invoke the compiler at all
+        real_run = subprocess.run
+
+        def no_compiler(cmd, *args, **kwargs):
+            assert cmd[0] != "g++", "compiler invoked on a cache hit"
+            return real_run(cmd, *args, **kwargs)
+
+        monkeypatch.setattr(subprocess, "run", no_compiler)
+        assert run_code_challenge(self.CODE, "cpp", cases, compile_cache=cache)[0].status == "accepted"
+
+    def test_compile_errors_are_cached(self, tmp_path):
+        cache = CompileCache(str(tmp_path), 64 * 1024 * 1024)
+        first = run_code_challenge("int main() { oops }", "cpp", [make_case(1, "", "")], compile_cache=cache)
+        again = run_code_challenge("int main() { oops }", "cpp", [make_case(1, "", "")], compile_cache=cache)
+        assert first[0].status == again[0].status == "compilation_error"
+        assert "oops" in again[0].stderr
+
+    def test_eviction_keeps_cache_under_size_cap(self, tmp_path):
+        cache = CompileCache(str(tmp_path), 64 * 1024 * 1024)
+        run_code_challenge(self.CODE, "cpp", [make_case(1, "3", "6")], compile_cache=cache)
+        cache.max_bytes = 0
+        cache.evict()
+        assert not list(tmp_path.glob("??/*"))
+
+
+@pytest.mark.skipif(shutil.which("javac") is None, reason="JDK not installed")
+class TestJava:
+    CODE = (
+        "import java.util.Scanner;\n"
+        "public class Solution {\n"
+        "    static int calls = 0;\n"
+        "    public static void main(String[] args) {\n"
+        "        int n = new Scanner(System.in).nextInt();\n"
+        "        calls++;\n"
+        "        if (n < 0) System.exit(3);\n"
+        "        System.out.println(n * 2 + \" \" + calls);\n"
+        "    }\n"
+        "}\n"
+    )
+
+    def test_each_case_gets_fresh_static_state(self, tmp_path):
+        cases = [make_case(1, "2", "4 1"), make_case(2, "5", "10 1"), make_case(3, "-1", "")]
+        results = run_code_challenge(self.CODE, "java", cases, compile_cache=CompileCache(str(tmp_path), 1 << 26))
+        assert [r.status for r in results] == ["accepted", "accepted", "runtime_error"]
+
+    def test_infinite_loop_times_out(self):
+        code = "public class Solution { public static void main(String[] a) { while (true) {} } }"
+        assert run_code_challenge(code, "java", [make_case(1, "", "")], time_limit_s=1)[0].status == "time_limit"
+
+    def test_leftover_threads_do_not_reach_later_cases(self):
+        code = (
+            "public class Solution {\n"
+            "    public static void main(String[] a) throws Exception {\n"
+            "        int n = new java.util.Scanner(System.in).nextInt();\n"
+            "        if (n == 1) new Thread(() -> { while (true) { System.out.println(\"leak\"); } }).start();\n"
+            "        else Thread.sleep(300);\n"
+            "        System.out.println(n);\n"
+            "    }\n"
+            "}\n"
+        )
+        cases = [make_case(i, str(i), str(i)) for i in (1, 2, 3)]
+        results = run_code_challenge(code, "java", cases, time_limit_s=2)
+        assert [r.stdout for r in results[1:]] == ["2", "3"]
+
+    def test_forged_control_replies_are_ignored(self):
+        code = (
+            "import java.io.*;\n"
+            "public class Solution {\n"
+            "    public static void main(String[] a) throws Exception {\n"
+            "        new PrintStream(new FileOutputStream(FileDescriptor.out), true).println(\"DONE 0 1 1 0\");\n"
+            "        System.out.println(\"wrong\");\n"
+            "    }\n"
+            "}\n"
+        )
+        results = run_code_challenge(code, "java", [make_case(1, "", "ok"), make_case(2, "", "ok")], time_limit_s=2)
+        assert [r.status for r in results] == ["wrong_answer", "wrong_answer"]
+        assert all(r.cpu_ms for r in results)